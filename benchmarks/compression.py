@@ -0,0 +1,147 @@
+"""
+Bandwidth/latency tradeoff of body compression.
+
+Compresses a realistic request (a tool array and a long, varied agent
+history), a non-streamed tool-call response and a streamed one (one
+chat.completion.chunk event per flush, as CompressionMiddleware sends it)
+with each available encoding and level, and models the time to move each
+body over a link of --mbps with --rtt-ms:
+
+    total_ms = compress_ms + rtt_ms + wire_bytes / bandwidth + decompress_ms
+
+    python -m benchmarks.compression --mbps 50 --rtt-ms 80
+
+Prints one JSON object; `identity` is the uncompressed baseline.
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+import zlib
+from typing import Any, Callable, Dict, List
+
+from openai_baml_adapter.core import compression
+
+from .ingest import _tool
+
+WORDS = [
+    "quarter", "revenue", "forecast", "invoice", "customer", "region", "pipeline", "report", "summary", "ticket",
+    "deploy", "latency", "budget", "account", "contract", "renewal", "shipment", "warehouse", "supplier", "audit",
+]
+
+
+def request_body(target_bytes: int, tool_count: int, seed: int = 0) -> bytes:
+    """An agent turn: `tool_count` tools and a history of varied turns, about `target_bytes` long."""
+    rng = random.Random(seed)
+    tools = [_tool(i) for i in range(tool_count)]
+    messages: List[Dict[str, Any]] = [{"role": "system", "content": "You are a helpful agent."}]
+    size = len(json.dumps(tools))
+    while size < target_bytes:
+        words = [rng.choice(WORDS) if rng.random() < 0.7 else uuid.UUID(int=rng.getrandbits(128)).hex[:8] for _ in range(60)]
+        message = {"role": "user" if len(messages) % 2 else "assistant", "content": " ".join(words)}
+        messages.append(message)
+        size += len(json.dumps(message))
+    return json.dumps({"model": "gpt-4o-mini", "messages": messages, "tools": tools}).encode()
+
+
+def _call(index: int) -> Dict[str, Any]:
+    return {
+        "id": f"call_{index:08x}",
+        "type": "function",
+        "function": {"name": f"tool_{index}", "arguments": json.dumps({f"arg_{i}": f"value {i}" for i in range(6)})},
+    }
+
+
+def response_body(calls: int) -> bytes:
+    return json.dumps({
+        "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "finish_reason": "tool_calls",
+                     "message": {"role": "assistant", "content": None, "tool_calls": [_call(i) for i in range(calls)]}}],
+    }).encode()
+
+
+def stream_events(calls: int) -> List[bytes]:
+    def event(delta: Dict[str, Any], finish: Any = None) -> bytes:
+        chunk = {
+            "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4o-mini",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n".encode()
+
+    events = [event({"role": "assistant"})]
+    events += [event({"tool_calls": [{"index": i, **_call(i), "baml_final": True}]}) for i in range(calls)]
+    return events + [event({}, "tool_calls"), b"data: [DONE]\n\n"]
+
+
+def _decoder(encoding: str) -> Callable[[bytes], bytes]:
+    if encoding == "gzip":
+        return zlib.decompressobj(wbits=31).decompress
+    return compression.zstandard.ZstdDecompressor().decompressobj().decompress
+
+
+def _measure(chunks: List[bytes], encoding: str, level: int, flush_each: bool, iterations: int) -> Dict[str, float]:
+    compress_s = decompress_s = 0.0
+    wire = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        compressor = compression.Compressor(encoding, level)
+        out = [compressor.compress(chunk, flush=flush_each) for chunk in chunks] + [compressor.finish()]
+        compress_s += time.perf_counter() - start
+        wire = sum(map(len, out))
+        decode = _decoder(encoding)
+        start = time.perf_counter()
+        for piece in out:
+            decode(piece)
+        decompress_s += time.perf_counter() - start
+    return {
+        "wire_bytes": wire,
+        "compress_ms": round(compress_s / iterations * 1000, 3),
+        "decompress_ms": round(decompress_s / iterations * 1000, 3),
+    }
+
+
+def tradeoff(
+    name: str, chunks: List[bytes], flush_each: bool, mbps: float, rtt_ms: float, iterations: int
+) -> Dict[str, Any]:
+    raw = sum(map(len, chunks))
+    bytes_per_ms = mbps * 1_000_000 / 8 / 1000
+    results: Dict[str, Any] = {"identity": {"wire_bytes": raw, "total_ms": round(rtt_ms + raw / bytes_per_ms, 3)}}
+    levels = {"gzip": (1, 6, 9), "zstd": (1, 3, 9)}
+    for encoding in compression.ENCODINGS:
+        for level in levels[encoding]:
+            result = _measure(chunks, encoding, level, flush_each, iterations)
+            result["ratio"] = round(raw / result["wire_bytes"], 2)
+            result["total_ms"] = round(
+                result["compress_ms"] + rtt_ms + result["wire_bytes"] / bytes_per_ms + result["decompress_ms"], 3
+            )
+            results[f"{encoding}-{level}"] = result
+    return {"payload": name, "raw_bytes": raw, "encodings": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--request-kb", type=int, default=512)
+    parser.add_argument("--tools", type=int, default=100)
+    parser.add_argument("--calls", type=int, default=8)
+    parser.add_argument("--mbps", type=float, default=50.0)
+    parser.add_argument("--rtt-ms", type=float, default=80.0)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    payloads = [
+        ("request", [request_body(args.request_kb * 1024, args.tools)], False),
+        ("response", [response_body(args.calls)], False),
+        ("stream", stream_events(args.calls), True),
+        # The same events compressed as one body: what flushing per event costs in ratio
+        ("stream-unflushed", stream_events(args.calls), False),
+    ]
+    print(json.dumps({
+        "mbps": args.mbps,
+        "rtt_ms": args.rtt_ms,
+        "results": [tradeoff(name, chunks, flush, args.mbps, args.rtt_ms, args.iterations) for name, chunks, flush in payloads],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Request-ingestion benchmark for /v1/chat/completions bodies.
+
+Compares the old ingestion (JSON decoded to dicts, then every message and
+tool validated into models) with the current one (validated straight from
+the raw bytes, messages and tools kept as parsed JSON). The lazy variants
+also time the work each path does afterwards.
+
+    python -m benchmarks.ingest --size-mb 1 --iterations 50
+
+Prints one JSON object with timings in milliseconds.
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from pydantic import BaseModel
+
+from openai_baml_adapter.baml_client.baml_client.types import Message as BamlMessage
+from openai_baml_adapter.core.handler import _to_baml_messages
+from openai_baml_adapter.models.openai import CompletionRequest, Message, Tool
+
+
+class EagerCompletionRequest(BaseModel):
+    """The request model as it was before lazy validation, for comparison."""
+    model: str
+    messages: List[Message]
+    tools: Optional[List[Tool]] = None
+    tool_choice: Optional[Union[str, Dict[str, Any]]] = None
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    stream: Optional[bool] = False
+
+
+def _tool(index: int) -> Dict[str, Any]:
+    return {
+        "type": "function",
+        "function": {
+            "name": f"tool_{index}",
+            "description": "Look something up in an internal system. " * 4,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    f"arg_{i}": {"type": "string", "description": "An argument for the lookup."}
+                    for i in range(12)
+                },
+                "required": ["arg_0"],
+            },
+        },
+    }
+
+
+def build_body(size_bytes: int, tool_count: int = 100) -> bytes:
+    """A realistic agent-turn body: a big tool array plus history padded to `size_bytes`."""
+    tools = [_tool(i) for i in range(tool_count)]
+    messages = [{"role": "system", "content": "You are a helpful agent."}]
+    turn = "The user asked about the quarterly numbers and the agent looked them up. " * 8
+    while True:
+        body = json.dumps({"model": "gpt-4o-mini", "messages": messages, "tools": tools}).encode()
+        if len(body) >= size_bytes:
+            return body
+        messages.append({"role": "user" if len(messages) % 2 else "assistant", "content": turn})
+
+
+def _time(fn: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=1.0)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    body = build_body(int(args.size_mb * 1024 * 1024))
+
+    def eager_baml():
+        # What the BAML path used to do with the request before compiling
+        request = EagerCompletionRequest.model_validate(json.loads(body))
+        [tool.model_dump() for tool in request.tools]
+        [BamlMessage(role=msg.role, content=msg.content or "") for msg in request.messages]
+
+    def lazy_plain_chat():
+        CompletionRequest.model_validate_json(body)
+
+    def lazy_baml():
+        request = CompletionRequest.model_validate_json(body)
+        request.tools_json
+        _to_baml_messages(request.messages)
+
+    results = {
+        "body_bytes": len(body),
+        "iterations": args.iterations,
+        "eager_dict_validation": _time(lambda: EagerCompletionRequest.model_validate(json.loads(body)), args.iterations),
+        "eager_baml": _time(eager_baml, args.iterations),
+        "lazy_bytes_plain_chat": _time(lazy_plain_chat, args.iterations),
+        "lazy_bytes_baml": _time(lazy_baml, args.iterations),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
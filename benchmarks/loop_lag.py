@@ -0,0 +1,145 @@
+"""
+Event-loop lag under CPU-heavy BAML requests, with and without offloading.
+
+Runs concurrent BAML-path requests in-process against the local stub
+upstream (benchmarks.stub_upstream). Every request brings its own large tool
+set (a schema-cache miss, so it compiles) and gets back a large tool-call
+reply (so it parses). A probe task measures how late the event loop wakes
+it up; that lateness is what every other request on the worker sees.
+
+Modes:
+  - inline: compile and parse on the event loop (offload thresholds huge)
+  - threads: offloaded to the CPU thread pool (the default)
+  - processes: offloaded to a process pool (BAML_CPU_PROCESSES)
+
+    python -m benchmarks.loop_lag --requests 16 --concurrency 4 --tools 200
+
+Prints one JSON object with lag percentiles (ms) and wall time per mode.
+"""
+import argparse
+import asyncio
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks.ingest import _tool
+from openai_baml_adapter.core import clients, config, offload, shared_cache
+from openai_baml_adapter.core.handler import handle_openai_request
+from openai_baml_adapter.core.schema_cache import schema_cache
+from openai_baml_adapter.models.openai import CompletionRequest
+
+_OFF = {"OFFLOAD_COMPILE_MIN_BYTES": 1 << 62, "OFFLOAD_PARSE_MIN_BYTES": 1 << 62}
+_DEFAULT = {"OFFLOAD_COMPILE_MIN_BYTES": config.OFFLOAD_COMPILE_MIN_BYTES, "OFFLOAD_PARSE_MIN_BYTES": config.OFFLOAD_PARSE_MIN_BYTES}
+MODES = {
+    "inline": {**_OFF, "CPU_PROCESSES": 0},
+    "threads": {**_DEFAULT, "CPU_PROCESSES": 0},
+    "processes": {**_DEFAULT, "CPU_PROCESSES": 2},
+}
+
+
+def _reply(calls: int) -> str:
+    return json.dumps({
+        "tool_call": [
+            {"function_name": f"tool_{i}", **{f"arg_{j}": "lorem ipsum dolor sit amet " * 8 for j in range(12)}}
+            for i in range(calls)
+        ]
+    })
+
+
+def _request(index: int, tool_count: int) -> CompletionRequest:
+    tools = [_tool(i) for i in range(tool_count)]
+    # A distinct description per request makes every tool set a cache miss
+    tools[0]["function"]["description"] = f"request {index}"
+    return CompletionRequest(model="stub", messages=[{"role": "user", "content": "go"}], tools=tools)
+
+
+async def _probe(samples: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        samples.append(max(0.0, (time.perf_counter() - start - 0.001) * 1000))
+
+
+async def run_mode(requests: List[CompletionRequest], concurrency: int) -> Dict[str, Any]:
+    schema_cache.clear()
+    semaphore = asyncio.Semaphore(concurrency)
+    headers = {"authorization": "Bearer stub"}
+
+    async def one(request: CompletionRequest) -> None:
+        async with semaphore:
+            response = await handle_openai_request(request.model_copy(deep=True), None, headers)
+            assert response.choices[0].message.tool_calls
+
+    lags: List[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(r) for r in requests))
+    wall = time.perf_counter() - start
+    stop.set()
+    await probe
+    await clients.close_clients()
+    lags.sort()
+    return {
+        "wall_s": round(wall, 3),
+        "lag_p50_ms": round(statistics.median(lags), 2),
+        "lag_p99_ms": round(lags[int(len(lags) * 0.99) - 1], 2),
+        "lag_max_ms": round(lags[-1], 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--tools", type=int, default=200)
+    parser.add_argument("--reply-calls", type=int, default=4)
+    args = parser.parse_args()
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    reply = _reply(args.reply_calls)
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_upstream", "--port", str(port), "--reply", reply],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/v1/models")
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+        config.OPENAI_BASE_URL = f"http://127.0.0.1:{port}/v1"
+        shared_cache._store = False  # measure compilation, not the cross-worker cache
+        requests = [_request(i, args.tools) for i in range(args.requests)]
+        results: Dict[str, Any] = {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "tools_json_bytes": len(requests[0].tools_json),
+            "reply_bytes": len(reply),
+        }
+        for mode, settings in MODES.items():
+            for name, value in settings.items():
+                setattr(config, name, value)
+            results[mode] = asyncio.run(run_mode(requests, args.concurrency))
+            offload.shutdown()
+        print(json.dumps(results, indent=2))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    main()
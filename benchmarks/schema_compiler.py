@@ -0,0 +1,155 @@
+"""
+Schema-compiler micro-benchmarks over the fixed tool corpus (tool_corpus.py).
+
+For each corpus set, compiles the tools with:
+  - parse_openai_tools: core/parse.py's SchemaAdder into a fresh TypeBuilder
+  - parse_tools: the same for MCP sets, from a servers file on disk
+  - compile_schema: the serving path (schema IR, then a TypeBuilder)
+
+and reports, per compiler:
+  - compile_ms: median and min wall time over --iterations
+  - peak_kb: peak Python heap (tracemalloc) during one compile
+  - retained_kb / retained_blocks: Python heap and allocated blocks still held
+    afterwards by the result, which is kept alive while measuring
+
+TypeBuilder internals live in the BAML (Rust) runtime and are not seen by
+tracemalloc.
+
+    python -m benchmarks.schema_compiler --iterations 20 --output results.json
+    python -m benchmarks.schema_compiler --baseline results.json
+
+Runs offline. Prints one JSON object (and writes it to --output); with
+--baseline, each timing also gets its ratio to the baseline run.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from importlib.metadata import version
+from typing import Any, Callable, Dict, List, Optional
+
+from openai_baml_adapter.baml_client.baml_client.type_builder import TypeBuilder
+from openai_baml_adapter.core.parse import mcp_to_openai_tools, parse_openai_tools, parse_tools
+from openai_baml_adapter.core.schema_cache import compile_schema
+
+from .tool_corpus import MCP_SETS, OPENAI_SETS
+
+
+def _time(fn: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"median": round(statistics.median(samples), 3), "min": round(min(samples), 3)}
+
+
+def _memory(fn: Callable[[], Any]) -> Dict[str, Any]:
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    gc.collect()
+    retained_blocks = sys.getallocatedblocks() - blocks
+    del result
+    return {
+        "peak_kb": round((peak - before) / 1024, 1),
+        "retained_kb": round((current - before) / 1024, 1),
+        "retained_blocks": retained_blocks,
+    }
+
+
+def measure(compilers: Dict[str, Callable[[], Dict[str, Any]]], iterations: int) -> Dict[str, Any]:
+    results = {}
+    for name, compile_ in compilers.items():
+        # The corpus must compile cleanly: a skipped tool would flatter the numbers
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            compiled = len(compile_())
+        results[name] = {"compiled": compiled, "compile_ms": _time(compile_, iterations), **_memory(compile_)}
+    return results
+
+
+def run(iterations: int, only: Optional[List[str]] = None) -> Dict[str, Any]:
+    sets: Dict[str, Any] = {}
+    for name, build in OPENAI_SETS.items():
+        if only and name not in only:
+            continue
+        tools = build()
+        sets[name] = {
+            "tools": len(tools),
+            "schema_bytes": len(json.dumps(tools)),
+            **measure({
+                "parse_openai_tools": lambda: parse_openai_tools(tools, TypeBuilder()),
+                "compile_schema": lambda: compile_schema(tools, True)[1],
+            }, iterations),
+        }
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, build in MCP_SETS.items():
+            if only and name not in only:
+                continue
+            servers = build()
+            path = os.path.join(tmp, f"{name}.json")
+            with open(path, "w") as f:
+                json.dump({"servers": servers}, f)
+            tools = mcp_to_openai_tools(servers)
+            sets[name] = {
+                "servers": len(servers),
+                "tools": len(tools),
+                "schema_bytes": os.path.getsize(path),
+                **measure({
+                    "parse_tools": lambda: parse_tools(path, TypeBuilder()),
+                    "compile_schema": lambda: compile_schema(tools, True)[1],
+                }, iterations),
+            }
+    return sets
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Add each compiler's median time relative to the baseline run (<1 is faster)."""
+    for set_name, entry in results.items():
+        for compiler, measured in entry.items():
+            base = baseline.get(set_name, {}).get(compiler)
+            if isinstance(measured, dict) and isinstance(base, dict) and base["compile_ms"]["median"]:
+                measured["vs_baseline"] = round(measured["compile_ms"]["median"] / base["compile_ms"]["median"], 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--sets", nargs="*", help=f"Corpus sets to run (default all: {', '.join([*OPENAI_SETS, *MCP_SETS])})")
+    parser.add_argument("--output", help="Also write the results to this file")
+    parser.add_argument("--baseline", help="Results file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = run(args.iterations, args.sets)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f)["sets"])
+    report = {
+        "iterations": args.iterations,
+        "python": platform.python_version(),
+        "baml_py": version("baml-py"),
+        "sets": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Schema-compilation benchmark for large and recursive $ref graphs.
+
+Schemas (all generated, shaped like real tool definitions):
+  - shared_defs: one tool whose 40 properties reference 200 shared $defs
+    (pydantic-style models with nested references)
+  - recursive_ast: an expression-tree tool (binary ops, calls, lists of
+    arguments) where most definitions refer back to Expr
+  - many_tools: 200 tools, each with its own small $defs
+  - over_budget: a schema far over BAML_SCHEMA_MAX_NODES, timed until it is
+    rejected
+
+    python -m benchmarks.schema_refs --iterations 20
+
+Prints one JSON object with median compile times in milliseconds.
+"""
+import argparse
+import json
+import statistics
+import time
+import warnings
+from typing import Any, Callable, Dict, List
+
+from openai_baml_adapter.core import config
+from openai_baml_adapter.core.errors import SchemaTooComplexError
+from openai_baml_adapter.core.schema_cache import compile_schema
+
+
+def _function(name: str, properties: Dict[str, Any], defs: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": f"{name} tool",
+            "parameters": {"type": "object", "properties": properties, "$defs": defs},
+        },
+    }
+
+
+def shared_defs(def_count: int = 200) -> List[Dict[str, Any]]:
+    defs = {}
+    for i in range(def_count):
+        properties = {f"field_{j}": {"type": "string", "description": "A field."} for j in range(6)}
+        if i:
+            properties["parent"] = {"$ref": f"#/$defs/Model{i // 2}"}
+        defs[f"Model{i}"] = {"type": "object", "title": f"Model{i}", "properties": properties}
+    properties = {f"arg_{i}": {"$ref": f"#/$defs/Model{(i * 7) % def_count}"} for i in range(40)}
+    return [_function("Shared", properties, defs)]
+
+
+def recursive_ast() -> List[Dict[str, Any]]:
+    expr = {"anyOf": [{"$ref": f"#/$defs/{name}"} for name in ("Literal", "BinaryOp", "Call", "ListExpr")]}
+    defs = {
+        "Expr": {"type": "object", "title": "Expr", "properties": {"node": expr}, "required": ["node"]},
+        "Literal": {"type": "object", "title": "Literal", "properties": {"value": {"type": "number"}}},
+        "BinaryOp": {
+            "type": "object",
+            "title": "BinaryOp",
+            "properties": {
+                "op": {"type": "string", "enum": ["ADD", "SUB", "MUL", "DIV"], "title": "Operator"},
+                "left": {"$ref": "#/$defs/Expr"},
+                "right": {"$ref": "#/$defs/Expr"},
+            },
+        },
+        "Call": {
+            "type": "object",
+            "title": "Call",
+            "properties": {
+                "name": {"type": "string"},
+                "args": {"type": "array", "items": {"$ref": "#/$defs/Expr"}},
+            },
+        },
+        "ListExpr": {
+            "type": "object",
+            "title": "ListExpr",
+            "properties": {"items": {"type": "array", "items": {"$ref": "#/$defs/Expr"}}},
+        },
+    }
+    return [_function("Evaluate", {"expression": {"$ref": "#/$defs/Expr"}}, defs)]
+
+
+def many_tools(tool_count: int = 200) -> List[Dict[str, Any]]:
+    tools = []
+    for i in range(tool_count):
+        defs = {
+            f"Address{i}": {
+                "type": "object",
+                "title": f"Address{i}",
+                "properties": {k: {"type": "string"} for k in ("street", "city", "zip", "country")},
+            }
+        }
+        properties = {
+            "name": {"type": "string"},
+            "home": {"$ref": f"#/$defs/Address{i}"},
+            "work": {"$ref": f"#/$defs/Address{i}"},
+            "tags": {"type": "array", "items": {"type": "string"}},
+        }
+        tools.append(_function(f"tool_{i}", properties, defs))
+    return tools
+
+
+def over_budget() -> List[Dict[str, Any]]:
+    properties = {f"f{i}": {"type": "string"} for i in range(config.SCHEMA_MAX_NODES * 2)}
+    return [_function("Huge", properties, {})]
+
+
+def _time(fn: Callable[[], Any], iterations: int) -> float:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {"iterations": args.iterations}
+    for name, build in (("shared_defs", shared_defs), ("recursive_ast", recursive_ast), ("many_tools", many_tools)):
+        tools = build()
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            _, compiled = compile_schema(tools, True)
+        results[name] = {
+            "tools": len(tools),
+            "compiled": len(compiled),
+            "schema_bytes": len(json.dumps(tools)),
+            "compile_ms": _time(lambda: compile_schema(tools, True), args.iterations),
+        }
+
+    huge = over_budget()
+
+    def reject():
+        try:
+            compile_schema(huge, True)
+        except SchemaTooComplexError:
+            return
+        raise AssertionError("over-budget schema compiled")
+
+    results["over_budget"] = {
+        "max_nodes": config.SCHEMA_MAX_NODES,
+        "schema_bytes": len(json.dumps(huge)),
+        "reject_ms": _time(reject, max(1, args.iterations // 4)),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Memory soak test: many varied-schema requests against one adapter worker.
+
+Starts the local stub upstream (benchmarks.stub_upstream) and a worker, then
+drives --requests BAML-path chat completions at --concurrency. Each request
+sends the stub's `Greet` tool plus a slice of the fixed tool corpus
+(tool_corpus.py), cycling through --distinct tool sets. With more distinct
+sets than BAML_SCHEMA_CACHE_SIZE, compiled TypeBuilders keep being evicted
+and rebuilt. A --stream-ratio share of requests stream.
+
+Every --sample-seconds it records the worker's RSS, allocated blocks and GC
+objects from GET /debug/heap. After --warmup requests it takes a heap
+baseline (POST /debug/heap/baseline), which starts tracemalloc in the worker
+(use --no-trace to leave tracing off and measure without its overhead). At
+the end it reports the growth after warm-up, per 1000 requests, and the
+worker's top allocators by growth since the baseline.
+
+    python -m benchmarks.soak --requests 1000000 --concurrency 32 --output soak.json
+    python -m benchmarks.soak --requests 20000 --distinct 50   # mostly cache hits
+
+Prints each sample to stderr as it is taken and the result as one JSON object.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .startup import APP, TOOLS, _free_port, _wait_for
+from .tool_corpus import openai_tools
+
+DEBUG_KEY = "soak"
+AUTH = {"Authorization": f"Bearer {DEBUG_KEY}"}
+POOL = openai_tools(500)
+
+
+def request_body(k: int, max_tools: int, stream: bool) -> Dict[str, Any]:
+    """The k-th distinct request: Greet plus a corpus slice that depends only on k."""
+    size = k % max_tools
+    start = (k * 7919) % (len(POOL) - size)
+    return {
+        "model": "stub",
+        "messages": [
+            {"role": "system", "content": "You are a helpful agent."},
+            {"role": "user", "content": f"Greet John (request {k})"},
+        ],
+        "tools": TOOLS + POOL[start:start + size],
+        "stream": stream,
+    }
+
+
+def _slope(samples: List[Dict[str, Any]], key: str) -> Optional[float]:
+    points = [(s["requests"], s[key]) for s in samples if s.get(key) is not None]
+    if len(points) < 2 or len({x for x, _ in points}) < 2:
+        return None
+    slope, _ = statistics.linear_regression([x for x, _ in points], [y for _, y in points])
+    return round(slope * 1000, 3)
+
+
+class Soak:
+    def __init__(self, base: str, args: argparse.Namespace):
+        self.base = base
+        self.args = args
+        self.sent = 0
+        self.done = 0
+        self.errors = 0
+        self.samples: List[Dict[str, Any]] = []
+        self.baseline_at: Optional[int] = None
+        self.started = time.monotonic()
+
+    async def worker(self, client: httpx.AsyncClient) -> None:
+        args = self.args
+        while self.sent < args.requests:
+            k = self.sent
+            self.sent += 1
+            body = request_body(k % args.distinct, args.max_tools, (k % 100) < args.stream_ratio * 100)
+            try:
+                if body["stream"]:
+                    async with client.stream("POST", "/v1/chat/completions", json=body, headers=AUTH) as response:
+                        async for _ in response.aiter_raw():
+                            pass
+                else:
+                    response = await client.post("/v1/chat/completions", json=body, headers=AUTH)
+                if response.status_code != 200:
+                    self.errors += 1
+            except httpx.HTTPError:
+                self.errors += 1
+            self.done += 1
+            if self.baseline_at is None and self.done >= args.warmup and args.trace:
+                self.baseline_at = self.done
+                await client.post("/debug/heap/baseline", headers=AUTH)
+
+    async def sample(self, client: httpx.AsyncClient) -> None:
+        heap = (await client.get("/debug/heap", params={"limit": 0}, headers=AUTH)).json()["summary"]
+        sample = {
+            "seconds": round(time.monotonic() - self.started, 1),
+            "requests": self.done,
+            "errors": self.errors,
+            "rss_kb": heap["rss_kb"],
+            "allocated_blocks": heap["allocated_blocks"],
+            "gc_objects": heap["gc_objects"],
+            "traced_kb": heap.get("traced_kb"),
+        }
+        self.samples.append(sample)
+        print(json.dumps(sample), file=sys.stderr, flush=True)
+
+    async def sampler(self, client: httpx.AsyncClient) -> None:
+        while True:
+            await asyncio.sleep(self.args.sample_seconds)
+            await self.sample(client)
+
+    async def run(self) -> Dict[str, Any]:
+        args = self.args
+        timeout = httpx.Timeout(args.timeout)
+        limits = httpx.Limits(max_connections=args.concurrency + 2)
+        async with httpx.AsyncClient(base_url=self.base, timeout=timeout, limits=limits) as client:
+            await self.sample(client)
+            sampler = asyncio.create_task(self.sampler(client))
+            try:
+                await asyncio.gather(*(self.worker(client) for _ in range(args.concurrency)))
+            finally:
+                sampler.cancel()
+            await self.sample(client)
+            report = (await client.get("/debug/heap", params={"limit": args.top}, headers=AUTH)).json()
+
+        elapsed = time.monotonic() - self.started
+        after_warmup = [s for s in self.samples if s["requests"] >= args.warmup] or self.samples
+        first, last = after_warmup[0], after_warmup[-1]
+        return {
+            "requests": self.done,
+            "errors": self.errors,
+            "seconds": round(elapsed, 1),
+            "requests_per_second": round(self.done / elapsed, 1),
+            "distinct_tool_sets": args.distinct,
+            "rss_kb": {"start": self.samples[0]["rss_kb"], "after_warmup": first["rss_kb"], "end": last["rss_kb"]},
+            # Least-squares growth over the samples after warm-up
+            "growth_per_1k_requests": {
+                key: _slope(after_warmup, key) for key in ("rss_kb", "allocated_blocks", "gc_objects", "traced_kb")
+            },
+            "top_growth_since_baseline": report["diff"],
+            "samples": self.samples,
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--distinct", type=int, default=5000, help="Distinct tool sets to cycle through")
+    parser.add_argument("--max-tools", type=int, default=40, help="Corpus tools per request, at most")
+    parser.add_argument("--stream-ratio", type=float, default=0.2)
+    parser.add_argument("--warmup", type=int, default=2000, help="Requests before the heap baseline")
+    parser.add_argument("--sample-seconds", type=float, default=10.0)
+    parser.add_argument("--no-trace", dest="trace", action="store_false", help="Don't start tracemalloc")
+    parser.add_argument("--top", type=int, default=15, help="Top allocators to report")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Stub upstream latency")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="Also write the result to this file")
+    args = parser.parse_args()
+
+    stub_port, port = _free_port(), _free_port()
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_upstream", "--port", str(stub_port), "--latency-ms", str(args.latency_ms)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    with tempfile.TemporaryDirectory() as toolset_dir:
+        env = {
+            **os.environ,
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+            "OPENAI_API_KEY": "stub",
+            "BAML_TOOLSET_DIR": toolset_dir,
+            "BAML_DEBUG_KEYS": DEBUG_KEY,
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", f"{APP}:app", "--port", str(port), "--log-level", "warning"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            deadline = time.monotonic() + args.timeout
+            _wait_for(f"http://127.0.0.1:{stub_port}/v1/models", deadline)
+            _wait_for(f"http://127.0.0.1:{port}/ready", deadline)
+            result = asyncio.run(Soak(f"http://127.0.0.1:{port}", args).run())
+        finally:
+            server.terminate()
+            server.wait()
+            stub.terminate()
+            stub.wait()
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
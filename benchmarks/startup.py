@@ -0,0 +1,151 @@
+"""
+Cold-start benchmark for one adapter worker.
+
+Measures, from a fresh interpreter each time:
+  - import_ms: importing the ASGI app (python -X importtime, cumulative)
+  - health_ms: process spawn until /health answers (accepting connections)
+  - ready_ms: process spawn until /ready answers 200 (warm-up finished)
+  - first_request_ms: process spawn until the first BAML-path chat completion
+    is served, sent as soon as /health answers
+  - first_request_latency_ms: how long that first request itself took
+
+The upstream is the local stub (benchmarks.stub_upstream), so no network or
+API key is needed.
+
+    python -m benchmarks.startup --runs 3
+    BAML_WARMUP=0 python -m benchmarks.startup --runs 3
+
+Prints one JSON object with per-metric medians and the raw runs.
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+APP = "openai_baml_adapter.api.main"
+
+TOOLS = [{
+    "type": "function",
+    "function": {
+        "name": "Greet",
+        "description": "Greet a person by name",
+        "parameters": {"type": "object", "properties": {"name": {"type": "string"}}, "required": ["name"]},
+    },
+}]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url: str, deadline: float, status: int = 200) -> None:
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == status:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(f"{url} did not answer {status} in time")
+
+
+def measure_import_ms() -> float:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {APP}"],
+        capture_output=True, text=True, check=True,
+    )
+    for line in reversed(result.stderr.splitlines()):
+        match = re.match(rf"import time:\s+\d+ \|\s+(\d+) \|\s+{re.escape(APP)}$", line)
+        if match:
+            return int(match.group(1)) / 1000
+    raise RuntimeError("import time not found in -X importtime output")
+
+
+def measure_startup(upstream_url: str, timeout: float) -> Dict[str, float]:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as toolset_dir:
+        env = {
+            **os.environ,
+            "OPENAI_BASE_URL": upstream_url,
+            "OPENAI_API_KEY": "stub",
+            "BAML_TOOLSET_DIR": toolset_dir,
+        }
+        started = time.monotonic()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", f"{APP}:app", "--port", str(port), "--log-level", "warning"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            deadline = started + timeout
+            _wait_for(f"{base}/health", deadline)
+            health_ms = (time.monotonic() - started) * 1000
+
+            sent = time.monotonic()
+            response = httpx.post(
+                f"{base}/v1/chat/completions",
+                json={"model": "stub", "messages": [{"role": "user", "content": "Greet John"}], "tools": TOOLS},
+                headers={"Authorization": "Bearer stub"},
+                timeout=timeout,
+            )
+            response.raise_for_status()
+            first_request_ms = (time.monotonic() - started) * 1000
+            first_request_latency_ms = (time.monotonic() - sent) * 1000
+
+            _wait_for(f"{base}/ready", deadline)
+            ready_ms = (time.monotonic() - started) * 1000
+        finally:
+            server.terminate()
+            server.wait()
+    return {
+        "health_ms": health_ms,
+        "ready_ms": ready_ms,
+        "first_request_ms": first_request_ms,
+        "first_request_latency_ms": first_request_latency_ms,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    stub_port = _free_port()
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_upstream", "--port", str(stub_port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for(f"http://127.0.0.1:{stub_port}/v1/models", time.monotonic() + args.timeout)
+        runs: List[Dict[str, float]] = []
+        for _ in range(args.runs):
+            run = measure_startup(f"http://127.0.0.1:{stub_port}/v1", args.timeout)
+            run["import_ms"] = measure_import_ms()
+            runs.append(run)
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    results = {
+        "warmup": os.getenv("BAML_WARMUP", "1"),
+        "runs": args.runs,
+        **{f"{key}_median": round(statistics.median(run[key] for run in runs), 1) for key in runs[0]},
+        "raw": [{key: round(value, 1) for key, value in run.items()} for run in runs],
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
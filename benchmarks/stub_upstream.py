@@ -0,0 +1,96 @@
+"""
+A local stand-in for the OpenAI API, for benchmarks that need an upstream.
+
+Answers every chat completion with the same canned assistant message (as
+JSON, or as SSE when the request streams) after an optional fixed latency.
+The default reply is a valid BAML Response for a `Greet` tool.
+
+    python -m benchmarks.stub_upstream --port 8099 --latency-ms 20
+
+Point the adapter at it with OPENAI_BASE_URL=http://127.0.0.1:8099/v1.
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+DEFAULT_REPLY = json.dumps({"tool_call": [{"function_name": "Greet", "name": "John"}]})
+
+
+def create_app(reply: str = DEFAULT_REPLY, latency_ms: float = 0.0, chunk_chars: int = 8) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "created": 0, "owned_by": "stub"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "stub")
+        prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+        completion_tokens = len(reply) // 4
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+        if not body.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        def chunk(delta, finish_reason=None, **extra):
+            return "data: " + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }) + "\n\n"
+
+        async def events():
+            yield chunk({"role": "assistant", "content": ""})
+            for start in range(0, len(reply), chunk_chars):
+                yield chunk({"content": reply[start:start + chunk_chars]})
+            yield chunk({}, "stop", usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--reply", default=DEFAULT_REPLY, help="assistant message content to return")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.reply, args.latency_ms), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
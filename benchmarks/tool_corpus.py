@@ -0,0 +1,213 @@
+"""
+A fixed corpus of tool schemas for the schema-compiler benchmarks.
+
+The base tools are written after real OpenAI function definitions and MCP
+server tools: enums (titled and untitled), `anyOf` unions and nullables,
+maps, arrays of objects, `$defs` with `$ref`s, and one deeply nested spec.
+Larger sets repeat the base tools under new names, with every class and enum
+title suffixed, since one TypeBuilder can only declare a title once. The
+corpus is the same on every run, so timings from different commits are
+comparable.
+"""
+from typing import Any, Callable, Dict, List
+
+Schema = Dict[str, Any]
+
+
+def _function(name: str, description: str, parameters: Schema) -> Schema:
+    return {"type": "function", "function": {"name": name, "description": description, "parameters": parameters}}
+
+
+def _object(title: str, properties: Dict[str, Schema], required: List[str] = (), **extra: Any) -> Schema:
+    return {"type": "object", "title": title, "properties": properties, "required": list(required), **extra}
+
+
+def _string(description: str = "", **extra: Any) -> Schema:
+    return {"type": "string", "description": description, **extra} if description else {"type": "string", **extra}
+
+
+def get_weather(s: str) -> Schema:
+    return _function(f"get_weather{s}", "Current weather and forecast for a location.", _object(
+        f"GetWeather{s}",
+        {
+            "location": _string("City and country, e.g. Paris, France"),
+            "unit": _string("Temperature unit", enum=["celsius", "fahrenheit"]),
+            "days": {"type": "integer", "description": "Forecast days", "default": 1},
+        },
+        ["location"],
+    ))
+
+
+def web_search(s: str) -> Schema:
+    return _function(f"web_search{s}", "Search the web.", _object(
+        f"WebSearch{s}",
+        {
+            "query": _string("Search terms"),
+            "max_results": {"type": "integer", "default": 10},
+            "recency": {"anyOf": [_string(enum=["day", "week", "month", "year"]), {"type": "null"}]},
+            "domains": {"type": "array", "items": _string(), "description": "Only search these domains"},
+            "safe_search": {"type": "boolean", "default": True},
+        },
+        ["query"],
+    ))
+
+
+def create_calendar_event(s: str) -> Schema:
+    return _function(f"create_calendar_event{s}", "Create an event in the user's calendar.", _object(
+        f"CreateCalendarEvent{s}",
+        {
+            "title": _string("Event title"),
+            "start": _string("Start time, ISO 8601"),
+            "end": _string("End time, ISO 8601"),
+            "attendees": {"type": "array", "items": _object(
+                f"Attendee{s}",
+                {"email": _string(), "name": _string(), "optional": {"type": "boolean", "default": False}},
+                ["email"],
+            )},
+            "recurrence": {"anyOf": [{"$ref": "#/$defs/RecurrenceRule"}, {"type": "null"}]},
+            "reminders_minutes": {"type": "array", "items": {"type": "integer"}},
+            "location": {"$ref": "#/$defs/Place"},
+            "metadata": {"type": "object", "description": "Free-form labels"},
+        },
+        ["title", "start", "end"],
+        **{"$defs": {
+            "RecurrenceRule": _object(f"RecurrenceRule{s}", {
+                "frequency": _string(title=f"Frequency{s}", enum=["DAILY", "WEEKLY", "MONTHLY", "YEARLY"]),
+                "interval": {"type": "integer", "default": 1},
+                "until": {"anyOf": [_string(), {"type": "null"}]},
+                "by_day": {"type": "array", "items": _string(enum=["MO", "TU", "WE", "TH", "FR", "SA", "SU"])},
+            }, ["frequency"]),
+            "Place": _object(f"Place{s}", {
+                "name": _string(),
+                "address": {"$ref": "#/$defs/Address"},
+                "video_link": {"anyOf": [_string(), {"type": "null"}]},
+            }),
+            "Address": _object(f"Address{s}", {k: _string() for k in ("street", "city", "postal_code", "country")}),
+        }},
+    ))
+
+
+def create_issue(s: str) -> Schema:
+    return _function(f"create_issue{s}", "Open an issue in a repository.", _object(
+        f"CreateIssue{s}",
+        {
+            "owner": _string(),
+            "repo": _string(),
+            "title": _string(),
+            "body": _string("Markdown body"),
+            "labels": {"type": "array", "items": _string()},
+            "assignees": {"type": "array", "items": _string()},
+            "milestone": {"anyOf": [{"type": "integer"}, {"type": "null"}]},
+            "priority": _string(title=f"Priority{s}", enum=["P0", "P1", "P2", "P3"]),
+        },
+        ["owner", "repo", "title"],
+    ))
+
+
+def run_sql(s: str) -> Schema:
+    return _function(f"run_sql{s}", "Run a read-only SQL query.", _object(
+        f"RunSql{s}",
+        {
+            "query": _string("SQL with named :parameters"),
+            "params": {
+                "type": "object",
+                "additionalProperties": {"anyOf": [_string(), {"type": "number"}, {"type": "boolean"}, {"type": "null"}]},
+            },
+            "timeout_ms": {"type": "integer", "default": 30000},
+            "format": _string(enum=["rows", "csv", "markdown"]),
+        },
+        ["query"],
+    ))
+
+
+def edit_file(s: str) -> Schema:
+    return _function(f"edit_file{s}", "Apply text edits to a file.", _object(
+        f"EditFile{s}",
+        {
+            "path": _string(),
+            "edits": {"type": "array", "items": _object(
+                f"TextEdit{s}", {"old_text": _string(), "new_text": _string()}, ["old_text", "new_text"]
+            )},
+            "dry_run": {"type": "boolean", "default": False},
+        },
+        ["path", "edits"],
+    ))
+
+
+def post_message(s: str) -> Schema:
+    blocks = ("SectionBlock", "DividerBlock", "ImageBlock", "ActionsBlock")
+    return _function(f"post_message{s}", "Post a message to a chat channel.", _object(
+        f"PostMessage{s}",
+        {
+            "channel": _string(),
+            "text": _string("Fallback text"),
+            "blocks": {"type": "array", "items": {"anyOf": [{"$ref": f"#/$defs/{b}"} for b in blocks]}},
+            "thread_ts": {"anyOf": [_string(), {"type": "null"}]},
+        },
+        ["channel", "text"],
+        **{"$defs": {
+            "SectionBlock": _object(f"SectionBlock{s}", {"text": _string(), "fields": {"type": "array", "items": _string()}}),
+            "DividerBlock": _object(f"DividerBlock{s}", {"divider": {"type": "boolean"}}),
+            "ImageBlock": _object(f"ImageBlock{s}", {"image_url": _string(), "alt_text": _string()}, ["image_url"]),
+            "ActionsBlock": _object(f"ActionsBlock{s}", {"elements": {"type": "array", "items": _object(
+                f"Button{s}",
+                {"text": _string(), "value": _string(), "style": _string(enum=["primary", "danger"])},
+                ["text"],
+            )}}),
+        }},
+    ))
+
+
+def deploy_service(s: str, depth: int = 12) -> Schema:
+    """A deployment spec nested `depth` objects deep, each level with a few scalar settings."""
+    level: Schema = _object(f"Level{depth}{s}", {"value": _string(), "enabled": {"type": "boolean"}})
+    for d in range(depth - 1, 0, -1):
+        level = _object(f"Level{d}{s}", {
+            "name": _string(),
+            "replicas": {"type": "integer"},
+            "mode": _string(enum=["auto", "manual", "off"]),
+            "child": level,
+            "labels": {"type": "object"},
+        }, ["child"])
+    return _function(f"deploy_service{s}", "Deploy a service from a nested spec.", _object(
+        f"DeployService{s}", {"service": _string(), "spec": level}, ["service", "spec"]
+    ))
+
+
+BASE_TOOLS: List[Callable[[str], Schema]] = [
+    get_weather, web_search, create_calendar_event, create_issue, run_sql, edit_file, post_message, deploy_service,
+]
+
+
+def openai_tools(count: int) -> List[Schema]:
+    """`count` tools: the base tools in order, then repeated under new names."""
+    return [BASE_TOOLS[i % len(BASE_TOOLS)](f"_{i // len(BASE_TOOLS)}" if i >= len(BASE_TOOLS) else "") for i in range(count)]
+
+
+def _mcp_tool(tool: Schema) -> Schema:
+    function = tool["function"]
+    return {"name": function["name"], "description": function["description"], "inputSchema": function["parameters"]}
+
+
+def mcp_servers(server_count: int, tools_per_server: int = 8) -> Dict[str, List[Schema]]:
+    """MCP `servers` for parse_tools: each server lists the base tools, titles suffixed per server."""
+    return {
+        f"server_{n}": [_mcp_tool(BASE_TOOLS[i % len(BASE_TOOLS)](f"_s{n}_{i}")) for i in range(tools_per_server)]
+        for n in range(server_count)
+    }
+
+
+# name -> OpenAI tools, from a single tool to a 500-tool agent
+OPENAI_SETS: Dict[str, Callable[[], List[Schema]]] = {
+    "tiny": lambda: openai_tools(1),
+    "base": lambda: openai_tools(len(BASE_TOOLS)),
+    "nested": lambda: [deploy_service("", depth=40)],
+    "medium": lambda: openai_tools(50),
+    "large": lambda: openai_tools(500),
+}
+
+# name -> MCP servers
+MCP_SETS: Dict[str, Callable[[], Dict[str, List[Schema]]]] = {
+    "mcp_small": lambda: mcp_servers(3),
+    "mcp_large": lambda: mcp_servers(40, 12),
+}
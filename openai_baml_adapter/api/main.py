@@ -1,11 +1,61 @@
+import asyncio
+import hmac
+import json
+import os
 import time
-from fastapi import FastAPI, HTTPException, Request
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncIterator, Awaitable, Dict, Optional, Tuple, TypeVar
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from starlette.background import BackgroundTask
 
 from ..models.openai import CompletionRequest, CompletionResponse, Choice, Message, Usage
+from ..models.baml import McpCatalogObject, ToolsetCreateRequest, ToolsetObject
+from ..models.responses import ResponseObject, ResponsesRequest
 from ..core.handler import handle_openai_request
+from ..core.errors import InvalidRequestError
+from ..core.clients import close_clients
+from ..core.passthrough import is_passthrough, open_passthrough, relay_headers
+from ..core import config, deadline, metrics, offload, profiler
+from ..core.heap import KEY_TYPES, heap
+from ..core.mcp_catalog import mcp_catalog
+from ..core.responses import handle_responses_request, owner_of, response_store
+from ..core.sessions import SessionConnection
+from ..core.toolsets import toolsets
+from ..core.lifecycle import drain, readiness, warm_up
+from ..core.watchdog import watchdog
+from .middleware import CompressionMiddleware, DrainMiddleware, RequestIdMiddleware
+
+T = TypeVar("T")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so the worker starts accepting connections
+    # immediately; /ready turns 200 once warm-up finishes.
+    background = [asyncio.create_task(warm_up())]
+    drain.install_signal_hook(config.SHUTDOWN_GRACE_SECONDS)
+    if config.TRACEMALLOC:
+        heap.start()
+    if config.STALL_WATCHDOG:
+        background.append(asyncio.create_task(watchdog.run()))
+    if mcp_catalog.path:
+        background.append(asyncio.create_task(mcp_catalog.watch(config.MCP_CATALOG_POLL_SECONDS)))
+    yield
+    # Normally already under way, started by the shutdown signal
+    await drain.shutdown(config.SHUTDOWN_GRACE_SECONDS)
+    for task in background:
+        task.cancel()
+    await close_clients()
+    offload.shutdown()
+
 
-app = FastAPI(title="OpenAI BAML Adapter", version="0.1.0")
+app = FastAPI(title="OpenAI BAML Adapter", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,6 +64,25 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(DrainMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RequestIdMiddleware)
+
+
+def require_debug_key(request: Request) -> None:
+    """Allow only API keys listed in BAML_DEBUG_KEYS."""
+    scheme, _, key = request.headers.get("authorization", "").partition(" ")
+    if not config.DEBUG_KEYS:
+        raise HTTPException(status_code=404, detail="Debug endpoints are disabled")
+    if scheme.lower() != "bearer" or not any(hmac.compare_digest(key.encode(), allowed.encode()) for allowed in config.DEBUG_KEYS):
+        raise HTTPException(status_code=403, detail="This API key may not use debug endpoints")
+
+
+def require_bearer_key(request: Request) -> None:
+    """Refuse requests without an API key."""
+    scheme, _, key = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not key:
+        raise HTTPException(status_code=401, detail="Missing API key")
 
 
 @app.get("/health")
@@ -21,15 +90,160 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    if drain.draining:
+        return JSONResponse(status_code=503, content={"status": "draining", "in_flight": len(drain)})
+    if not readiness.ready:
+        return JSONResponse(status_code=503, content={"status": "warming"})
+    return {"status": "ready", "warmup_ms": readiness.warmup_ms, **readiness.warmup_details}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/stalls", dependencies=[Depends(require_debug_key)])
+async def get_stalls():
+    """Recent event-loop stalls, newest first, with sampled stacks and the requests in flight."""
+    return watchdog.report()
+
+
+@app.get("/debug/profiles/{name}", dependencies=[Depends(require_debug_key)])
+async def get_profile(name: str):
+    """Download a request profile (folded stacks) named in an X-BAML-Profile response header."""
+    path = os.path.join(config.PROFILE_DIR, os.path.basename(name))
+    if not name.endswith(".folded") or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"Unknown profile '{name}'")
+    return FileResponse(path, media_type="text/plain")
+
+
+@app.get("/debug/heap", dependencies=[Depends(require_debug_key)])
+async def get_heap(limit: int = 20, key_type: str = "lineno"):
+    """
+    RSS, allocated blocks and GC objects; while tracemalloc traces, also the
+    top allocators and the top growth since the baseline.
+    """
+    if key_type not in KEY_TYPES:
+        raise HTTPException(status_code=400, detail=f"key_type must be one of {', '.join(KEY_TYPES)}")
+    # A snapshot of a big heap takes a while; in a thread the loop still gets turns
+    return await asyncio.to_thread(heap.report, limit, key_type)
+
+
+@app.post("/debug/heap/baseline", dependencies=[Depends(require_debug_key)])
+async def take_heap_baseline():
+    """Start tracing allocations, if needed, and take the snapshot later reports diff against."""
+    return await asyncio.to_thread(heap.take_baseline)
+
+
+@app.delete("/debug/heap", dependencies=[Depends(require_debug_key)])
+async def stop_heap_tracing():
+    """Stop tracing allocations and drop the baseline."""
+    # Freeing every trace and counting GC objects both scale with the heap
+    await asyncio.to_thread(heap.stop)
+    return await asyncio.to_thread(heap.summary)
+
+
+async def _sse(chunks: AsyncIterator[BaseModel]) -> AsyncIterator[str]:
+    """Encode completion chunks as OpenAI-style server-sent events."""
+    try:
+        async for chunk in chunks:
+            yield f"data: {chunk.model_dump_json(exclude_none=True)}\n\n"
+    except TimeoutError:
+        # Headers are long gone; end the stream with an error event instead
+        yield 'data: {"error": {"message": "Deadline exceeded", "type": "timeout"}}\n\n'
+        return
+    except Exception as e:
+        yield f"data: {json.dumps({'error': {'message': str(e), 'type': 'server_error'}})}\n\n"
+        return
+    yield "data: [DONE]\n\n"
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+async def _unless_disconnected(http_request: Request, work: Awaitable[T]) -> T:
+    """
+    Await `work`, cancelling it if the client disconnects first. The body has
+    already been read, so the next ASGI message is the disconnect.
+    """
+    task = asyncio.ensure_future(work)
+
+    async def disconnected() -> None:
+        while (await http_request.receive())["type"] != "http.disconnect":
+            pass
+
+    watcher = asyncio.ensure_future(disconnected())
+    try:
+        done, _ = await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except BaseException:
+        # Cancelled ourselves, e.g. by the request's deadline
+        task.cancel()
+        watcher.cancel()
+        raise
+    watcher.cancel()
+    if task not in done:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+        raise ClientDisconnected()
+    return task.result()
+
+
+def _start_profile(http_request: Request) -> Tuple[Optional[profiler.RequestProfile], Dict[str, str]]:
+    """
+    Start profiling this request if it asked to (X-BAML-Profile) with a debug
+    key. Returns the profile and the response headers naming its file, or
+    saying "rate-limited" when the request runs unprofiled.
+    """
+    if not http_request.headers.get("x-baml-profile"):
+        return None, {}
+    require_debug_key(http_request)
+    profile = profiler.start_profile(http_request.state.request_id)
+    return profile, {"x-baml-profile": profile.filename if profile else "rate-limited"}
+
+
+async def _profiled(chunks: AsyncIterator[str], profile: profiler.RequestProfile) -> AsyncIterator[str]:
+    try:
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        profiler.finish_profile(profile)
+
+
 @app.post("/v1/chat/completions", response_model=CompletionResponse)
-async def create_chat_completion(request: CompletionRequest, http_request: Request):
+async def create_chat_completion(http_request: Request):
     """
     Handle OpenAI-compatible chat completion requests with tool calling support.
+
+    The body is read as raw bytes so PASSTHROUGH requests can be proxied
+    upstream without ever being parsed; everything else is validated here.
     """
+    body = await http_request.body()
+    headers = dict(http_request.headers)
+
+    if is_passthrough(headers):
+        try:
+            upstream = await open_passthrough(body, headers)
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"Upstream request failed: {e}")
+        return StreamingResponse(
+            upstream.aiter_raw(),
+            status_code=upstream.status_code,
+            headers=relay_headers(upstream),
+            background=BackgroundTask(upstream.aclose),
+        )
+
+    try:
+        request = CompletionRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
     try:
         # Extract headers and pass to handler
         print("REQUEST")
-        headers = dict(http_request.headers)
 
         # Pretty-print the request
         # print(f"Method: {http_request.method}")
@@ -44,9 +258,138 @@ async def create_chat_completion(request: CompletionRequest, http_request: Reque
         #     except UnicodeDecodeError:
         #         body = f"<binary data: {len(body_bytes)} bytes>"
 
-        response = await handle_openai_request(request, http_request.base_url, headers)
-        return response
+        # Parse the deadline first: a bad header must not leave a profile running
+        request_deadline = deadline.from_headers(headers)
+        profile, response_headers = _start_profile(http_request)
+        try:
+            try:
+                async with deadline.scope(request_deadline):
+                    response = await _unless_disconnected(
+                        http_request, handle_openai_request(request, http_request.base_url, headers)
+                    )
+            except TimeoutError:
+                deadline.record_cancellation("deadline", request)
+                raise HTTPException(status_code=504, detail="Deadline exceeded")
+            except ClientDisconnected:
+                deadline.record_cancellation("disconnect", request)
+                # Nobody is listening; 499 is what access logs conventionally show
+                return Response(status_code=499)
+            if isinstance(response, CompletionResponse):
+                if not response_headers:
+                    return response
+                # Serialize here so a profile covers building the response body too
+                return Response(response.model_dump_json(), media_type="application/json", headers=response_headers)
+            stream = _sse(deadline.guard_stream(response, request, request_deadline))
+            if profile is not None:
+                # The profile runs until the stream ends
+                stream, profile = _profiled(stream, profile), None
+            return StreamingResponse(stream, media_type="text/event-stream", headers=response_headers)
+        finally:
+            if profile is not None:
+                profiler.finish_profile(profile)
+    except HTTPException:
+        raise
+    except InvalidRequestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except NotImplementedError as e:
         raise HTTPException(status_code=501, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/v1/responses", response_model=ResponseObject)
+async def create_response(request: ResponsesRequest, http_request: Request):
+    """
+    OpenAI Responses API. With `previous_response_id`, the conversation so
+    far (and, unless the request sends its own, the tool set) comes from the
+    response store, so a follow-up sends only its new input.
+    """
+    headers = dict(http_request.headers)
+    try:
+        async with deadline.scope(deadline.from_headers(headers)):
+            return await handle_responses_request(request, http_request.base_url, headers)
+    except TimeoutError:
+        raise HTTPException(status_code=504, detail="Deadline exceeded")
+    except InvalidRequestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/v1/responses/{response_id}", response_model=ResponseObject)
+async def get_response(response_id: str, http_request: Request):
+    record = await asyncio.to_thread(response_store.get, response_id, owner_of(http_request.headers))
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Response with id '{response_id}' not found")
+    return record.response
+
+
+@app.delete("/v1/responses/{response_id}")
+async def delete_response(response_id: str, http_request: Request):
+    if not await asyncio.to_thread(response_store.delete, response_id, owner_of(http_request.headers)):
+        raise HTTPException(status_code=404, detail=f"Response with id '{response_id}' not found")
+    return {"id": response_id, "object": "response", "deleted": True}
+
+
+@app.post("/v1/baml/toolsets", response_model=ToolsetObject, dependencies=[Depends(require_bearer_key)])
+async def create_toolset(request: ToolsetCreateRequest):
+    """
+    Register a tool set once and get back a stable content-hash ID.
+
+    Pass the ID as `toolset_id` (or the X-BAML-Toolset header) on
+    /v1/chat/completions instead of resending `tools`.
+    """
+    try:
+        # Compiles the schema and writes a file, so it runs off the event loop
+        toolset = await asyncio.to_thread(toolsets.register, request.tools)
+    except InvalidRequestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ToolsetObject(id=toolset.id, created=toolset.created, tools=toolset.tools)
+
+
+@app.get("/v1/baml/toolsets/{toolset_id}", response_model=ToolsetObject)
+async def get_toolset(toolset_id: str):
+    toolset = toolsets.get(toolset_id)
+    if toolset is None:
+        raise HTTPException(status_code=404, detail=f"Unknown tool set '{toolset_id}'")
+    return ToolsetObject(id=toolset.id, created=toolset.created, tools=toolset.tools)
+
+
+@app.websocket("/v1/baml/sessions")
+async def sessions(websocket: WebSocket):
+    """
+    Persistent multi-turn sessions: each keeps its compiled tool set and its
+    conversation on the server, and a turn sends only its new messages. See
+    core/sessions.py for the protocol.
+    """
+    headers = dict(websocket.headers)
+    if not headers.get("authorization", "").startswith("Bearer "):
+        # 1008: policy violation, the closest WebSocket code to a 401
+        await websocket.close(code=1008)
+        return
+    if drain.draining:
+        # 1013: try again later
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+    connection = SessionConnection(websocket.send_json, headers)
+    try:
+        while True:
+            await connection.handle(await websocket.receive_text())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await connection.close()
+
+
+@app.get("/v1/baml/mcp", response_model=McpCatalogObject)
+async def get_mcp_catalog():
+    """
+    State of the MCP catalog (BAML_MCP_CATALOG): the tools each server
+    compiled, per-tool compile failures and problems loading the file.
+    """
+    if not mcp_catalog.path:
+        raise HTTPException(status_code=404, detail="No MCP catalog is configured")
+    return McpCatalogObject(**mcp_catalog.diagnostics())
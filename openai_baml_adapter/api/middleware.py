@@ -0,0 +1,267 @@
+import asyncio
+import json
+import uuid
+from typing import List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..core import compression, config, offload
+from ..core.lifecycle import drain
+from ..core.watchdog import inflight
+
+MAX_REQUEST_ID_LENGTH = 128
+
+
+class RequestIdMiddleware:
+    """
+    Give every HTTP request an ID (the client's X-Request-ID, or a new one),
+    return it in the X-Request-ID response header and track it as in flight
+    until the response, streamed or not, has been sent.
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware, which would
+    buffer streaming responses through a task group.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:MAX_REQUEST_ID_LENGTH]
+                break
+        request_id = request_id or f"req_{uuid.uuid4().hex}"
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                # A relayed upstream response keeps the upstream's ID
+                if not any(name.lower() == b"x-request-id" for name, _ in headers):
+                    headers.append((b"x-request-id", request_id.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        inflight.add(request_id, f"{scope['method']} {scope['path']}")
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            inflight.remove(request_id)
+
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+def _header(headers: Headers, name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _without(headers: Headers, *names: bytes) -> Headers:
+    return [(key, value) for key, value in headers if key.lower() not in names]
+
+
+async def _error(send: Send, status: int, detail: str, headers: Headers = []) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+RETRY_ELSEWHERE = [(b"retry-after", b"1"), (b"connection", b"close")]
+
+
+class DrainMiddleware:
+    """
+    Track API requests (under /v1/) as in flight until their response,
+    streamed or not, has been sent, so shutdown can wait for them. Once the
+    worker is draining, refuse new ones with a 503 so the client retries
+    elsewhere.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith("/v1/"):
+            await self.app(scope, receive, send)
+            return
+        if drain.draining:
+            await _error(send, 503, "Server is shutting down", headers=RETRY_ELSEWHERE)
+            return
+
+        started = False
+
+        async def send_tracked(message: Message) -> None:
+            nonlocal started
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            with drain.track():
+                await self.app(scope, receive, send_tracked)
+        except asyncio.CancelledError:
+            # Aborted when the grace period ran out: if nothing has been sent
+            # yet, answer so the client knows to retry instead of seeing a 500
+            if not drain.draining or started:
+                raise
+            await _error(send, 503, "Request aborted: server is shutting down", headers=RETRY_ELSEWHERE)
+
+
+class CompressionMiddleware:
+    """
+    On the paths in BAML_COMPRESSION_PATHS, decode gzip or zstd request
+    bodies and compress responses with the best encoding the client accepts.
+
+    A request body of at least BAML_OFFLOAD_DECOMPRESS_MIN_BYTES is decoded
+    on the CPU thread pool, off the event loop. A response body under
+    BAML_COMPRESS_MIN_BYTES is sent as is. An event stream is compressed as
+    one stream, flushed after every event so events aren't held back. A
+    response that already has a Content-Encoding (a relayed upstream
+    response) is left alone.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in config.COMPRESSION_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        headers = scope["headers"]
+        content_encoding = (_header(headers, b"content-encoding") or "identity").strip().lower()
+        if content_encoding != "identity":
+            chunks = []
+            more_body = True
+            while more_body:
+                message = await receive()
+                if message["type"] != "http.request":
+                    return
+                chunks.append(message.get("body", b""))
+                more_body = message.get("more_body", False)
+            body = b"".join(chunks)
+            try:
+                body = await offload.run_cpu(
+                    len(body), config.OFFLOAD_DECOMPRESS_MIN_BYTES,
+                    compression.decompress, body, content_encoding, config.MAX_DECOMPRESSED_BYTES,
+                )
+            except compression.UnsupportedEncoding as e:
+                await _error(send, 415, str(e))
+                return
+            except compression.BodyTooLarge as e:
+                await _error(send, 413, str(e))
+                return
+            except ValueError as e:
+                await _error(send, 400, str(e))
+                return
+            headers = _without(headers, b"content-encoding", b"content-length")
+            headers.append((b"content-length", str(len(body)).encode()))
+            scope = dict(scope, headers=headers)
+            receive = _replay(body, receive)
+
+        encoding = compression.negotiate(_header(headers, b"accept-encoding") or "")
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, encoding))
+
+
+def _replay(body: bytes, receive: Receive) -> Receive:
+    """A receive that gives the app `body`, then whatever the client sends next (its disconnect)."""
+    sent = False
+
+    async def replay() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
+
+
+class _CompressingSend:
+    """The `send` of one response, compressing its body."""
+
+    def __init__(self, send: Send, encoding: str):
+        self.send = send
+        self.encoding = encoding
+        self.start: Optional[Message] = None
+        self.buffer: List[bytes] = []
+        self.compressor: Optional[compression.Compressor] = None
+        self.flush_each = False
+        self.passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        if self.passthrough:
+            await self.send(message)
+            return
+        if message["type"] == "http.response.start":
+            headers = message.get("headers", [])
+            event_stream = (_header(headers, b"content-type") or "").startswith("text/event-stream")
+            if _header(headers, b"content-encoding") is not None or (event_stream and not config.COMPRESS_STREAMS):
+                self.passthrough = True
+                await self.send(message)
+                return
+            self.start = message
+            if event_stream:
+                self.flush_each = True
+                await self._begin()
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            self.buffer.append(body)
+            size = sum(map(len, self.buffer))
+            if not more_body and size < config.COMPRESS_MIN_BYTES:
+                # Too small to be worth it: send it as it is
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": b"".join(self.buffer)})
+                return
+            if more_body and size < config.COMPRESS_MIN_BYTES:
+                return
+            body, self.buffer = b"".join(self.buffer), []
+            if not more_body:
+                # The whole body is here: its compressed length is known
+                compressor = compression.Compressor(self.encoding, self._level())
+                compressed = compressor.compress(body) + compressor.finish()
+                await self._send_start({b"content-length": str(len(compressed)).encode()})
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            await self._begin()
+
+        out = self.compressor.compress(body, flush=self.flush_each)
+        if not more_body:
+            out += self.compressor.finish()
+        if out or not more_body:
+            await self.send({"type": "http.response.body", "body": out, "more_body": more_body})
+
+    def _level(self) -> int:
+        return config.GZIP_LEVEL if self.encoding == "gzip" else config.ZSTD_LEVEL
+
+    async def _begin(self) -> None:
+        self.compressor = compression.Compressor(self.encoding, self._level())
+        await self._send_start({})
+
+    async def _send_start(self, extra: dict) -> None:
+        headers = _without(self.start.get("headers", []), b"content-length", b"vary", *extra)
+        vary = _header(self.start.get("headers", []), b"vary")
+        headers.append((b"content-encoding", self.encoding.encode()))
+        headers.append((b"vary", (f"{vary}, Accept-Encoding" if vary else "Accept-Encoding").encode()))
+        headers.extend(extra.items())
+        await self.send({**self.start, "headers": headers})
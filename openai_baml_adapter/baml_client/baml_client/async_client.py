@@ -80,6 +80,13 @@ class BamlAsyncClient:
             "messages": messages,"parallel": parallel,
         })
         return typing.cast(types.Response, result.cast_to(types, types, stream_types, False, __runtime__))
+    async def BamlFunctionSchemaFirst(self, messages: typing.List["types.Message"],parallel: bool,
+        baml_options: BamlCallOptions = {},
+    ) -> types.Response:
+        result = await self.__options.merge_options(baml_options).call_function_async(function_name="BamlFunctionSchemaFirst", args={
+            "messages": messages,"parallel": parallel,
+        })
+        return typing.cast(types.Response, result.cast_to(types, types, stream_types, False, __runtime__))
     
 
 
@@ -101,6 +108,18 @@ class BamlStreamClient:
           lambda x: typing.cast(types.Response, x.cast_to(types, types, stream_types, False, __runtime__)),
           ctx,
         )
+    def BamlFunctionSchemaFirst(self, messages: typing.List["types.Message"],parallel: bool,
+        baml_options: BamlCallOptions = {},
+    ) -> baml_py.BamlStream[stream_types.Response, types.Response]:
+        ctx, result = self.__options.merge_options(baml_options).create_async_stream(function_name="BamlFunctionSchemaFirst", args={
+            "messages": messages,"parallel": parallel,
+        })
+        return baml_py.BamlStream[stream_types.Response, types.Response](
+          result,
+          lambda x: typing.cast(stream_types.Response, x.cast_to(types, types, stream_types, True, __runtime__)),
+          lambda x: typing.cast(types.Response, x.cast_to(types, types, stream_types, False, __runtime__)),
+          ctx,
+        )
     
 
 class BamlHttpRequestClient:
@@ -116,6 +135,13 @@ class BamlHttpRequestClient:
             "messages": messages,"parallel": parallel,
         }, mode="request")
         return result
+    async def BamlFunctionSchemaFirst(self, messages: typing.List["types.Message"],parallel: bool,
+        baml_options: BamlCallOptions = {},
+    ) -> baml_py.baml_py.HTTPRequest:
+        result = await self.__options.merge_options(baml_options).create_http_request_async(function_name="BamlFunctionSchemaFirst", args={
+            "messages": messages,"parallel": parallel,
+        }, mode="request")
+        return result
     
 
 class BamlHttpStreamRequestClient:
@@ -131,6 +157,13 @@ class BamlHttpStreamRequestClient:
             "messages": messages,"parallel": parallel,
         }, mode="stream")
         return result
+    async def BamlFunctionSchemaFirst(self, messages: typing.List["types.Message"],parallel: bool,
+        baml_options: BamlCallOptions = {},
+    ) -> baml_py.baml_py.HTTPRequest:
+        result = await self.__options.merge_options(baml_options).create_http_request_async(function_name="BamlFunctionSchemaFirst", args={
+            "messages": messages,"parallel": parallel,
+        }, mode="stream")
+        return result
     
 
 b = BamlAsyncClient(DoNotUseDirectlyCallManager({}))
\ No newline at end of file
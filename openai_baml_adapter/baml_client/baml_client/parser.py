@@ -28,6 +28,12 @@ class LlmResponseParser:
         result = self.__options.merge_options(baml_options).parse_response(function_name="BamlFunction", llm_response=llm_response, mode="request")
         return typing.cast(types.Response, result)
 
+    def BamlFunctionSchemaFirst(
+        self, llm_response: str, baml_options: BamlCallOptions = {},
+    ) -> types.Response:
+        result = self.__options.merge_options(baml_options).parse_response(function_name="BamlFunctionSchemaFirst", llm_response=llm_response, mode="request")
+        return typing.cast(types.Response, result)
+
     
 
 class LlmStreamParser:
@@ -42,4 +48,10 @@ class LlmStreamParser:
         result = self.__options.merge_options(baml_options).parse_response(function_name="BamlFunction", llm_response=llm_response, mode="stream")
         return typing.cast(stream_types.Response, result)
 
+    def BamlFunctionSchemaFirst(
+        self, llm_response: str, baml_options: BamlCallOptions = {},
+    ) -> stream_types.Response:
+        result = self.__options.merge_options(baml_options).parse_response(function_name="BamlFunctionSchemaFirst", llm_response=llm_response, mode="stream")
+        return typing.cast(stream_types.Response, result)
+
     
\ No newline at end of file
@@ -92,6 +92,13 @@ class BamlSyncClient:
             "messages": messages,"parallel": parallel,
         })
         return typing.cast(types.Response, result.cast_to(types, types, stream_types, False, __runtime__))
+    def BamlFunctionSchemaFirst(self, messages: typing.List["types.Message"],parallel: bool,
+        baml_options: BamlCallOptions = {},
+    ) -> types.Response:
+        result = self.__options.merge_options(baml_options).call_function_sync(function_name="BamlFunctionSchemaFirst", args={
+            "messages": messages,"parallel": parallel,
+        })
+        return typing.cast(types.Response, result.cast_to(types, types, stream_types, False, __runtime__))
     
 
 
@@ -113,6 +120,18 @@ class BamlStreamClient:
           lambda x: typing.cast(types.Response, x.cast_to(types, types, stream_types, False, __runtime__)),
           ctx,
         )
+    def BamlFunctionSchemaFirst(self, messages: typing.List["types.Message"],parallel: bool,
+        baml_options: BamlCallOptions = {},
+    ) -> baml_py.BamlSyncStream[stream_types.Response, types.Response]:
+        ctx, result = self.__options.merge_options(baml_options).create_sync_stream(function_name="BamlFunctionSchemaFirst", args={
+            "messages": messages,"parallel": parallel,
+        })
+        return baml_py.BamlSyncStream[stream_types.Response, types.Response](
+          result,
+          lambda x: typing.cast(stream_types.Response, x.cast_to(types, types, stream_types, True, __runtime__)),
+          lambda x: typing.cast(types.Response, x.cast_to(types, types, stream_types, False, __runtime__)),
+          ctx,
+        )
     
 
 class BamlHttpRequestClient:
@@ -128,6 +147,13 @@ class BamlHttpRequestClient:
             "messages": messages,"parallel": parallel,
         }, mode="request")
         return result
+    def BamlFunctionSchemaFirst(self, messages: typing.List["types.Message"],parallel: bool,
+        baml_options: BamlCallOptions = {},
+    ) -> baml_py.baml_py.HTTPRequest:
+        result = self.__options.merge_options(baml_options).create_http_request_sync(function_name="BamlFunctionSchemaFirst", args={
+            "messages": messages,"parallel": parallel,
+        }, mode="request")
+        return result
     
 
 class BamlHttpStreamRequestClient:
@@ -143,6 +169,13 @@ class BamlHttpStreamRequestClient:
             "messages": messages,"parallel": parallel,
         }, mode="stream")
         return result
+    def BamlFunctionSchemaFirst(self, messages: typing.List["types.Message"],parallel: bool,
+        baml_options: BamlCallOptions = {},
+    ) -> baml_py.baml_py.HTTPRequest:
+        result = self.__options.merge_options(baml_options).create_http_request_sync(function_name="BamlFunctionSchemaFirst", args={
+            "messages": messages,"parallel": parallel,
+        }, mode="stream")
+        return result
     
 
 b = BamlSyncClient(DoNotUseDirectlyCallManager({}))
\ No newline at end of file
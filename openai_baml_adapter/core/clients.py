@@ -0,0 +1,58 @@
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+import httpx
+
+from . import config
+
+if TYPE_CHECKING:
+    # The OpenAI SDK is the slowest import in the server; it's loaded on first use
+    from openai import AsyncOpenAI
+
+# AsyncOpenAI clients keyed by API key, most recently used last. They all share
+# the upstream HTTP client below, so its connection pool (and TLS sessions)
+# stays warm across requests, keys and paths.
+_openai_clients: "OrderedDict[str, AsyncOpenAI]" = OrderedDict()
+
+CONNECT_TIMEOUT = 10.0
+
+# Shared upstream HTTP client, also used for byte-level proxying.
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared upstream HTTP client, creating it on first use."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            base_url=config.OPENAI_BASE_URL,
+            timeout=httpx.Timeout(config.UPSTREAM_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=100),
+        )
+    return _http_client
+
+
+def get_openai_client(api_key: str) -> "AsyncOpenAI":
+    """Return the pooled AsyncOpenAI client for `api_key`, creating it on first use."""
+    client = _openai_clients.get(api_key)
+    if client is not None:
+        _openai_clients.move_to_end(api_key)
+        return client
+
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI(api_key=api_key, base_url=config.OPENAI_BASE_URL, http_client=get_http_client())
+    _openai_clients[api_key] = client
+    # Evicted clients are only dropped: the HTTP client they wrap is shared
+    while len(_openai_clients) > config.OPENAI_CLIENT_POOL_SIZE:
+        _openai_clients.popitem(last=False)
+    return client
+
+
+async def close_clients() -> None:
+    """Drop every pooled client and close the shared HTTP client; used on shutdown."""
+    global _http_client
+    _openai_clients.clear()
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -0,0 +1,91 @@
+"""
+Coalescing and backpressure for streamed partial updates.
+
+A partial tool call could be re-parsed and sent on every upstream delta, but
+each parse costs a SAP pass and each chunk a serialization and a write, and
+a client that reads slowly only sees the backlog grow. So a stream
+
+  - re-parses the call it is writing only once a `CoalesceWindow` is due
+    (BAML_STREAM_COALESCE_MS or BAML_STREAM_COALESCE_TOKENS deltas since the
+    last update, whichever comes first), and
+  - hands its events to the client through a `StreamBuffer`: finished calls
+    and the end of each choice wait in a bounded queue and are never
+    dropped, while a choice's partial update replaces the one before it
+    when the client hasn't taken that yet.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Generic, Hashable, Optional, TypeVar
+
+from . import metrics
+
+T = TypeVar("T")
+
+PARTIALS = metrics.Counter(
+    "baml_stream_partials_total",
+    "Partial updates of streamed tool calls, by outcome (sent, or superseded before the client read them)",
+)
+
+
+class CoalesceWindow:
+    """Due every `interval` seconds or every `tokens` deltas, whichever comes first."""
+
+    def __init__(self, interval: float, tokens: int):
+        self.interval = interval
+        self.tokens = tokens
+        self._count = 0
+        self._since = time.monotonic()
+
+    def add(self, tokens: int = 1) -> bool:
+        """Count `tokens` more deltas; returns whether an update is due."""
+        self._count += tokens
+        return (self.tokens > 0 and self._count >= self.tokens) or time.monotonic() - self._since >= self.interval
+
+    def reset(self) -> None:
+        self._count = 0
+        self._since = time.monotonic()
+
+
+class StreamBuffer(Generic[T]):
+    """
+    Events between a stream's producers and the task writing to the client.
+
+    `put` queues an event that must be delivered, waiting while `maxsize`
+    are pending, which in turn stops the producer reading from upstream.
+    `put_partial` keeps at most one partial update per key; an older one the
+    client hasn't taken yet is dropped as stale. A key's pending partial is
+    also dropped by `put(..., key=key)`, whose event supersedes it. `get`
+    returns queued events first, in order, then pending partials.
+    """
+
+    def __init__(self, maxsize: int):
+        self._events: asyncio.Queue = asyncio.Queue(maxsize)
+        self._partials: Dict[Hashable, T] = {}
+        self._order: Deque[Hashable] = deque()
+        self._ready = asyncio.Event()
+
+    async def put(self, event: T, key: Optional[Hashable] = None) -> None:
+        if key is not None and self._partials.pop(key, None) is not None:
+            self._order.remove(key)
+            PARTIALS.inc(outcome="superseded")
+        await self._events.put(event)
+        self._ready.set()
+
+    def put_partial(self, key: Hashable, event: T) -> None:
+        if key in self._partials:
+            PARTIALS.inc(outcome="superseded")
+        else:
+            self._order.append(key)
+        self._partials[key] = event
+        self._ready.set()
+
+    async def get(self) -> T:
+        while True:
+            if not self._events.empty():
+                return self._events.get_nowait()
+            if self._order:
+                PARTIALS.inc(outcome="sent")
+                return self._partials.pop(self._order.popleft())
+            self._ready.clear()
+            await self._ready.wait()
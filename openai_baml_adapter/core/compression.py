@@ -0,0 +1,111 @@
+"""
+Request and response body compression.
+
+Both gzip and zstd are accepted and offered. Compressors support a sync
+flush, which ends the compressed output at a byte boundary without ending the
+stream, so each server-sent event can reach the client as soon as it is
+written instead of waiting in the compressor's window.
+"""
+import io
+import zlib
+from typing import Optional
+
+import zstandard
+
+from . import metrics
+
+# In order of preference when the client accepts several
+ENCODINGS = ("zstd", "gzip")
+
+BODY_BYTES = metrics.Counter(
+    "baml_compression_bytes_total",
+    "Compressed body bytes on the wire and their uncompressed size, by direction and form",
+)
+
+
+class UnsupportedEncoding(ValueError):
+    """The body's Content-Encoding isn't one we can decode (HTTP 415)."""
+
+
+class BodyTooLarge(ValueError):
+    """The body decompresses to more than the allowed size (HTTP 413)."""
+
+
+def decompress(body: bytes, encoding: str, max_size: int) -> bytes:
+    """
+    Decode a request body, refusing to inflate it past `max_size` bytes.
+    Raises ValueError for a body that isn't valid in its encoding.
+    """
+    if encoding == "gzip":
+        decoder = zlib.decompressobj(wbits=31)
+        try:
+            data = decoder.decompress(body, max_size + 1)
+        except zlib.error as e:
+            raise ValueError(f"Invalid gzip body: {e}")
+        if len(data) > max_size or decoder.unconsumed_tail:
+            raise BodyTooLarge(f"Request body is larger than {max_size} bytes uncompressed")
+        if not decoder.eof:
+            raise ValueError("Invalid gzip body: truncated")
+    elif encoding == "zstd":
+        try:
+            data = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)).read(max_size + 1)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Invalid zstd body: {e}")
+        if len(data) > max_size:
+            raise BodyTooLarge(f"Request body is larger than {max_size} bytes uncompressed")
+    else:
+        raise UnsupportedEncoding(f"Unsupported Content-Encoding '{encoding}'; use one of {', '.join(ENCODINGS)}")
+    BODY_BYTES.inc(len(body), direction="request", form="wire")
+    BODY_BYTES.inc(len(data), direction="request", form="raw")
+    return data
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The encoding to answer with for this Accept-Encoding header, if any."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+class Compressor:
+    """An incremental compressor for one response body."""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        """Compress `data`; with `flush`, also emit everything buffered so far."""
+        out = self._compressor.compress(data)
+        if flush:
+            out += self._compressor.flush(
+                zlib.Z_SYNC_FLUSH if self.encoding == "gzip" else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            )
+        self._count(len(data), len(out))
+        return out
+
+    def finish(self) -> bytes:
+        out = self._compressor.flush()
+        self._count(0, len(out))
+        return out
+
+    def _count(self, raw: int, wire: int) -> None:
+        BODY_BYTES.inc(raw, direction="response", form="raw")
+        BODY_BYTES.inc(wire, direction="response", form="wire")
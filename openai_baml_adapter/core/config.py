@@ -0,0 +1,153 @@
+import os
+import tempfile
+
+# Prompt layout used for the BAML path when the request doesn't pick one.
+#   "conversation-first": conversation, then the tool schema (BamlFunction)
+#   "schema-first": tool schema in a leading system message (BamlFunctionSchemaFirst)
+PROMPT_LAYOUT = os.getenv("BAML_PROMPT_LAYOUT", "conversation-first")
+
+# Maximum number of pooled upstream OpenAI clients (one per API key).
+OPENAI_CLIENT_POOL_SIZE = int(os.getenv("BAML_OPENAI_CLIENT_POOL_SIZE", "64"))
+
+# Maximum number of concurrent BAML calls per request when fanning out for n > 1.
+FANOUT_CONCURRENCY = int(os.getenv("BAML_FANOUT_CONCURRENCY", "4"))
+
+# Largest `n` a request with tools may ask for; a larger one is a 400.
+MAX_N = int(os.getenv("BAML_MAX_N", "16"))
+
+# Upstream OpenAI-compatible API used by passthrough, the plain-chat path and BAML.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+
+# Read timeout (seconds) for upstream HTTP calls made by the pooled HTTP client.
+UPSTREAM_TIMEOUT = float(os.getenv("BAML_UPSTREAM_TIMEOUT", "600"))
+
+# Maximum number of compiled tool schemas kept per worker.
+SCHEMA_CACHE_SIZE = int(os.getenv("BAML_SCHEMA_CACHE_SIZE", "256"))
+
+# Where registered tool sets are persisted so they survive restarts.
+TOOLSET_DIR = os.getenv(
+    "BAML_TOOLSET_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "openai-baml-adapter", "toolsets"),
+)
+# At most this many tool sets are kept (the oldest are evicted to make room),
+# each at most TOOLSET_MAX_BYTES of JSON.
+TOOLSET_MAX_COUNT = int(os.getenv("BAML_TOOLSET_MAX_COUNT", "1000"))
+TOOLSET_MAX_BYTES = int(os.getenv("BAML_TOOLSET_MAX_BYTES", str(1024 * 1024)))
+
+# Warm up each worker at startup (load the BAML runtime, compile registered
+# tool sets, open upstream connections); /ready reports 503 until it's done.
+WARMUP = os.getenv("BAML_WARMUP", "1").lower() not in ("0", "false", "")
+
+# On shutdown, stop taking new work and give requests and streams already
+# running this many seconds to finish before aborting them. Keep it below the
+# platform's kill timeout (kill_timeout in fly.toml).
+SHUTDOWN_GRACE_SECONDS = float(os.getenv("BAML_SHUTDOWN_GRACE_SECONDS", "25"))
+
+# Compiled tool schemas are shared between the workers on a host through a
+# memory-mapped file of this size (MB); 0 disables sharing.
+SHARED_SCHEMA_CACHE_MB = float(os.getenv("BAML_SHARED_SCHEMA_CACHE_MB", "64"))
+SHARED_SCHEMA_CACHE_PATH = os.getenv(
+    "BAML_SHARED_SCHEMA_CACHE_PATH",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "openai-baml-adapter-schemas"),
+)
+
+# MCP servers file (`{"servers": {name: [tool, ...]}}`) served as the `mcp`
+# tool sets, and how often (seconds) it is checked for changes.
+MCP_CATALOG = os.getenv("BAML_MCP_CATALOG")
+MCP_CATALOG_POLL_SECONDS = float(os.getenv("BAML_MCP_CATALOG_POLL_SECONDS", "2"))
+
+# Compile budget for tool schemas: total schema nodes per request and nesting
+# depth. Requests over either limit are rejected with a 400.
+SCHEMA_MAX_NODES = int(os.getenv("BAML_SCHEMA_MAX_NODES", "25000"))
+SCHEMA_MAX_DEPTH = int(os.getenv("BAML_SCHEMA_MAX_DEPTH", "64"))
+
+# Schema compilation (tools JSON) and output parsing (model reply) with
+# inputs of at least this many bytes run on a thread pool of CPU_THREADS
+# instead of the event loop. Parsing costs far more per byte than compiling.
+OFFLOAD_COMPILE_MIN_BYTES = int(os.getenv("BAML_OFFLOAD_COMPILE_MIN_BYTES", "32768"))
+OFFLOAD_PARSE_MIN_BYTES = int(os.getenv("BAML_OFFLOAD_PARSE_MIN_BYTES", "2048"))
+CPU_THREADS = int(os.getenv("BAML_CPU_THREADS", str(min(4, os.cpu_count() or 1))))
+
+# When > 0, offloaded compilation and parsing run in a pool of this many
+# processes instead, which keeps them from holding this process's GIL.
+CPU_PROCESSES = int(os.getenv("BAML_CPU_PROCESSES", "0"))
+
+# Event-loop watchdog: a heartbeat every STALL_INTERVAL_MS feeds the lag
+# histogram, and a loop that misses it for STALL_THRESHOLD_MS is recorded as a
+# stall with sampled stacks (GET /debug/stalls).
+STALL_WATCHDOG = os.getenv("BAML_STALL_WATCHDOG", "1").lower() not in ("0", "false", "")
+STALL_INTERVAL_MS = float(os.getenv("BAML_STALL_INTERVAL_MS", "50"))
+STALL_THRESHOLD_MS = float(os.getenv("BAML_STALL_THRESHOLD_MS", "200"))
+
+# API keys (comma-separated) allowed to use the /debug endpoints. Empty
+# disables them.
+DEBUG_KEYS = frozenset(key.strip() for key in os.getenv("BAML_DEBUG_KEYS", "").split(",") if key.strip())
+
+# Per-request profiling (X-BAML-Profile, keys in DEBUG_KEYS only): sampling
+# interval, where the folded-stack files go, and limits that keep it cheap.
+PROFILE_DIR = os.getenv("BAML_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "openai-baml-adapter-profiles"))
+PROFILE_INTERVAL_MS = float(os.getenv("BAML_PROFILE_INTERVAL_MS", "2"))
+PROFILE_MAX_PER_MINUTE = int(os.getenv("BAML_PROFILE_MAX_PER_MINUTE", "6"))
+PROFILE_MAX_SECONDS = float(os.getenv("BAML_PROFILE_MAX_SECONDS", "30"))
+
+# Heap inspection (/debug/heap): trace Python allocations from startup rather
+# than from the first baseline, and how many frames to keep per allocation.
+TRACEMALLOC = os.getenv("BAML_TRACEMALLOC", "0").lower() not in ("0", "false", "")
+TRACEMALLOC_FRAMES = int(os.getenv("BAML_TRACEMALLOC_FRAMES", "1"))
+
+# Completion tokens a cancelled upstream call is assumed to have saved when the
+# request doesn't set max_tokens (for baml_cancelled_tokens_saved_total).
+CANCEL_TOKEN_ESTIMATE = int(os.getenv("BAML_CANCEL_TOKEN_ESTIMATE", "256"))
+
+# With a deadline, BAML calls stop this long before it to leave time for
+# parsing the partial reply and building the response, but never more than
+# half the request's budget before it.
+DEADLINE_RESERVE_MS = float(os.getenv("BAML_DEADLINE_RESERVE_MS", "100"))
+
+# Streamed BAML calls are cancelled once the Response object has closed,
+# instead of waiting for any text the model adds after it. A request can
+# override this with X-BAML-Early-Stop: 0 or 1.
+EARLY_STOP = os.getenv("BAML_EARLY_STOP", "1").lower() not in ("0", "false", "")
+
+# Streamed partial tool calls (X-BAML-Stream-Partials): the call being written
+# is re-parsed at most once per STREAM_COALESCE_MS or STREAM_COALESCE_TOKENS
+# upstream deltas, whichever comes first. STREAM_BUFFER bounds the events a
+# stream holds for a client that isn't reading.
+STREAM_COALESCE_MS = float(os.getenv("BAML_STREAM_COALESCE_MS", "100"))
+STREAM_COALESCE_TOKENS = int(os.getenv("BAML_STREAM_COALESCE_TOKENS", "16"))
+STREAM_BUFFER = int(os.getenv("BAML_STREAM_BUFFER", "64"))
+
+# WebSocket sessions (/v1/baml/sessions) one connection may hold at a time.
+SESSIONS_PER_CONNECTION = int(os.getenv("BAML_SESSIONS_PER_CONNECTION", "16"))
+# Turns one connection may have running or queued behind their session's
+# earlier turns; more are refused until some finish.
+SESSION_TURNS_PER_CONNECTION = int(os.getenv("BAML_SESSION_TURNS_PER_CONNECTION", "64"))
+# Messages a session keeps after its opening ones; older turns are dropped.
+SESSION_HISTORY_MESSAGES = int(os.getenv("BAML_SESSION_HISTORY_MESSAGES", "200"))
+
+# /v1/responses keeps conversations for previous_response_id: at most
+# RESPONSE_STORE_MEMORY_ITEMS responses in memory, the least recently used
+# beyond that spilling to a sqlite database at RESPONSE_STORE_PATH (empty:
+# dropped instead). Responses expire RESPONSE_STORE_TTL seconds after creation.
+RESPONSE_STORE_TTL = float(os.getenv("BAML_RESPONSE_STORE_TTL", "86400"))
+RESPONSE_STORE_MEMORY_ITEMS = int(os.getenv("BAML_RESPONSE_STORE_MEMORY_ITEMS", "10000"))
+RESPONSE_STORE_PATH = os.getenv("BAML_RESPONSE_STORE_PATH", "")
+
+# Body compression on COMPRESSION_PATHS (comma-separated). Requests may be
+# sent gzip- or zstd-encoded, up to MAX_DECOMPRESSED_BYTES once decoded.
+# Responses are compressed when the client accepts it and the body is at least
+# COMPRESS_MIN_BYTES; event streams are compressed whole, flushed per event.
+COMPRESSION_PATHS = frozenset(
+    path.strip()
+    for path in os.getenv("BAML_COMPRESSION_PATHS", "/v1/chat/completions,/v1/responses").split(",")
+    if path.strip()
+)
+MAX_DECOMPRESSED_BYTES = int(os.getenv("BAML_MAX_DECOMPRESSED_BYTES", str(64 * 1024 * 1024)))
+# Request bodies of at least this many bytes (still encoded) are decoded on
+# the CPU thread pool instead of the event loop. A body can expand a
+# thousandfold, so this is low.
+OFFLOAD_DECOMPRESS_MIN_BYTES = int(os.getenv("BAML_OFFLOAD_DECOMPRESS_MIN_BYTES", "4096"))
+COMPRESS_MIN_BYTES = int(os.getenv("BAML_COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_STREAMS = os.getenv("BAML_COMPRESS_STREAMS", "1").lower() not in ("0", "false", "")
+GZIP_LEVEL = int(os.getenv("BAML_GZIP_LEVEL", "6"))
+ZSTD_LEVEL = int(os.getenv("BAML_ZSTD_LEVEL", "3"))
@@ -0,0 +1,187 @@
+"""
+Client deadlines and cancellation of upstream work.
+
+A client may send X-BAML-Timeout-Ms, how long it's willing to wait for the
+response. The request then runs under that deadline: every upstream call
+gets the remaining budget as its timeout, and whatever is still running when
+it expires is cancelled, as it is when the client disconnects. Cancelled
+requests are counted by reason, with an estimate of the completion tokens
+the cancellation saved: the request's max_tokens (or
+BAML_CANCEL_TOKEN_ESTIMATE) per sample, less what had already streamed.
+
+A streamed BAML call is also cancelled once its answer is complete (see
+EarlyStop), rather than paying for whatever the model writes after it.
+"""
+import asyncio
+import math
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Optional, TypeVar
+
+import httpx
+
+from . import config, metrics
+from .clients import CONNECT_TIMEOUT
+from .errors import InvalidRequestError
+from ..models.openai import CompletionRequest
+
+T = TypeVar("T")
+
+DEADLINE_HEADER = "x-baml-timeout-ms"
+EARLY_STOP_HEADER = "x-baml-early-stop"
+
+CANCELLED = metrics.Counter("baml_cancelled_requests_total", "Requests cancelled before finishing, by reason")
+TOKENS_SAVED = metrics.Counter(
+    "baml_cancelled_tokens_saved_total", "Estimated completion tokens not generated because a request was cancelled"
+)
+EARLY_STOPS = metrics.Counter(
+    "baml_early_stops_total", "Streamed BAML calls cancelled because the Response had already closed"
+)
+EARLY_STOP_TOKENS_SAVED = metrics.Counter(
+    "baml_early_stop_tokens_saved_total", "Estimated completion tokens not generated thanks to early stops"
+)
+EARLY_STOP_MS_SAVED = metrics.Counter(
+    "baml_early_stop_ms_saved_total", "Estimated upstream generation time not waited for thanks to early stops"
+)
+
+
+class Deadline:
+    """A point on the event loop's clock by which the response is due."""
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = asyncio.get_running_loop().time() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - asyncio.get_running_loop().time())
+
+    def stop_at(self, reserve: float) -> float:
+        """
+        When work should stop to leave `reserve` seconds before the deadline.
+        A short budget keeps at least half of itself for the work.
+        """
+        return self.expires_at - min(reserve, self.budget / 2)
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("baml_deadline", default=None)
+
+
+def from_headers(headers: Dict[str, str]) -> Optional[Deadline]:
+    """The request's deadline from X-BAML-Timeout-Ms, or None if it has none."""
+    value = headers.get(DEADLINE_HEADER)
+    if value is None:
+        return None
+    try:
+        ms = float(value)
+    except ValueError:
+        ms = math.nan
+    if not (ms > 0 and math.isfinite(ms)):
+        raise InvalidRequestError(f"{DEADLINE_HEADER} must be a positive number of milliseconds")
+    return Deadline(ms / 1000)
+
+
+def current() -> Optional[Deadline]:
+    return _current.get()
+
+
+@asynccontextmanager
+async def scope(deadline: Optional[Deadline]) -> AsyncIterator[None]:
+    """
+    Run the body under `deadline`: upstream calls made inside it get the
+    remaining budget as their timeout, and it raises TimeoutError (cancelling
+    the body) once the deadline passes.
+    """
+    if deadline is None:
+        yield
+        return
+    token = _current.set(deadline)
+    try:
+        async with asyncio.timeout_at(deadline.expires_at):
+            yield
+    finally:
+        _current.reset(token)
+
+
+def upstream_timeout() -> httpx.Timeout:
+    """Timeout for an upstream call: the pool's timeouts, capped at the remaining budget."""
+    deadline = _current.get()
+    if deadline is None:
+        return httpx.Timeout(config.UPSTREAM_TIMEOUT, connect=CONNECT_TIMEOUT)
+    remaining = max(0.001, deadline.remaining())
+    return httpx.Timeout(min(config.UPSTREAM_TIMEOUT, remaining), connect=min(CONNECT_TIMEOUT, remaining))
+
+
+def record_cancellation(
+    reason: str, request: CompletionRequest, produced_tokens: int = 0, samples: Optional[int] = None
+) -> None:
+    """Count a cancellation of `samples` of the request's samples (all of them by default)."""
+    CANCELLED.inc(reason=reason)
+    expected = (request.max_tokens or config.CANCEL_TOKEN_ESTIMATE) * (samples or request.n or 1)
+    TOKENS_SAVED.inc(max(0, expected - produced_tokens), reason=reason)
+
+
+async def guard_stream(
+    chunks: AsyncIterator[T], request: CompletionRequest, deadline: Optional[Deadline]
+) -> AsyncIterator[T]:
+    """
+    Relay a streamed response under `deadline`, closing the upstream stream
+    when the deadline passes (raising TimeoutError) or the client goes away.
+    """
+    produced = 0
+    iterator = chunks.__aiter__()
+    try:
+        while True:
+            # The deadline covers waiting on upstream, never the client's reads
+            async with scope(deadline):
+                try:
+                    chunk = await anext(iterator)
+                except StopAsyncIteration:
+                    return
+            produced += 1
+            yield chunk
+    except TimeoutError:
+        record_cancellation("deadline", request, produced)
+        raise
+    except (asyncio.CancelledError, GeneratorExit):
+        record_cancellation("disconnect", request, produced)
+        raise
+    finally:
+        close = getattr(chunks, "close", None) or getattr(chunks, "aclose", None)
+        if close is not None:
+            await close()
+
+
+class EarlyStop:
+    """
+    Whether a request's streamed BAML calls stop as soon as the top-level
+    Response object has closed in the output, and the accounting when one
+    does. What is saved is estimated like a cancellation's: `expected_tokens`
+    less the deltas received, at the rate the deltas had been arriving.
+    """
+
+    def __init__(self, expected_tokens: int):
+        self.expected_tokens = expected_tokens
+
+    @classmethod
+    def for_request(cls, request: CompletionRequest, headers: Dict[str, str]) -> Optional["EarlyStop"]:
+        """
+        The request's early stop, unless X-BAML-Early-Stop (or BAML_EARLY_STOP)
+        turns it off. Requests whose response reports `usage` (non-streamed, or
+        streamed with `include_usage`) never stop early: upstream sends usage
+        only after the answer, and stopping would report it as zero.
+        """
+        if not request.stream or (request.stream_options or {}).get("include_usage"):
+            return None
+        value = headers.get(EARLY_STOP_HEADER)
+        enabled = config.EARLY_STOP if value is None else value.lower() not in ("0", "false")
+        if not enabled:
+            return None
+        return cls(request.max_tokens or config.CANCEL_TOKEN_ESTIMATE)
+
+    def record(self, produced_tokens: int, seconds: float) -> None:
+        """Count a call stopped after `produced_tokens` deltas, received over `seconds`."""
+        saved = max(0, self.expected_tokens - produced_tokens)
+        EARLY_STOPS.inc()
+        EARLY_STOP_TOKENS_SAVED.inc(saved)
+        if produced_tokens > 1:
+            EARLY_STOP_MS_SAVED.inc(saved * seconds / (produced_tokens - 1) * 1000)
@@ -0,0 +1,6 @@
+class InvalidRequestError(ValueError):
+    """The request is well-formed JSON but can't be served as asked (HTTP 400)."""
+
+
+class SchemaTooComplexError(InvalidRequestError):
+    """A tool schema exceeds the compile budget (BAML_SCHEMA_MAX_NODES / BAML_SCHEMA_MAX_DEPTH)."""
@@ -1,138 +1,519 @@
 from baml_py import ClientRegistry
+import asyncio
 import json
-import os
 import time
 import uuid
-from typing import List, Any, Optional, Dict
+import warnings
+from contextlib import aclosing
+from typing import TYPE_CHECKING, List, Any, Optional, Dict, Tuple, Union, AsyncIterator, Callable
 
 from httpcore import URL
-from openai import AsyncOpenAI
-from ..baml_client.baml_client.async_client import b
-from ..baml_client.baml_client.types import Message as BamlMessage
-from ..baml_client.baml_client.type_builder import TypeBuilder
+from pydantic import BaseModel
+from pydantic_core import to_json
 from ..models.openai import (
     CompletionRequest, 
     CompletionResponse, 
     Choice, 
     Message, 
     Usage,
+    PromptTokensDetails,
     ToolCall,
-    FunctionCall
+    FunctionCall,
+    CompletionChunk,
+    ChunkChoice,
+    Delta,
+    ToolCallDelta,
+    FunctionCallDelta,
 )
-from .parse import parse_openai_tools
+from . import config, deadline, offload
+from .clients import get_http_client, get_openai_client
+from .coalesce import CoalesceWindow, StreamBuffer
+from .errors import InvalidRequestError
+from .schema_cache import schema_cache, tools_digest
+from .mcp_catalog import is_mcp_toolset, mcp_catalog
+from .partial import ToolCallScanner, complete_tool_calls, required_fields
+from .toolsets import toolsets
 
+if TYPE_CHECKING:
+    from ..baml_client.baml_client.type_builder import TypeBuilder
+    from ..baml_client.baml_client.types import Message as BamlMessage
 
-async def handle_openai_request(request: CompletionRequest, base_url: URL, headers: Dict[str, str]) -> CompletionResponse:
+
+# BAML functions for each prompt layout, keyed by the name used in the
+# X-BAML-Prompt-Layout header and the BAML_PROMPT_LAYOUT setting.
+PROMPT_LAYOUTS = {
+    "conversation-first": "BamlFunction",
+    "schema-first": "BamlFunctionSchemaFirst",
+}
+
+
+def baml_client():
     """
-    Process OpenAI tool-calling request and return a completion response.
-    
-    If PASSTHROUGH header is present and truthy, forward to OpenAI.
-    Otherwise, process through BAML (not implemented yet).
-    
-    Args:
-        request: OpenAI completion request with tools
-        headers: HTTP headers from the request
-        
-    Returns:
-        OpenAI completion response
+    The generated async BAML client.
+
+    Imported on first use rather than at module import, because importing
+    it builds the BAML runtime; passthrough and plain-chat workers never
+    need it, and warm-up loads it off the critical path.
     """
-    # Check for PASSTHROUGH header
+    from ..baml_client.baml_client.async_client import b
+    return b
 
-    # print(request)
 
-    passthrough = headers.get("passthrough", headers.get("PASSTHROUGH", ""))
-    
-    if passthrough and passthrough.lower() not in ["false", "0", ""]:
-        # Forward to OpenAI
-        client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-        # Convert our request model to dict for OpenAI client
-        request_dict = request.model_dump(exclude_none=True)
-        
-        # Call OpenAI
-        openai_response = await client.chat.completions.create(**request_dict)
-        
-        # Convert OpenAI response to our response model
-        return CompletionResponse(
-            id=openai_response.id,
-            object=openai_response.object,
-            created=openai_response.created,
-            model=openai_response.model,
-            choices=[
-                Choice(
-                    index=choice.index,
-                    message=Message(
-                        role=choice.message.role,
-                        content=choice.message.content,
-                        tool_calls=[
-                            ToolCall(
-                                id=tc.id,
-                                type=tc.type,
-                                function=FunctionCall(
-                                    name=tc.function.name,
-                                    arguments=tc.function.arguments
-                                )
-                            ) for tc in (choice.message.tool_calls or [])
-                        ] if choice.message.tool_calls else None
-                    ),
-                    finish_reason=choice.finish_reason
-                ) for choice in openai_response.choices
-            ],
-            usage=Usage(
-                prompt_tokens=openai_response.usage.prompt_tokens,
-                completion_tokens=openai_response.usage.completion_tokens,
-                total_tokens=openai_response.usage.total_tokens
-            ) if openai_response.usage else None
+def baml_sync_client():
+    """The generated sync BAML client, used for parsing (imported on first use like baml_client)."""
+    from ..baml_client.baml_client.sync_client import b
+    return b
+
+
+def _select_prompt_layout(headers: Dict[str, str]) -> str:
+    """Name of the BAML function for the request's prompt layout."""
+    layout = headers.get("x-baml-prompt-layout") or config.PROMPT_LAYOUT
+    if layout not in PROMPT_LAYOUTS:
+        raise InvalidRequestError(
+            f"Unknown prompt layout '{layout}', expected one of: {', '.join(PROMPT_LAYOUTS)}"
         )
-    
-    # BAML processing
-    # Initialize BAML client
+    return PROMPT_LAYOUTS[layout]
+
+
+def _usage_from_upstream(usages: List[Dict[str, Any]]) -> Usage:
+    """Sum the upstream `usage` objects of every call, including cached prompt tokens."""
+    prompt_tokens = 0
+    completion_tokens = 0
+    cached_tokens = 0
+    for usage in usages:
+        prompt_tokens += usage.get("prompt_tokens") or 0
+        completion_tokens += usage.get("completion_tokens") or 0
+        details = usage.get("prompt_tokens_details") or {}
+        cached_tokens += details.get("cached_tokens") or 0
+    return Usage(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+        prompt_tokens_details=PromptTokensDetails(cached_tokens=cached_tokens),
+    )
+
+
+def _completion_from_openai(openai_response) -> CompletionResponse:
+    """Convert an OpenAI SDK chat completion into our response model."""
+    return CompletionResponse(
+        id=openai_response.id,
+        object=openai_response.object,
+        created=openai_response.created,
+        model=openai_response.model,
+        choices=[
+            Choice(
+                index=choice.index,
+                message=Message(
+                    role=choice.message.role,
+                    content=choice.message.content,
+                    tool_calls=[
+                        ToolCall(
+                            id=tc.id,
+                            type=tc.type,
+                            function=FunctionCall(
+                                name=tc.function.name,
+                                arguments=tc.function.arguments
+                            )
+                        ) for tc in (choice.message.tool_calls or [])
+                    ] if choice.message.tool_calls else None
+                ),
+                finish_reason=choice.finish_reason
+            ) for choice in openai_response.choices
+        ],
+        usage=Usage(
+            prompt_tokens=openai_response.usage.prompt_tokens,
+            completion_tokens=openai_response.usage.completion_tokens,
+            total_tokens=openai_response.usage.total_tokens,
+            prompt_tokens_details=PromptTokensDetails(
+                cached_tokens=openai_response.usage.prompt_tokens_details.cached_tokens or 0
+            ) if openai_response.usage.prompt_tokens_details else None
+        ) if openai_response.usage else None
+    )
+
+
+def _to_baml_messages(messages: List[Dict[str, Any]]) -> List["BamlMessage"]:
+    """
+    Convert raw OpenAI messages to BAML messages.
+
+    Only role and text content are read (and therefore validated). Content
+    given as a list of parts keeps its text parts.
+    """
+    from ..baml_client.baml_client.types import Message as BamlMessage
 
-    cr = ClientRegistry()
-    # TODO: This assumes the Authorization header has
-    # a value like "Bearer THE_KEY", and just takes "THE_KEY".
-    api_key = headers.get("authorization", "").split(" ")[1]
-    cr.add_llm_client(name="RequestClient", provider="openai", options={
-        "model": request.model,
-        "api_key": api_key
-    })
-    cr.set_primary("RequestClient")
-    
-    # client = cr.get_llm_client("RequestModel")
-    # response = client.generate(request.messages)
-    # print(response)
-    
-    tb = TypeBuilder()
-    # Convert Tool objects to dicts for parse_openai_tools
-    print(request.tools)
-    tools_dict = [tool.model_dump() for tool in request.tools] if request.tools else []
-    parsed_tools = parse_openai_tools(tools_dict, tb)
-    
-    # Extract just the FieldType objects from the parsed tools
-    tool_types = [field_type for field_type, _ in parsed_tools.values()]
-    print("tool_types")
-    print(tool_types)
-    
-    # Create union of tool types if any exist
-    if tool_types:
-        tb.Response.add_property("tool_call", tb.list(tb.union(tool_types)))
-    
-    # Convert OpenAI messages to BAML messages
     baml_messages = []
-    for msg in request.messages:
+    for msg in messages:
+        if not isinstance(msg, dict) or not isinstance(msg.get("role"), str):
+            raise InvalidRequestError("each message must be an object with a string role")
+        content = msg.get("content") or ""
+        if isinstance(content, list):
+            content = "\n".join(
+                part.get("text", "") for part in content
+                if isinstance(part, dict) and part.get("type") == "text"
+            )
+        elif not isinstance(content, str):
+            raise InvalidRequestError("message content must be a string or a list of content parts")
         # BAML Message expects role and content
-        baml_messages.append(BamlMessage(role=msg.role, content=msg.content or ""))
-    
-    # Call BAML function with the converted messages
-    baml_response = await b.BamlFunction(baml_messages, True, baml_options={"tb": tb, "client_registry": cr})
-    
+        baml_messages.append(BamlMessage(role=msg["role"], content=content))
+    return baml_messages
+
+
+def _check_request(request: CompletionRequest) -> None:
+    """
+    Check the containers CompletionRequest doesn't validate, and give tools
+    sent without a `type` the default "function", as the Tool model does.
+    """
+    if not isinstance(request.messages, list):
+        raise InvalidRequestError("messages must be a list")
+    tools = request.tools
+    if tools is None:
+        return
+    if not isinstance(tools, list) or not all(isinstance(tool, dict) for tool in tools):
+        raise InvalidRequestError("tools must be a list of objects")
+    if not all("type" in tool for tool in tools):
+        tools = [tool if "type" in tool else {"type": "function", **tool} for tool in tools]
+        request.set_tools(tools, to_json(tools))
+
+
+def _function_name(tool: Dict[str, Any]) -> Optional[str]:
+    function = tool.get("function")
+    return function.get("name") if isinstance(function, dict) else None
+
+
+def _select_tools(request: CompletionRequest) -> Tuple[List[Dict[str, Any]], bool, bytes]:
+    """
+    Apply tool_choice and parallel_tool_calls to the request's tools.
+
+    Returns the tool dicts that need compiling, whether the model may call
+    several of them at once, and the JSON encoding of those tools (the
+    schema cache key). Only the tools returned here end up in the
+    TypeBuilder and the rendered schema.
+    """
+    tools = list(request.tools or [])
+    if not all(isinstance(tool, dict) for tool in tools):
+        raise InvalidRequestError("tools must be a list of objects")
+    tools_json = request.tools_json
+    parallel = request.parallel_tool_calls is not False
+
+    if isinstance(request.tool_choice, dict):
+        function = request.tool_choice.get("function")
+        name = function.get("name") if isinstance(function, dict) else None
+        if not isinstance(name, str):
+            raise InvalidRequestError("tool_choice must name a function as {\"function\": {\"name\": ...}}")
+        tools = [tool for tool in tools if _function_name(tool) == name]
+        if not tools:
+            raise InvalidRequestError(f"tool_choice names unknown function '{name}'")
+        tools_json = to_json(tools)
+        parallel = False
+
+    return tools, parallel, tools_json
+
+
+async def _compile_tools(
+    tools_dict: List[Dict[str, Any]], parallel: bool, tools_json: bytes
+) -> Tuple[str, "TypeBuilder"]:
+    """
+    The schema-cache digest and compiled TypeBuilder of the selected tools.
+
+    Compiled once per distinct tool set and call mode, then shared. Compiling
+    a large tool set happens off the event loop.
+    """
+    digest = tools_digest(tools_json)
+    if (digest, parallel) in schema_cache:
+        return digest, schema_cache.get_or_compile(digest, tools_dict, parallel)
+    compile_ir = offload.compile_ir_in_process if offload.use_processes(len(tools_json), config.OFFLOAD_COMPILE_MIN_BYTES) else None
+    tb = await offload.run_cpu(
+        len(tools_json), config.OFFLOAD_COMPILE_MIN_BYTES,
+        schema_cache.get_or_compile, digest, tools_dict, parallel, compile_ir,
+    )
+    return digest, tb
+
+
+async def _resolve_toolset(request: CompletionRequest, headers: Dict[str, str]) -> None:
+    """
+    Swap in the tools of a registered tool set (or of MCP catalog servers,
+    `mcp[:server,...]`) named by the request or the X-BAML-Toolset header.
+    """
+    toolset_id = request.toolset_id or headers.get("x-baml-toolset")
+    if not toolset_id:
+        return
+    if request.tools:
+        raise InvalidRequestError("Send either tools or a tool set, not both")
+    if is_mcp_toolset(toolset_id):
+        selection = await mcp_catalog.select(toolset_id)
+        request.set_tools(selection.tools, selection.tools_json)
+        return
+    toolset = toolsets.get(toolset_id)
+    if toolset is None:
+        raise InvalidRequestError(f"Unknown tool set '{toolset_id}'")
+    request.set_tools(toolset.tools, toolset.tools_json)
+
+
+async def _plain_chat(
+    request: CompletionRequest, api_key: str
+) -> Union[CompletionResponse, AsyncIterator[BaseModel]]:
+    """
+    Fast path for requests without tools (or with tool_choice "none").
+
+    Sends the conversation straight to the pooled OpenAI client and returns the
+    model's own text; no ClientRegistry, TypeBuilder, schema or SAP parse. When
+    the request streams, the upstream chunks are handed back as they arrive.
+    """
+    client = get_openai_client(api_key)
+    params = request.model_dump(
+        include={"model", "messages", "n", "temperature", "max_tokens", "prompt_cache_key", "stream_options"},
+        exclude_none=True,
+    )
+    timeout = deadline.upstream_timeout()
+    if request.stream:
+        return await client.chat.completions.create(stream=True, timeout=timeout, **params)
+    openai_response = await client.chat.completions.create(timeout=timeout, **params)
+    return _completion_from_openai(openai_response)
+
+
+async def _call_baml(
+    function_name: str,
+    messages: List["BamlMessage"],
+    parallel: bool,
+    baml_options: Dict[str, Any],
+    digest: str,
+    tools: List[Dict[str, Any]],
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Run one BAML call through the modular API: BAML renders the HTTP request,
+    the pooled HTTP client sends it, and BAML parses the model's reply.
+
+    Parsing (SAP and the cast to Python types) is CPU-bound, so a large reply
+    is parsed off the event loop; `digest` and `tools` let a pool process
+    rebuild the schema. Returns the parsed Response (or its dict form) and
+    the upstream `usage` object.
+    """
+    baml_request = await getattr(baml_client().request, function_name)(
+        messages, parallel, baml_options=baml_options
+    )
+    headers = {k: v for k, v in baml_request.headers.items() if k != "baml-original-url"}
+    response = await get_http_client().request(
+        baml_request.method,
+        baml_request.url,
+        headers=headers,
+        content=bytes(baml_request.body.raw()),
+        timeout=deadline.upstream_timeout(),
+    )
+    response.raise_for_status()
+    body = response.json()
+    content = body["choices"][0]["message"].get("content") or ""
+    parsed = await _parse_reply(function_name, content, baml_options["tb"], digest, tools, parallel)
+    return parsed, body.get("usage") or {}
+
+
+async def _parse_reply(
+    function_name: str,
+    content: str,
+    tb: "TypeBuilder",
+    digest: str,
+    tools: List[Dict[str, Any]],
+    parallel: bool,
+    partial: bool = False,
+) -> Any:
+    """
+    Parse a model reply with BAML, off the event loop when it's large. With
+    `partial`, the reply may be cut off and the stream parser is used; the
+    result is then always in dict form.
+    """
+    if offload.use_processes(len(content), config.OFFLOAD_PARSE_MIN_BYTES):
+        return await offload.parse_in_process(function_name, content, digest, tools, parallel, partial)
+    parser = baml_sync_client().parse_stream if partial else baml_sync_client().parse
+    parsed = await offload.run_cpu(
+        len(content), config.OFFLOAD_PARSE_MIN_BYTES, getattr(parser, function_name), content, baml_options={"tb": tb}
+    )
+    return parsed.model_dump() if partial else parsed
+
+
+async def _upstream_deltas(
+    function_name: str,
+    messages: List["BamlMessage"],
+    parallel: bool,
+    baml_options: Dict[str, Any],
+    usage: Dict[str, Any],
+    scanner: ToolCallScanner,
+    early_stop: Optional[deadline.EarlyStop] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream one BAML call's reply from upstream, yielding the content deltas
+    as they arrive after feeding them to `scanner`; the final `usage` event
+    is stored in `usage`. Closing the iterator closes the upstream stream.
+
+    With an `early_stop`, the stream is closed as soon as the scanner sees
+    the Response close; the upstream `usage` is then never received.
+    """
+    baml_request = await getattr(baml_client().stream_request, function_name)(
+        messages, parallel, baml_options=baml_options
+    )
+    headers = {k: v for k, v in baml_request.headers.items() if k != "baml-original-url"}
+    produced = 0
+    first_at = 0.0
+    async with get_http_client().stream(
+        baml_request.method,
+        baml_request.url,
+        headers=headers,
+        content=bytes(baml_request.body.raw()),
+        timeout=deadline.upstream_timeout(),
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            event = json.loads(data)
+            usage.update(event.get("usage") or {})
+            for choice in event.get("choices") or []:
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    produced += 1
+                    if produced == 1:
+                        first_at = time.monotonic()
+                    scanner.feed(delta)
+                    yield delta
+            if early_stop is not None and scanner.response_closed:
+                early_stop.record(produced, time.monotonic() - first_at)
+                return
+
+
+async def _stream_baml(
+    function_name: str,
+    messages: List["BamlMessage"],
+    parallel: bool,
+    baml_options: Dict[str, Any],
+    digest: str,
+    tools: List[Dict[str, Any]],
+    stop_at: float,
+    request: CompletionRequest,
+    early_stop: Optional[deadline.EarlyStop] = None,
+) -> Tuple[Any, Dict[str, Any], bool]:
+    """
+    _call_baml for requests with a deadline: the reply is streamed, so if
+    `stop_at` (event-loop time) comes first the upstream call is cancelled,
+    counted as a deadline cancellation of one of the `request`'s samples,
+    and the tool calls that were already complete are returned instead.
+
+    Returns the parsed Response (or its dict form), the upstream `usage`
+    object (empty when cut off or stopped early) and whether the reply was
+    cut off.
+    """
+    text: List[str] = []
+    usage: Dict[str, Any] = {}
+    scanner = ToolCallScanner()
+    try:
+        async with asyncio.timeout_at(stop_at):
+            async with aclosing(
+                _upstream_deltas(function_name, messages, parallel, baml_options, usage, scanner, early_stop)
+            ) as deltas:
+                async for delta in deltas:
+                    text.append(delta)
+    except TimeoutError:
+        deadline.record_cancellation("deadline", request, len(text), samples=1)
+        if not scanner.closed_calls:
+            return {"tool_call": []}, {}, True
+        content = "".join(text)
+        partial = await _parse_reply(function_name, content, baml_options["tb"], digest, tools, parallel, partial=True)
+        return {"tool_call": complete_tool_calls(partial, scanner.closed_calls, required_fields(tools))}, {}, True
+    parsed = await _parse_reply(function_name, "".join(text), baml_options["tb"], digest, tools, parallel)
+    return parsed, usage, False
+
+
+def _tool_call_dicts(baml_response: Any) -> List[Dict[str, Any]]:
+    """The tool calls of a parsed Response, in dict form."""
+    if not isinstance(baml_response, dict):
+        baml_response = baml_response.model_dump()
+    calls = baml_response.get("tool_call")
+    if calls is None:
+        return []
+    return [call for call in (calls if isinstance(calls, list) else [calls]) if isinstance(call, dict)]
+
+
+async def _stream_tool_calls(
+    function_name: str,
+    messages: List["BamlMessage"],
+    parallel: bool,
+    baml_options: Dict[str, Any],
+    digest: str,
+    tools: List[Dict[str, Any]],
+    usage: Dict[str, Any],
+    window: Optional[CoalesceWindow] = None,
+    early_stop: Optional[deadline.EarlyStop] = None,
+) -> AsyncIterator[Tuple[Dict[str, Any], bool]]:
+    """
+    Stream one BAML call, yielding each tool call (in dict form) with True
+    as soon as it is final: once its JSON object has closed in the output,
+    that object alone is parsed and the call is yielded, while the model is
+    still writing the next one. Anything that couldn't be taken apart this
+    way (output that isn't plain JSON, a call that didn't parse alone) comes
+    from parsing the whole reply at the end.
+
+    With a `window`, the call being written is also parsed as a partial
+    whenever the window is due, and yielded with False. `early_stop` is
+    passed on to _upstream_deltas.
+    """
+    tb = baml_options["tb"]
+    text: List[str] = []
+    scanner = ToolCallScanner()
+    flushed = 0
+    splitting = True
+
+    def wrap(call_json: str) -> str:
+        # Shaped like a Response holding just this call
+        return '{"tool_call": [' + call_json if parallel else '{"tool_call": ' + call_json
+
+    async with aclosing(
+        _upstream_deltas(function_name, messages, parallel, baml_options, usage, scanner, early_stop)
+    ) as deltas:
+        async for delta in deltas:
+            text.append(delta)
+            while splitting and flushed < scanner.closed_calls:
+                start, end = scanner.call_spans[flushed]
+                wrapped = wrap("".join(text)[start:end]) + ("]}" if parallel else "}")
+                try:
+                    calls = _tool_call_dicts(await _parse_reply(function_name, wrapped, tb, digest, tools, parallel))
+                except Exception:
+                    calls = []
+                if not calls:
+                    # Calls must go out in order: leave the rest to the final parse
+                    splitting = False
+                    break
+                flushed += 1
+                yield calls[0], True
+            if window is not None and window.add() and splitting:
+                window.reset()
+                start = scanner.open_call_start
+                if start is None or flushed < scanner.closed_calls:
+                    continue
+                try:
+                    partial = await _parse_reply(
+                        function_name, wrap("".join(text)[start:]), tb, digest, tools, parallel, partial=True
+                    )
+                except Exception:
+                    continue
+                calls = _tool_call_dicts(partial)
+                if calls and calls[0].get("function_name"):
+                    yield calls[0], False
+
+    parsed = await _parse_reply(function_name, "".join(text), tb, digest, tools, parallel)
+    for call in _tool_call_dicts(parsed)[flushed:]:
+        yield call, True
+
+
+def _tool_call_parts(tool_call: Dict[str, Any]) -> Tuple[Optional[str], Dict[str, Any]]:
+    """A tool call's function name and its arguments, without function_name and null values."""
+    args_dict = {k: v for k, v in tool_call.items() if k != "function_name" and v is not None}
+    return tool_call.get("function_name"), args_dict
+
+
+def _choice_from_baml(index: int, baml_response: Any) -> Choice:
+    """Convert one parsed BAML Response into an OpenAI choice."""
     # Process BAML response and convert to OpenAI format
     message = Message(role="assistant", content=None)
-    
-    # Debug print to see the actual response structure
-    print(f"BAML response type: {type(baml_response)}")
-    print(f"BAML response: {baml_response}")
-    
+
     # Check if BAML response has tool_call attribute (now expecting a list)
     tool_calls_data = None
     if isinstance(baml_response, dict) and "tool_call" in baml_response:
@@ -150,9 +531,7 @@ async def handle_openai_request(request: CompletionRequest, base_url: URL, heade
         for tool_call in tool_calls_data:
             # Handle both dict and object cases
             if isinstance(tool_call, dict):
-                function_name = tool_call.get("function_name")
-                # Create args dict without function_name and without null values
-                args_dict = {k: v for k, v in tool_call.items() if k != "function_name" and v is not None}
+                function_name, args_dict = _tool_call_parts(tool_call)
             else:
                 # Object case
                 function_name = getattr(tool_call, "function_name", None)
@@ -183,6 +562,223 @@ async def handle_openai_request(request: CompletionRequest, base_url: URL, heade
     else:
         # No tool_call in response
         message.content = "No tool was called"
+
+    return Choice(
+        index=index,
+        message=message,
+        finish_reason="tool_calls" if message.tool_calls else "stop"
+    )
+
+
+async def _baml_chunks(
+    request: CompletionRequest,
+    n: int,
+    sample_calls: Callable[[Dict[str, Any]], AsyncIterator[Tuple[Dict[str, Any], bool]]],
+) -> AsyncIterator[CompletionChunk]:
+    """
+    The streamed form of a BAML response. Each of the `n` samples runs
+    `sample_calls`, and every final tool call it yields goes out at once as
+    one chunk holding the whole call, marked `baml_final`; the samples'
+    calls interleave as they finish. Partial calls go out as `baml_partial`
+    snapshots, the latest one per choice when the client falls behind. Each
+    choice then gets its finish chunk, and the stream ends with a usage
+    chunk if the request asked for one.
+    """
+    chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    def chunk(choices: List[ChunkChoice], usage: Optional[Usage] = None) -> CompletionChunk:
+        return CompletionChunk(id=chunk_id, created=created, model=request.model, choices=choices, usage=usage)
+
+    yield chunk([ChunkChoice(index=index, delta=Delta(role="assistant")) for index in range(n)])
+
+    buffer: StreamBuffer = StreamBuffer(config.STREAM_BUFFER)
+    usages: List[Dict[str, Any]] = [{} for _ in range(n)]
+
+    async def run(index: int) -> None:
+        try:
+            async for call, final in sample_calls(usages[index]):
+                if final:
+                    await buffer.put((index, "call", call), key=index)
+                else:
+                    buffer.put_partial(index, (index, "partial", call))
+            await buffer.put((index, "done", None), key=index)
+        except Exception as e:
+            await buffer.put((index, "error", e), key=index)
+
+    tasks = [asyncio.ensure_future(run(index)) for index in range(n)]
+    try:
+        calls = [0] * n
+        # IDs of the calls being written, given out with their first partial
+        call_ids: Dict[int, str] = {}
+        errors: List[Exception] = []
+        remaining = n
+        while remaining:
+            index, kind, item = await buffer.get()
+            if kind in ("call", "partial"):
+                function_name, args_dict = _tool_call_parts(item)
+                if not function_name:
+                    continue
+                final = kind == "call"
+                call_id = call_ids.pop(index, None) if final else call_ids.get(index)
+                call_id = call_id or f"call_{uuid.uuid4().hex[:8]}"
+                if not final:
+                    call_ids[index] = call_id
+                delta = ToolCallDelta(
+                    index=calls[index],
+                    id=call_id,
+                    type="function",
+                    function=FunctionCallDelta(name=function_name, arguments=json.dumps(args_dict)),
+                    baml_final=final,
+                )
+                if final:
+                    calls[index] += 1
+                    yield chunk([ChunkChoice(index=index, delta=Delta(tool_calls=[delta]))])
+                else:
+                    yield chunk([ChunkChoice(index=index, delta=Delta(baml_partial=delta))])
+                continue
+            remaining -= 1
+            if kind == "error":
+                # A failed sample's choice just ends, as the other samples carry on
+                warnings.warn(f"BAML sample {index} failed: {item}")
+                errors.append(item)
+                continue
+            finish = ChunkChoice(index=index, delta=Delta(), finish_reason="tool_calls" if calls[index] else "stop")
+            if not calls[index]:
+                finish.delta.content = "No tool was called"
+            yield chunk([finish])
+        if len(errors) == n:
+            raise errors[0]
+        if (request.stream_options or {}).get("include_usage"):
+            yield chunk([], usage=_usage_from_upstream(usages))
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def handle_openai_request(
+    request: CompletionRequest,
+    base_url: URL,
+    headers: Dict[str, str],
+    baml_messages: Optional[List["BamlMessage"]] = None,
+) -> Union[CompletionResponse, AsyncIterator[BaseModel]]:
+    """
+    Process OpenAI tool-calling request and return a completion response.
+    
+    PASSTHROUGH requests never get here; the API layer proxies them as raw bytes.
+    Requests without tools take the plain-chat fast path.
+    Otherwise, process through BAML.
+    
+    Args:
+        request: OpenAI completion request with tools
+        headers: HTTP headers from the request
+        baml_messages: The request's messages already converted, when the
+            caller keeps them that way (a session does); on the BAML path
+            request.messages is then not read
+        
+    Returns:
+        OpenAI completion response, or an async iterator of chunks when the
+        request streams
+    """
+    # TODO: This assumes the Authorization header has
+    # a value like "Bearer THE_KEY", and just takes "THE_KEY".
+    api_key = headers.get("authorization", "").split(" ")[1]
+
+    _check_request(request)
+    await _resolve_toolset(request, headers)
+
+    if not request.tools or request.tool_choice == "none":
+        return await _plain_chat(request, api_key)
+
+    n = request.n or 1
+    if n < 1:
+        raise InvalidRequestError("n must be at least 1")
+    if n > config.MAX_N:
+        raise InvalidRequestError(f"n must be at most {config.MAX_N}")
+
+    # BAML processing
+    # Initialize BAML client
+
+    cr = ClientRegistry()
+    client_options = {
+        "model": request.model,
+        "api_key": api_key,
+        "base_url": config.OPENAI_BASE_URL,
+    }
+    if request.prompt_cache_key:
+        client_options["prompt_cache_key"] = request.prompt_cache_key
+    cr.add_llm_client(name="RequestClient", provider="openai", options=client_options)
+    cr.set_primary("RequestClient")
+    function_name = _select_prompt_layout(headers)
+    
+    # client = cr.get_llm_client("RequestModel")
+    # response = client.generate(request.messages)
+    # print(response)
+    
+    tools_dict, parallel, tools_json = _select_tools(request)
+    digest, tb = await _compile_tools(tools_dict, parallel, tools_json)
+    
+    # Convert OpenAI messages to BAML messages
+    if baml_messages is None:
+        baml_messages = _to_baml_messages(request.messages)
+    
+    # Call BAML function with the converted messages. For n > 1 the compiled
+    # TypeBuilder is shared by every sample and the calls fan out concurrently.
+    baml_options = {"tb": tb, "client_registry": cr}
+    semaphore = asyncio.Semaphore(config.FANOUT_CONCURRENCY)
+
+    # With a deadline, replies are streamed so a late one still yields the
+    # tool calls it had finished by then
+    request_deadline = deadline.current()
+    early_stop = deadline.EarlyStop.for_request(request, headers)
+
+    if request.stream:
+        partials = headers.get("x-baml-stream-partials", "").lower() in ("1", "true")
+
+        async def sample_calls(usage: Dict[str, Any]) -> AsyncIterator[Tuple[Dict[str, Any], bool]]:
+            window = CoalesceWindow(config.STREAM_COALESCE_MS / 1000, config.STREAM_COALESCE_TOKENS) if partials else None
+            async with semaphore:
+                async for event in _stream_tool_calls(
+                    function_name, baml_messages, parallel, baml_options, digest, tools_dict, usage, window, early_stop
+                ):
+                    yield event
+
+        return _baml_chunks(request, n, sample_calls)
+
+    async def sample():
+        async with semaphore:
+            if request_deadline is None:
+                parsed, usage = await _call_baml(
+                    function_name, baml_messages, parallel, baml_options, digest, tools_dict
+                )
+                return parsed, usage, False
+            stop_at = request_deadline.stop_at(config.DEADLINE_RESERVE_MS / 1000)
+            return await _stream_baml(
+                function_name, baml_messages, parallel, baml_options, digest, tools_dict, stop_at, request,
+                early_stop,
+            )
+
+    results = await asyncio.gather(*(sample() for _ in range(n)), return_exceptions=True)
+
+    # A failed sample drops its choice instead of failing the whole response;
+    # the choices that remain are numbered from 0 without gaps
+    choices = []
+    usages = []
+    for index, result in enumerate(results):
+        if isinstance(result, BaseException):
+            warnings.warn(f"BAML sample {index} failed: {result}")
+        else:
+            parsed, usage, truncated = result
+            choice = _choice_from_baml(len(choices), parsed)
+            if truncated:
+                # Cut off at the deadline: only finished tool calls, flagged like a max_tokens cut
+                choice.finish_reason = "length"
+                if not choice.message.tool_calls:
+                    choice.message.content = None
+            choices.append(choice)
+            usages.append(usage)
+    if not choices:
+        raise results[0]
     
     # Create the OpenAI response
     return CompletionResponse(
@@ -190,18 +786,8 @@ async def handle_openai_request(request: CompletionRequest, base_url: URL, heade
         object="chat.completion",
         created=int(time.time()),
         model=request.model,
-        choices=[
-            Choice(
-                index=0,
-                message=message,
-                finish_reason="tool_calls" if message.tool_calls else "stop"
-            )
-        ],
-        usage=Usage(
-            prompt_tokens=100,  # TODO: Get actual token counts from BAML
-            completion_tokens=50,
-            total_tokens=150
-        )
+        choices=choices,
+        usage=_usage_from_upstream(usages)
     )
 
 
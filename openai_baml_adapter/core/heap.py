@@ -0,0 +1,119 @@
+"""
+Live heap inspection for the /debug/heap endpoints.
+
+The cheap numbers (process RSS, the interpreter's allocated blocks and the
+objects the garbage collector tracks) are always available. The top
+allocators need tracemalloc, which slows every allocation down, so it only
+traces from the moment a baseline snapshot is taken, or from startup with
+BAML_TRACEMALLOC=1. With a baseline, each report also ranks what grew most
+since then, which is where a slow leak shows up.
+
+TypeBuilders and client registries live mostly in the BAML (Rust) runtime:
+their memory shows in RSS but not in tracemalloc, so RSS climbing while the
+Python heap stays flat points there.
+"""
+import gc
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from . import config
+
+KEY_TYPES = ("lineno", "filename", "traceback")
+
+# Allocations made by the inspection itself and by imports aren't interesting
+_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def rss_kb() -> Optional[int]:
+    """Resident set size of this process (Linux only)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _stat(stat: Any) -> Dict[str, Any]:
+    frames = [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+    entry = {
+        "where": frames[0] if len(frames) == 1 else frames,
+        "size_kb": round(stat.size / 1024, 1),
+        "count": stat.count,
+    }
+    if hasattr(stat, "size_diff"):
+        entry["size_diff_kb"] = round(stat.size_diff / 1024, 1)
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+
+class HeapInspector:
+    """tracemalloc's state for this worker, and the baseline snapshot to diff against."""
+
+    def __init__(self, frames: int):
+        self.frames = frames
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.baseline_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self) -> None:
+        with self._lock:
+            self.baseline = self.baseline_at = None
+            tracemalloc.stop()
+
+    def summary(self) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {
+            "rss_kb": rss_kb(),
+            "allocated_blocks": sys.getallocatedblocks(),
+            "gc_objects": len(gc.get_objects()),
+            "tracing": tracemalloc.is_tracing(),
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            summary["traced_kb"] = round(current / 1024, 1)
+            summary["traced_peak_kb"] = round(peak / 1024, 1)
+        if self.baseline_at is not None:
+            summary["baseline_age_s"] = round(time.time() - self.baseline_at, 1)
+        return summary
+
+    def take_baseline(self) -> Dict[str, Any]:
+        """Start tracing if needed and snapshot the heap as the baseline for later diffs."""
+        with self._lock:
+            self.start()
+            gc.collect()
+            self.baseline = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+            self.baseline_at = time.time()
+        return self.summary()
+
+    def report(self, limit: int, key_type: str = "lineno") -> Dict[str, Any]:
+        """
+        The summary, plus the top `limit` allocators and the top growth since
+        the baseline when tracing. Takes a snapshot, so it's slow on a big heap.
+        """
+        report: Dict[str, Any] = {"summary": self.summary(), "top": None, "diff": None}
+        if not tracemalloc.is_tracing() or limit <= 0:
+            return report
+        with self._lock:
+            snapshot = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+            report["top"] = [_stat(stat) for stat in snapshot.statistics(key_type)[:limit]]
+            if self.baseline is not None:
+                diff: List[Any] = snapshot.compare_to(self.baseline, key_type)
+                report["diff"] = [_stat(stat) for stat in diff[:limit]]
+        return report
+
+
+heap = HeapInspector(config.TRACEMALLOC_FRAMES)
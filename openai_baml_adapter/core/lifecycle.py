@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import os
+import signal
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Set
+
+from . import config, metrics
+from .clients import get_http_client
+from .mcp_catalog import mcp_catalog
+from .schema_cache import schema_cache
+from .toolsets import toolsets
+
+
+class Readiness:
+    """Whether this worker should receive traffic, and how long warm-up took."""
+
+    def __init__(self):
+        self.ready = False
+        self.started = time.monotonic()
+        self.warmup_ms: Optional[float] = None
+        self.warmup_details: Dict[str, Any] = {}
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        self.warmup_ms = round((time.monotonic() - self.started) * 1000, 1)
+
+
+readiness = Readiness()
+
+SHUTDOWN_WORK = metrics.Counter(
+    "baml_shutdown_requests_total", "Requests and session turns running at shutdown, by outcome (drained, aborted)"
+)
+# Uvicorn's logger, so the drain report sits next to its own shutdown lines
+logger = logging.getLogger("uvicorn.error")
+
+
+class Drain:
+    """
+    The work this worker has in flight, and whether it still takes new work.
+
+    Draining marks the worker not ready and refuses new work. Work already
+    running gets a grace period to finish, and whatever is still running
+    after it is cancelled.
+    """
+
+    def __init__(self):
+        self.draining = False
+        self.drained = 0
+        self.aborted = 0
+        self._tasks: Set[asyncio.Task] = set()
+        self._shutdown: Optional[asyncio.Future] = None
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """Count the current task as in flight until the block exits."""
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        aborted = False
+        try:
+            yield
+        except asyncio.CancelledError:
+            aborted = True
+            raise
+        finally:
+            self._tasks.discard(task)
+            if self.draining:
+                outcome = "aborted" if aborted else "drained"
+                setattr(self, outcome, getattr(self, outcome) + 1)
+                SHUTDOWN_WORK.inc(outcome=outcome)
+
+    def start(self, grace: float) -> asyncio.Future:
+        """Begin draining, if it hasn't begun; the future resolves to the drain report."""
+        if self._shutdown is None:
+            self.draining = True
+            readiness.ready = False
+            self._shutdown = asyncio.ensure_future(self._drain(grace))
+        return self._shutdown
+
+    async def shutdown(self, grace: float) -> Dict[str, Any]:
+        """Drain, or wait for the drain already under way, and return its report."""
+        return await self.start(grace)
+
+    async def _drain(self, grace: float) -> Dict[str, Any]:
+        started = time.monotonic()
+        in_flight = set(self._tasks)
+        pending: Set[asyncio.Task] = set()
+        if in_flight:
+            logger.info("Draining %d request(s) for up to %.1fs", len(in_flight), grace)
+            _, pending = await asyncio.wait(in_flight, timeout=grace)
+        for task in pending:
+            task.cancel()
+        if pending:
+            # Let them unwind, so they are counted
+            await asyncio.wait(pending, timeout=1.0)
+        report = {"drained": self.drained, "aborted": self.aborted, "seconds": round(time.monotonic() - started, 3)}
+        logger.info("Drained %(drained)d request(s) and aborted %(aborted)d in %(seconds).3fs", report)
+        return report
+
+    def install_signal_hook(self, grace: float) -> None:
+        """
+        Start draining as soon as the server is told to stop. Uvicorn only
+        sends the lifespan shutdown event once its connections have closed,
+        so by then there would be nothing left to drain. The server's own
+        SIGTERM/SIGINT handlers still run after ours.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            previous = signal.getsignal(sig)
+            if not callable(previous):
+                continue
+
+            def handler(signum, frame, previous=previous):
+                loop.call_soon_threadsafe(self.start, grace)
+                previous(signum, frame)
+
+            signal.signal(sig, handler)
+
+
+drain = Drain()
+
+
+def _load_path_dependencies() -> None:
+    # Importing the generated client builds the BAML runtime; the OpenAI SDK is
+    # the heaviest import of the plain-chat path. Both are deferred at startup.
+    from .handler import baml_client, baml_sync_client
+    baml_client()
+    baml_sync_client()
+    import openai  # noqa: F401
+
+
+def _compile_registered_toolsets() -> int:
+    compiled = 0
+    for toolset in toolsets.load_all():
+        try:
+            schema_cache.get_or_compile(toolset.digest, toolset.tools, True)
+            compiled += 1
+        except Exception as e:
+            warnings.warn(f"Failed to compile tool set {toolset.id}: {e}")
+    return compiled
+
+
+async def _open_upstream_connections() -> bool:
+    # Any response (even 401) leaves a warm, pooled TLS connection behind
+    try:
+        await get_http_client().get(
+            "/models", headers={"authorization": f"Bearer {os.getenv('OPENAI_API_KEY', '')}"}, timeout=5.0
+        )
+        return True
+    except Exception as e:
+        warnings.warn(f"Could not open an upstream connection during warm-up: {e}")
+        return False
+
+
+async def warm_up() -> None:
+    """
+    Prepare this worker for traffic, then mark it ready.
+
+    The import and compile steps run in a thread so the server can accept
+    (and answer) requests while warming; a request that needs a dependency
+    still being loaded simply waits for it. Warm-up only saves later
+    requests some work, so a failing step is logged, reported by /ready as
+    `warmup_error`, and the worker is marked ready anyway.
+    """
+    if config.WARMUP:
+        try:
+            await asyncio.to_thread(_load_path_dependencies)
+            readiness.warmup_details["toolsets_compiled"] = await asyncio.to_thread(_compile_registered_toolsets)
+            if mcp_catalog.path:
+                await asyncio.to_thread(mcp_catalog.reload_if_changed)
+            readiness.warmup_details["upstream_connected"] = await _open_upstream_connections()
+        except Exception as e:
+            logger.exception("Warm-up failed; marking the worker ready anyway")
+            readiness.warmup_details["warmup_error"] = f"{type(e).__name__}: {e}"
+    readiness.mark_ready()
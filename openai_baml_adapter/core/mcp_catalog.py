@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import warnings
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic_core import to_json
+
+from . import config
+from .errors import InvalidRequestError
+from .parse import mcp_to_openai_tools
+from .schema_cache import schema_cache, tools_digest
+from .schema_ir import assemble_schema, build_type_builder, compile_tool_ir, fragment_conflict
+
+MCP_TOOLSET_PREFIX = "mcp"
+
+
+@dataclass
+class McpServer:
+    """One server's tools as last compiled: OpenAI-format tools, their fragments and failures."""
+    digest: str
+    tools: List[Dict[str, Any]] = field(default_factory=list)
+    fragments: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class McpSelection:
+    tools: List[Dict[str, Any]]
+    tools_json: bytes
+
+
+@dataclass
+class McpCatalogState:
+    """Everything one load of the file produced; swapped in as a whole."""
+    servers: Dict[str, McpServer] = field(default_factory=dict)
+    # Tools left out because their types clash with an earlier tool's
+    conflicts: Dict[str, str] = field(default_factory=dict)
+    # Problems with the file itself (unreadable, invalid JSON, ...)
+    errors: List[str] = field(default_factory=list)
+    version: int = 0
+    loaded_at: Optional[int] = None
+    selections: Dict[Tuple[str, ...], McpSelection] = field(default_factory=dict)
+
+
+class McpCatalog:
+    """
+    The MCP servers file (`{"servers": {name: [tool, ...]}}`), compiled once
+    and kept up to date.
+
+    Each tool is compiled on its own into a schema fragment, so when the file
+    changes only the servers whose tool lists changed are recompiled. Tools
+    that fail to compile, or whose types clash with an earlier tool's, are
+    left out and reported as diagnostics instead of being dropped silently.
+
+    Requests select servers with the tool set ID `mcp` (every server) or
+    `mcp:<server>,<server>`. A selection is assembled from the fragments and
+    put in the schema cache when the file is loaded (every server, and each
+    server on its own) or, for other combinations, in a thread the first
+    time it's used. Serving one costs no file I/O and no compilation on the
+    event loop.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.state = McpCatalogState()
+        self._stat: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def reload_if_changed(self) -> bool:
+        """Reload the file if it changed since the last load; True if it was reloaded."""
+        if not self.path:
+            return False
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except OSError as e:
+                self._set_errors([f"Cannot read {self.path}: {e}"])
+                return False
+            stat = (st.st_mtime_ns, st.st_size)
+            if stat == self._stat:
+                return False
+            self._stat = stat
+            return self._load()
+
+    def _set_errors(self, errors: List[str]) -> None:
+        # Keep serving the last good catalog, but report why it's stale
+        previous = self.state
+        self.state = McpCatalogState(
+            servers=previous.servers,
+            conflicts=previous.conflicts,
+            errors=errors,
+            version=previous.version,
+            loaded_at=previous.loaded_at,
+            selections=previous.selections,
+        )
+
+    def _load(self) -> bool:
+        try:
+            with open(self.path, "rb") as f:
+                servers = json.load(f)["servers"]
+            if not isinstance(servers, dict):
+                raise ValueError("'servers' must be an object")
+        except Exception as e:
+            warnings.warn(f"MCP catalog not reloaded: {e!r}")
+            self._set_errors([f"Cannot load {self.path}: {e!r}"])
+            return False
+
+        previous = self.state.servers
+        compiled: Dict[str, McpServer] = {}
+        for name, tools in servers.items():
+            digest = hashlib.sha256(to_json(tools)).hexdigest()
+            unchanged = previous.get(name)
+            if unchanged is not None and unchanged.digest == digest:
+                compiled[name] = unchanged
+            else:
+                compiled[name] = _compile_server(name, tools, digest)
+
+        # Tools are compiled separately; check that their types can share one TypeBuilder
+        classes: Dict[str, Any] = {}
+        enums: Dict[str, Any] = {}
+        conflicts: Dict[str, str] = {}
+        for server in compiled.values():
+            for tool_name, fragment in server.fragments.items():
+                clash = fragment_conflict(fragment, classes, enums)
+                if clash is not None:
+                    conflicts[tool_name] = f"Type '{clash}' conflicts with another tool's definition"
+                    continue
+                classes.update(fragment["classes"])
+                enums.update(fragment["enums"])
+
+        state = McpCatalogState(
+            servers=compiled,
+            conflicts=conflicts,
+            version=self.state.version + 1,
+            loaded_at=int(time.time()),
+        )
+        # Build every server's selection and the whole catalog's up front, so
+        # requests find them ready
+        if compiled:
+            for key in {tuple(sorted(compiled)), *((name,) for name in compiled)}:
+                _build_selection(state, key)
+        self.state = state
+        return True
+
+    async def select(self, toolset_id: str) -> McpSelection:
+        """Resolve `mcp` or `mcp:<server>,...` to its tools, warming the schema cache."""
+        if not self.path:
+            raise InvalidRequestError("No MCP catalog is configured")
+        state = self.state
+        if state.loaded_at is None:
+            # Loading happens in warm-up and the watcher, never on a request
+            raise InvalidRequestError("The MCP catalog hasn't been loaded yet")
+
+        _, _, names = toolset_id.partition(":")
+        key = tuple(sorted(set(names.split(",")))) if names else tuple(sorted(state.servers))
+        selection = state.selections.get(key)
+        if selection is not None:
+            return selection
+        unknown = [name for name in key if name not in state.servers]
+        if unknown:
+            raise InvalidRequestError(f"Unknown MCP server(s): {', '.join(unknown)}")
+        # A combination that wasn't built at load time: assemble it off the loop
+        return await asyncio.to_thread(_build_selection, state, key)
+
+    def diagnostics(self) -> Dict[str, Any]:
+        """Compiled tools and compile failures per server, plus file-level errors."""
+        state = self.state
+        return {
+            "path": self.path,
+            "version": state.version,
+            "loaded_at": state.loaded_at,
+            "errors": state.errors,
+            "servers": {
+                name: {
+                    "tools": [t["function"]["name"] for t in server.tools if t["function"]["name"] not in state.conflicts],
+                    "errors": {
+                        **server.errors,
+                        **{t: e for t, e in state.conflicts.items() if t in server.fragments},
+                    },
+                }
+                for name, server in state.servers.items()
+            },
+        }
+
+    async def watch(self, interval: float) -> None:
+        """
+        Load the file (unless warm-up already has), then poll it every
+        `interval` seconds and reload it when it changes.
+        """
+        while True:
+            try:
+                await asyncio.to_thread(self.reload_if_changed)
+            except Exception as e:
+                warnings.warn(f"MCP catalog reload failed: {e!r}")
+            await asyncio.sleep(interval)
+
+
+def _build_selection(state: McpCatalogState, key: Tuple[str, ...]) -> McpSelection:
+    """Assemble the selected servers' tools and put their TypeBuilders in the schema cache."""
+    tools, fragments = [], {}
+    for name in key:
+        server = state.servers[name]
+        for tool in server.tools:
+            tool_name = tool["function"]["name"]
+            if tool_name not in state.conflicts:
+                tools.append(tool)
+                fragments[tool_name] = server.fragments[tool_name]
+
+    selection = McpSelection(tools=tools, tools_json=to_json(tools))
+    digest = tools_digest(selection.tools_json)
+    for parallel in (True, False):
+        schema_cache.put((digest, parallel), build_type_builder(assemble_schema(fragments, parallel)))
+    state.selections[key] = selection
+    return selection
+
+
+def _compile_server(name: str, tools: List[Dict[str, Any]], digest: str) -> McpServer:
+    server = McpServer(digest=digest)
+    try:
+        openai_tools = mcp_to_openai_tools({name: tools})
+    except Exception as e:
+        server.errors[name] = f"Malformed tool list: {e!r}"
+        return server
+    for tool in openai_tools:
+        function = tool["function"]
+        try:
+            server.fragments[function["name"]] = compile_tool_ir(function)
+            server.tools.append(tool)
+        except Exception as e:
+            server.errors[function["name"]] = str(e) or repr(e)
+    return server
+
+
+def is_mcp_toolset(toolset_id: str) -> bool:
+    return toolset_id == MCP_TOOLSET_PREFIX or toolset_id.startswith(MCP_TOOLSET_PREFIX + ":")
+
+
+mcp_catalog = McpCatalog(config.MCP_CATALOG)
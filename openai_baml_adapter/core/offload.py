@@ -0,0 +1,107 @@
+"""
+Bounded pools for the CPU-heavy phases of a BAML request.
+
+Compiling a large tool schema and parsing (SAP + cast) a large model output
+take long enough to stall every other request on the worker's event loop.
+Work whose input is at least BAML_OFFLOAD_COMPILE_MIN_BYTES (tools JSON) or
+BAML_OFFLOAD_PARSE_MIN_BYTES (model reply) leaves the loop; smaller inputs
+stay inline, where the hop would cost more than it saves.
+
+Offloaded work runs on a small thread pool by default. That frees the loop
+for compilation, which is mostly Python and yields the GIL between
+bytecodes, but BAML's parser holds the GIL for the whole parse, so a thread
+only moves the stall. With BAML_CPU_PROCESSES > 0 both phases run in a
+process pool instead: the child compiles the schema IR, or rebuilds the
+TypeBuilder through its own schema cache (usually a hit in the shared
+cache) and returns the parsed output as plain data.
+"""
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from . import config, profiler
+
+T = TypeVar("T")
+
+_threads: Optional[ThreadPoolExecutor] = None
+_processes: Optional[ProcessPoolExecutor] = None
+
+
+def _thread_pool() -> Executor:
+    global _threads
+    if _threads is None:
+        _threads = ThreadPoolExecutor(max_workers=config.CPU_THREADS, thread_name_prefix="baml-cpu")
+    return _threads
+
+
+def _process_pool() -> Executor:
+    global _processes
+    if _processes is None:
+        # spawn: forking a process that runs an event loop and Rust threads isn't safe
+        _processes = ProcessPoolExecutor(
+            max_workers=config.CPU_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _processes
+
+
+def should_offload(size: int, min_bytes: int) -> bool:
+    return size >= min_bytes
+
+
+def use_processes(size: int, min_bytes: int) -> bool:
+    return config.CPU_PROCESSES > 0 and should_offload(size, min_bytes)
+
+
+async def run_cpu(size: int, min_bytes: int, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run `fn` inline when `size` is under `min_bytes`, otherwise on the CPU thread pool."""
+    if not should_offload(size, min_bytes):
+        return fn(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_thread_pool(), functools.partial(profiler.attributed(fn), *args, **kwargs))
+
+
+def compile_ir_in_process(tools: List[Dict[str, Any]], parallel: bool) -> Dict[str, Any]:
+    """schema_ir.compile_schema_ir, run in the process pool (blocks the calling thread)."""
+    from .schema_ir import compile_schema_ir
+
+    return _process_pool().submit(compile_schema_ir, tools, parallel).result()
+
+
+def _parse(
+    function_name: str, content: str, digest: str, tools: List[Dict[str, Any]], parallel: bool, partial: bool = False
+) -> Any:
+    # Runs in a pool process
+    from .handler import baml_sync_client
+    from .schema_cache import schema_cache
+
+    tb = schema_cache.get_or_compile(digest, tools, parallel)
+    parser = baml_sync_client().parse_stream if partial else baml_sync_client().parse
+    parsed = getattr(parser, function_name)(content, baml_options={"tb": tb})
+    # Dynamic BAML types don't survive pickling; plain data does
+    return parsed.model_dump()
+
+
+async def parse_in_process(
+    function_name: str,
+    content: str,
+    digest: str,
+    tools: List[Dict[str, Any]],
+    parallel: bool,
+    partial: bool = False,
+) -> Dict[str, Any]:
+    """Parse a (with `partial`, possibly cut-off) model reply in the process pool, as a dict."""
+    future = _process_pool().submit(_parse, function_name, content, digest, tools, parallel, partial)
+    return await asyncio.wrap_future(future)
+
+
+def shutdown() -> None:
+    """Stop the pools; used on shutdown."""
+    global _threads, _processes
+    if _threads is not None:
+        _threads.shutdown(wait=False, cancel_futures=True)
+        _threads = None
+    if _processes is not None:
+        _processes.shutdown(wait=False, cancel_futures=True)
+        _processes = None
@@ -1,31 +1,72 @@
 import warnings
 import json
-from typing import Any, Dict
-from ..baml_client.baml_client.type_builder import TypeBuilder
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
 from baml_py.baml_py import FieldType
 
+from . import config
+from .errors import SchemaTooComplexError
+
+if TYPE_CHECKING:
+    # Importing the generated client builds the BAML runtime; only needed for annotations here
+    from ..baml_client.baml_client.type_builder import TypeBuilder
+
 TOOL_NAME_KEY = "function_name"
 TOOL_NAME_LLM_FIELD = "function_name"
 
+class SchemaBudget:
+    """
+    Caps on how much schema one compilation may walk: `max_nodes` schema
+    nodes in total and `max_depth` levels of nesting. Share one budget
+    across the tools of a request to bound the whole compilation.
+    """
+
+    def __init__(self, max_nodes: Optional[int] = None, max_depth: Optional[int] = None):
+        self.max_nodes = config.SCHEMA_MAX_NODES if max_nodes is None else max_nodes
+        self.max_depth = config.SCHEMA_MAX_DEPTH if max_depth is None else max_depth
+        self.nodes = 0
+        self.depth = 0
+
+    def enter(self) -> None:
+        self.nodes += 1
+        self.depth += 1
+        if self.nodes > self.max_nodes:
+            raise SchemaTooComplexError(f"Tool schemas have more than {self.max_nodes} nodes")
+        if self.depth > self.max_depth:
+            raise SchemaTooComplexError(f"Tool schema is nested more than {self.max_depth} levels deep")
+
+    def exit(self) -> None:
+        self.depth -= 1
+
+
 class SchemaAdder:
-    def __init__(self, tb: TypeBuilder, schema: Dict[str, Any]):
+    def __init__(self, tb: "TypeBuilder", schema: Dict[str, Any], budget: Optional[SchemaBudget] = None):
         self.tb = tb
         self.schema = schema
-        self._ref_cache = {}
+        self.budget = budget or SchemaBudget()
+        # $ref -> type, shared by every use of the ref in this schema. Object
+        # refs are stored as soon as their class is declared, before its
+        # properties are parsed, so recursive refs resolve to the class itself.
+        self._ref_cache: Dict[str, FieldType] = {}
+        # Object refs whose properties are being parsed, and other refs being resolved
+        self._filling: Set[str] = set()
+        self._resolving: Set[str] = set()
 
     def _parse_object(self, json_schema: Dict[str, Any]) -> FieldType:
         assert json_schema["type"] == "object"
         name = json_schema.get("title")
         if name is None:
             raise ValueError("Title is required in JSON schema for object type")
+        new_cls = self.tb.add_class(name)
+        self._add_properties(new_cls, json_schema)
+        return new_cls.type()
 
+    def _add_properties(self, new_cls: Any, json_schema: Dict[str, Any]) -> None:
         required_fields = json_schema.get("required", [])
         assert isinstance(required_fields, list)
 
-        new_cls = self.tb.add_class(name)
         if properties := json_schema.get("properties"):
             assert isinstance(properties, dict)
-            tool_name_key = properties.pop(TOOL_NAME_KEY, None)
+            tool_name_key = properties.get(TOOL_NAME_KEY)
             if tool_name_key is not None:
                 if description := tool_name_key.get("description"):
                     new_cls.add_property(TOOL_NAME_KEY, self.parse(tool_name_key)).alias(TOOL_NAME_LLM_FIELD).description(description)
@@ -34,6 +75,8 @@ class SchemaAdder:
 
 
             for field_name, field_schema in properties.items():
+                if field_name == TOOL_NAME_KEY:
+                    continue
                 assert isinstance(field_schema, dict)
                 default_value = field_schema.get("default")
                 # Handle case when properties are not defined, BAML expects `map<string, string>`
@@ -60,7 +103,6 @@ class SchemaAdder:
                         description = description.strip()
                     if len(description) > 0:
                         property_.description(description)
-        return new_cls.type()
 
     def _parse_string(self, json_schema: Dict[str, Any]) -> FieldType:
         assert json_schema["type"] == "string"
@@ -78,18 +120,48 @@ class SchemaAdder:
         return self.tb.string()
 
     def _load_ref(self, ref: str) -> FieldType:
+        if ref in self._ref_cache:
+            if ref in self._filling and not getattr(self.tb, "supports_recursive_types", False):
+                # BAML's programmatic builder can't render a class that contains
+                # itself; schema_ir.compile_schema_ir handles these.
+                raise ValueError(f"Recursive reference {ref} needs compile_schema")
+            return self._ref_cache[ref]
+
         assert ref.startswith("#/"), f"Only local references are supported: {ref}"
         _, left, right = ref.split("/", 2)
+        refs = self.schema.get(left)
+        if not isinstance(refs, dict) or right not in refs:
+            raise ValueError(f"Reference {ref} not found in schema")
+        target = refs[right]
+
+        if target.get("type") == "object":
+            # Declare the class first so refs back to it (trees, linked lists) terminate
+            new_cls = self.tb.add_class(target.get("title") or right)
+            self._ref_cache[ref] = new_cls.type()
+            self._filling.add(ref)
+            try:
+                self._add_properties(new_cls, target)
+            finally:
+                self._filling.discard(ref)
+            return self._ref_cache[ref]
 
-        if ref not in self._ref_cache:
-            if refs := self.schema.get(left):
-                assert isinstance(refs, dict)
-                if right not in refs:
-                    raise ValueError(f"Reference {ref} not found in schema")
-                self._ref_cache[ref] = self.parse(refs[right])
+        if ref in self._resolving:
+            raise ValueError(f"Recursive reference {ref} must go through an object type")
+        self._resolving.add(ref)
+        try:
+            self._ref_cache[ref] = self.parse(target)
+        finally:
+            self._resolving.discard(ref)
         return self._ref_cache[ref]
 
     def parse(self, json_schema: Dict[str, Any]) -> FieldType:
+        self.budget.enter()
+        try:
+            return self._parse(json_schema)
+        finally:
+            self.budget.exit()
+
+    def _parse(self, json_schema: Dict[str, Any]) -> FieldType:
         if any_of := json_schema.get("anyOf"):
             assert isinstance(any_of, list)
             return self.tb.union([self.parse(sub_schema) for sub_schema in any_of])
@@ -126,39 +198,85 @@ class SchemaAdder:
         return field_type
 
 
-def parse_json_schema(json_schema: Dict[str, Any], tb: TypeBuilder) -> FieldType:
-    parser = SchemaAdder(tb, json_schema)
+def parse_json_schema(
+    json_schema: Dict[str, Any], tb: "TypeBuilder", budget: Optional[SchemaBudget] = None
+) -> FieldType:
+    parser = SchemaAdder(tb, json_schema, budget)
     return parser.parse(json_schema)
 
-def parse_tools(scheme_file_path: str, tb: TypeBuilder) -> Dict[str, tuple[FieldType, Dict[str, Any]]]:
+def mcp_to_openai_tools(servers: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Convert MCP servers' tool lists into OpenAI tools named `server/tool`."""
+    return [
+        {
+            "type": "function",
+            "function": {
+                "name": f"{server}/{tool['name']}",
+                "description": tool.get("description") or "",
+                "parameters": tool.get("inputSchema") or {},
+            },
+        }
+        for server, tools in servers.items()
+        for tool in tools
+    ]
+
+
+def parse_tools(scheme_file_path: str, tb: "TypeBuilder") -> Dict[str, tuple[FieldType, Dict[str, Any]]]:
+    """
+    Parse an MCP servers file (`{"servers": {name: [tool, ...]}}`); tools are
+    named `server/tool` and map to their type and their MCP tool definition.
+    Tools whose inputSchema has no `properties` are skipped.
+    """
     with open(scheme_file_path, "r") as f:
         schema = json.load(f)
-    loaded_tools = {}
-    for server, tools in schema["servers"].items():
-        for tool in tools:
-            input_schema = tool["inputSchema"]
-            input_schema["title"] = f"{server}/{tool['name']}"
-            if "properties" in input_schema:
-                input_schema["properties"][TOOL_NAME_KEY] = {
-                    "type": "string",
-                    "enum": [f"{server}/{tool['name']}"],
-                    "description": tool.get("description", None),
-                }
-                # make properties.tool_name required
-                if "required" not in input_schema:
-                    input_schema["required"] = []
-                input_schema["required"].append(TOOL_NAME_KEY)
-                try:
-                    tp = parse_json_schema(input_schema, tb)
-                    loaded_tools[f"{server}/{tool['name']}"] = (tp, tool)
-                except Exception as e:
-                    pass
-    return loaded_tools
+    servers = {
+        server: [tool for tool in tools if "properties" in (tool.get("inputSchema") or {})]
+        for server, tools in schema["servers"].items()
+    }
+    mcp_tools = {f"{server}/{tool['name']}": tool for server, tools in servers.items() for tool in tools}
+    parsed = parse_openai_tools(mcp_to_openai_tools(servers), tb)
+    return {name: (field_type, mcp_tools[name]) for name, (field_type, _) in parsed.items()}
+
+
+def tool_parameters_schema(function: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The JSON schema compiled for one OpenAI function: its parameters, titled
+    with the function name and with the required `function_name` literal added.
+
+    The levels we touch are copied so the caller's tool definitions are never
+    modified.
+    """
+    tool_name = function["name"]
+    parameters = dict(function.get("parameters") or {})
+
+    # Create a title for the schema based on the tool name
+    parameters["title"] = tool_name
+
+    # Add the tool name as a special property for BAML
+    parameters["properties"] = {
+        **parameters.get("properties", {}),
+        TOOL_NAME_KEY: {
+            "type": "string",
+            "enum": [tool_name],
+            "description": function.get("description", ""),
+        },
+    }
 
+    # Ensure tool name is required
+    parameters["required"] = list(parameters.get("required", []))
+    if TOOL_NAME_KEY not in parameters["required"]:
+        parameters["required"].append(TOOL_NAME_KEY)
+    return parameters
 
-def parse_openai_tools(tools_info: list, tb: TypeBuilder) -> Dict[str, tuple[FieldType, Dict[str, Any]]]:
-    """Parse tools in OpenAI function-calling format (from get_info())."""
+
+def parse_openai_tools(tools_info: list, tb: "TypeBuilder") -> Dict[str, tuple[FieldType, Dict[str, Any]]]:
+    """
+    Parse tools in OpenAI function-calling format (from get_info()).
+
+    Tools that don't compile are skipped with a warning, but tools too large
+    for the schema budget fail the whole call with SchemaTooComplexError.
+    """
     loaded_tools = {}
+    budget = SchemaBudget()
     
     for tool in tools_info:
         if tool.get("type") != "function":
@@ -169,36 +287,13 @@ def parse_openai_tools(tools_info: list, tb: TypeBuilder) -> Dict[str, tuple[Fie
         if not tool_name:
             continue
 
-        function_description = function.get("description", None)
-            
-        # Extract the parameters schema
-        parameters = function.get("parameters", {})
-        
-        # Create a title for the schema based on the tool name
-        parameters["title"] = tool_name
-        
-        # Add the tool name as a special property for BAML
-        if "properties" not in parameters:
-            parameters["properties"] = {}
-            
-        parameters["properties"][TOOL_NAME_KEY] = {
-            "type": "string",
-            "enum": [tool_name],
-            "description": function.get("description", ""),
-        }
-        
-        # Ensure tool name is required
-        if "required" not in parameters:
-            parameters["required"] = []
-        if TOOL_NAME_KEY not in parameters["required"]:
-            parameters["required"].append(TOOL_NAME_KEY)
-        
         try:
             # Parse the schema into BAML types
-            tp = parse_json_schema(parameters, tb)
+            tp = parse_json_schema(tool_parameters_schema(function), tb, budget)
             loaded_tools[tool_name] = (tp, function)
+        except SchemaTooComplexError as e:
+            raise SchemaTooComplexError(f"Tool {tool_name}: {e}") from None
         except Exception as e:
             warnings.warn(f"Failed to parse tool {tool_name}: {e}")
             
     return loaded_tools
-
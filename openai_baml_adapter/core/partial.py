@@ -0,0 +1,129 @@
+"""
+Which parts of a partially generated BAML Response are final.
+
+BAML's stream parser turns any prefix of the model's output into a partial
+Response, but the last value in it may still be growing: a string cut off
+mid-word parses as the shorter string. Whether a tool call is finished is a
+property of the raw text instead: its JSON object has been closed. The
+scanner here follows the output as it arrives and tracks exactly that,
+ignoring anything before the first `{` (such as a Markdown fence).
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from .parse import tool_parameters_schema
+
+TOOL_CALL_KEY = "tool_call"
+
+
+class ToolCallScanner:
+    """
+    Incrementally scan model output for the Response's `tool_call` value,
+    recording where each tool-call object starts and closes and noticing
+    when the top-level object closes.
+    """
+
+    def __init__(self):
+        # (start, end) offsets in the output of each closed tool-call object
+        self.call_spans: List[Tuple[int, int]] = []
+        self.response_closed = False
+        self._pos = 0
+        self._call_start = 0
+        self._depth = 0
+        self._started = False
+        self._in_string = False
+        self._escaped = False
+        # Key strings at depth 1, to find the `tool_call` value
+        self._string: Optional[List[str]] = None
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._calls_depth: Optional[int] = None
+
+    @property
+    def closed_calls(self) -> int:
+        return len(self.call_spans)
+
+    @property
+    def open_call_start(self) -> Optional[int]:
+        """Offset where the tool-call object still being written starts, if any."""
+        if self._calls_depth is not None and self._depth > self._calls_depth and not self.response_closed:
+            return self._call_start
+        return None
+
+    def feed(self, text: str) -> None:
+        start = self._pos
+        self._pos += len(text)
+        for pos, ch in enumerate(text, start):
+            if self.response_closed:
+                return
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._string is not None:
+                        self._last_string = "".join(self._string)
+                        self._string = None
+                    continue
+                if self._string is not None:
+                    self._string.append(ch)
+                continue
+
+            if not self._started:
+                if ch != "{":
+                    continue
+                self._started = True
+            if ch == '"':
+                self._in_string = True
+                self._string = [] if self._depth == 1 else None
+            elif ch == ":" and self._depth == 1:
+                self._key = self._last_string
+            elif ch == "," and self._depth == 1:
+                self._key = None
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 2 and self._key == TOOL_CALL_KEY:
+                    # `[` holds one object per call; `{` is the single call itself
+                    self._calls_depth = 2 if ch == "[" else 1
+                if ch == "{" and self._calls_depth is not None and self._depth == self._calls_depth + 1:
+                    self._call_start = pos
+            elif ch in "}]":
+                self._depth -= 1
+                if ch == "}" and self._depth == self._calls_depth:
+                    self.call_spans.append((self._call_start, pos + 1))
+                if self._depth == 1 and self._calls_depth is not None:
+                    self._calls_depth = None
+                if self._depth == 0:
+                    self.response_closed = True
+
+
+def required_fields(tools: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Required argument names (and `function_name`) of each tool, by function name."""
+    return {
+        tool["function"]["name"]: tool_parameters_schema(tool["function"])["required"]
+        for tool in tools
+        if tool.get("type") == "function" and "name" in tool.get("function", {})
+    }
+
+
+def complete_tool_calls(
+    partial: Dict[str, Any], closed_calls: int, required: Dict[str, List[str]]
+) -> List[Dict[str, Any]]:
+    """
+    The tool calls of a partial Response (in dict form) that are final: their
+    objects have closed in the output and every required field has a value.
+    """
+    calls = partial.get(TOOL_CALL_KEY)
+    if calls is None:
+        return []
+    if not isinstance(calls, list):
+        calls = [calls]
+    complete = []
+    for call in calls[:closed_calls]:
+        if not isinstance(call, dict):
+            continue
+        fields = required.get(call.get("function_name"))
+        if fields is not None and all(call.get(name) is not None for name in fields):
+            complete.append(call)
+    return complete
@@ -0,0 +1,44 @@
+import os
+from typing import Dict
+
+import httpx
+
+from .clients import get_http_client
+
+# Request headers worth forwarding upstream. Accept-Encoding is forwarded so
+# the upstream body can be relayed to the client still encoded.
+_FORWARD_REQUEST_HEADERS = ("content-type", "accept", "accept-encoding", "openai-organization", "openai-project")
+
+# Response headers that describe the connection rather than the body.
+_HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-length", "date", "server"}
+
+
+def is_passthrough(headers: Dict[str, str]) -> bool:
+    """True when the PASSTHROUGH header asks for the request to go straight to OpenAI."""
+    passthrough = headers.get("passthrough", headers.get("PASSTHROUGH", ""))
+    return bool(passthrough) and passthrough.lower() not in ["false", "0", ""]
+
+
+async def open_passthrough(body: bytes, headers: Dict[str, str]) -> httpx.Response:
+    """
+    Forward a raw chat-completions body upstream and return the open response.
+
+    Nothing is parsed or re-serialized in either direction: the request bytes
+    go out as received, and the caller relays `response.aiter_raw()` (still
+    content-encoded) and closes the response when done. Fields we don't
+    model, such as logprobs, system_fingerprint or refusal, survive intact.
+    """
+    client = get_http_client()
+    upstream_headers = {name: headers[name] for name in _FORWARD_REQUEST_HEADERS if name in headers}
+    upstream_headers.setdefault("accept-encoding", "identity")
+    upstream_headers["authorization"] = f"Bearer {os.getenv('OPENAI_API_KEY')}"
+    upstream_request = client.build_request("POST", "/chat/completions", content=body, headers=upstream_headers)
+    return await client.send(upstream_request, stream=True)
+
+
+def relay_headers(response: httpx.Response) -> Dict[str, str]:
+    """Upstream response headers to pass back to the client unchanged."""
+    return {
+        name: value for name, value in response.headers.items()
+        if name.lower() not in _HOP_BY_HOP_HEADERS
+    }
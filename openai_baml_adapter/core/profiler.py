@@ -0,0 +1,182 @@
+"""
+Opt-in sampling profiler for a single request.
+
+A request sent with `X-BAML-Profile: 1` by a key in BAML_DEBUG_KEYS runs
+with a sampler thread that records, every BAML_PROFILE_INTERVAL_MS, the
+stack of
+
+  - the event-loop thread, whenever the task it's running belongs to the
+    request (tasks the request spawns inherit its context, so the fan-out of
+    `n` samples counts too), and
+  - any CPU pool thread running work offloaded on the request's behalf.
+
+Which task the loop is running is read from asyncio's private task table.
+On an interpreter without it, the loop thread is sampled whatever it is
+running, so the profile also counts other requests' work on the loop.
+
+Samples are written in the collapsed ("folded") stack format that
+flamegraph.pl, inferno and speedscope read: one `frame;frame;frame count`
+line per distinct stack, root first. Work in the process pool
+(BAML_CPU_PROCESSES) is not sampled.
+
+Profiling is rate-limited (BAML_PROFILE_MAX_PER_MINUTE, one at a time) and
+a profile stops sampling after BAML_PROFILE_MAX_SECONDS.
+"""
+import asyncio
+import collections
+import functools
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Counter, Deque, Dict, Optional, Set, TypeVar
+
+from . import config
+
+T = TypeVar("T")
+
+_active: ContextVar[Optional["RequestProfile"]] = ContextVar("baml_request_profile", default=None)
+
+logger = logging.getLogger("uvicorn.error")
+_warned_unfiltered = False
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _fold(frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class RequestProfile:
+    def __init__(self, request_id: str, interval: float, max_seconds: float):
+        self.request_id = request_id
+        # The ID may come from the client; keep the file name to a safe alphabet
+        self.filename = f"{int(time.time())}-{re.sub(r'[^A-Za-z0-9_-]', '_', request_id)[:64]}.folded"
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.samples: Counter[str] = collections.Counter()
+        self._workers: Set[int] = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+
+    def start(self) -> None:
+        """Start sampling the calling task (and the tasks it spawns from now on)."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        _active.set(self)
+        self._thread = threading.Thread(target=self._sample, name="baml-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        """Stop sampling and write the folded stacks; returns the file's path."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        os.makedirs(config.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(config.PROFILE_DIR, self.filename)
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def _sample(self) -> None:
+        current_tasks = _loop_tasks()
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frames = sys._current_frames()
+            if current_tasks is None:
+                running = True
+            else:
+                task = current_tasks.get(self._loop)
+                running = task is not None and task.get_context().get(_active) is self
+            if running:
+                frame = frames.get(self._loop_thread)
+                if frame is not None:
+                    self.samples[_fold(frame)] += 1
+            for ident in list(self._workers):
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.samples[_fold(frame)] += 1
+
+
+def _loop_tasks() -> Optional[Dict[asyncio.AbstractEventLoop, asyncio.Task]]:
+    """asyncio's table of the task each loop is running, or None where it doesn't exist."""
+    global _warned_unfiltered
+    current_tasks = getattr(asyncio.tasks, "_current_tasks", None)
+    if isinstance(current_tasks, dict):
+        return current_tasks
+    if not _warned_unfiltered:
+        _warned_unfiltered = True
+        logger.warning("asyncio has no task table; profiles sample the event loop unfiltered")
+    return None
+
+
+def attributed(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wrap `fn`, about to run on a pool thread, so the current request's profile samples it."""
+    profile = _active.get()
+    if profile is None:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args: Any, **kwargs: Any) -> T:
+        ident = threading.get_ident()
+        profile._workers.add(ident)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile._workers.discard(ident)
+
+    return run
+
+
+class ProfileLimiter:
+    """At most `per_minute` profiles in any 60 seconds, and one at a time."""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self._started: Deque[float] = collections.deque()
+        self._running = False
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        while self._started and now - self._started[0] >= 60:
+            self._started.popleft()
+        if self._running or len(self._started) >= self.per_minute:
+            return False
+        self._started.append(now)
+        self._running = True
+        return True
+
+    def release(self) -> None:
+        self._running = False
+
+
+limiter = ProfileLimiter(config.PROFILE_MAX_PER_MINUTE)
+
+
+def start_profile(request_id: str) -> Optional[RequestProfile]:
+    """Start profiling the current request, or return None if the rate limit says no."""
+    if not limiter.try_acquire():
+        return None
+    profile = RequestProfile(request_id, config.PROFILE_INTERVAL_MS / 1000, config.PROFILE_MAX_SECONDS)
+    profile.start()
+    return profile
+
+
+def finish_profile(profile: RequestProfile) -> str:
+    try:
+        return profile.stop()
+    finally:
+        limiter.release()
@@ -0,0 +1,354 @@
+"""
+Server-side conversation state for the Responses API (/v1/responses).
+
+Each response is stored with the conversation items of its turn (the input
+it was given and the output it produced, as chat messages), its tool set and
+the ID of the response it continued. A follow-up request names that ID in
+`previous_response_id` and sends only its new input; the conversation is
+rebuilt by walking the chain back to its first response. Each record keeps
+its messages converted for BAML once, so a long conversation isn't
+re-converted on every turn, and the tool set is inherited when a follow-up
+doesn't send one, so its compiled schema stays cached. A response belongs
+to the API key that created it: it is only found with that key.
+
+The store lives in memory, holding at most BAML_RESPONSE_STORE_MEMORY_ITEMS
+responses. With BAML_RESPONSE_STORE_PATH set, the least recently used ones
+spill to a sqlite database there instead of being dropped. Responses expire
+BAML_RESPONSE_STORE_TTL seconds after they were created.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from httpcore import URL
+from pydantic_core import to_json
+
+from . import config
+from .errors import InvalidRequestError
+from .handler import _to_baml_messages, handle_openai_request
+from .schema_cache import tools_digest
+from ..models.openai import CompletionRequest, CompletionResponse, Message
+from ..models.responses import ResponseObject, ResponsesRequest, ResponseUsage
+
+if TYPE_CHECKING:
+    from ..baml_client.baml_client.types import Message as BamlMessage
+
+PURGE_INTERVAL = 60.0
+
+
+@dataclass
+class StoredResponse:
+    id: str
+    parent: Optional[str]
+    # This turn's conversation items as chat messages: its input, then its output
+    messages: List[Dict[str, Any]]
+    # Chat-format tools and their JSON encoding
+    tools: List[Dict[str, Any]]
+    tools_json: bytes
+    # The Response object, for GET /v1/responses/{id}
+    response: Dict[str, Any]
+    expires_at: float
+    # Digest of the Authorization header the response was created with
+    owner: str
+    # `messages` converted for BAML, on first use (never spilled)
+    baml_messages: Optional[List["BamlMessage"]] = None
+
+    def converted(self) -> List["BamlMessage"]:
+        if self.baml_messages is None:
+            self.baml_messages = _to_baml_messages(self.messages)
+        return self.baml_messages
+
+
+class ResponseStore:
+    """Stored responses: an LRU in memory, optionally spilling to sqlite, with a TTL."""
+
+    def __init__(self, ttl: float, memory_items: int, path: str = ""):
+        self.ttl = ttl
+        self.memory_items = memory_items
+        self._memory: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._purged_at = 0.0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(responses)")}
+            if columns and "owner" not in columns:
+                # Responses stored before they had an owner can't be given back to anyone
+                self._db.execute("DROP TABLE responses")
+            self._db.executescript(
+                "PRAGMA journal_mode=WAL;"
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "  id TEXT PRIMARY KEY, parent TEXT, owner TEXT, tools_digest TEXT, record BLOB, expires_at REAL);"
+                "CREATE INDEX IF NOT EXISTS responses_expiry ON responses (expires_at);"
+                "CREATE TABLE IF NOT EXISTS tools (digest TEXT PRIMARY KEY, tools BLOB);"
+            )
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def put(self, record: StoredResponse) -> None:
+        with self._lock:
+            self._memory[record.id] = record
+            self._memory.move_to_end(record.id)
+            while len(self._memory) > self.memory_items:
+                _, evicted = self._memory.popitem(last=False)
+                if self._db is not None and evicted.expires_at > time.time():
+                    self._spill(evicted)
+            self._purge()
+
+    def get(self, response_id: str, owner: str) -> Optional[StoredResponse]:
+        """The response, unless it has expired or belongs to another owner."""
+        with self._lock:
+            record = self._find(response_id, owner)
+            if record is not None:
+                self._memory.move_to_end(response_id)
+            return record
+
+    def delete(self, response_id: str, owner: str) -> bool:
+        with self._lock:
+            return self._find(response_id, owner) is not None and self._delete(response_id)
+
+    def chain(self, response_id: str, owner: str) -> List[StoredResponse]:
+        """The responses of a conversation up to `response_id`, oldest first."""
+        records = []
+        next_id: Optional[str] = response_id
+        while next_id is not None:
+            record = self.get(next_id, owner)
+            if record is None:
+                raise InvalidRequestError(f"Previous response with id '{next_id}' not found")
+            records.append(record)
+            next_id = record.parent
+        records.reverse()
+        return records
+
+    def _find(self, response_id: str, owner: str) -> Optional[StoredResponse]:
+        record = self._memory.get(response_id)
+        if record is None and self._db is not None:
+            record = self._load(response_id)
+            if record is not None and record.owner == owner:
+                self._memory[response_id] = record
+        if record is None or record.owner != owner:
+            return None
+        if record.expires_at <= time.time():
+            self._delete(response_id)
+            return None
+        return record
+
+    def _delete(self, response_id: str) -> bool:
+        found = self._memory.pop(response_id, None) is not None
+        if self._db is not None:
+            found = self._db.execute("DELETE FROM responses WHERE id = ?", (response_id,)).rowcount > 0 or found
+        return found
+
+    def _spill(self, record: StoredResponse) -> None:
+        digest = tools_digest(record.tools_json)
+        self._db.execute("INSERT OR IGNORE INTO tools VALUES (?, ?)", (digest, record.tools_json))
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                record.id, record.parent, record.owner, digest,
+                to_json({"messages": record.messages, "response": record.response}),
+                record.expires_at,
+            ),
+        )
+
+    def _load(self, response_id: str) -> Optional[StoredResponse]:
+        row = self._db.execute(
+            "SELECT r.parent, r.owner, r.record, r.expires_at, t.tools FROM responses r"
+            " JOIN tools t ON t.digest = r.tools_digest WHERE r.id = ?",
+            (response_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        parent, owner, data, expires_at, tools_json = row
+        data = json.loads(data)
+        return StoredResponse(
+            id=response_id, parent=parent, messages=data["messages"], tools=json.loads(tools_json),
+            tools_json=tools_json, response=data["response"], expires_at=expires_at, owner=owner,
+        )
+
+    def _purge(self) -> None:
+        now = time.time()
+        # Least recently used first; get() checks expiry for the rest
+        while self._memory:
+            oldest = next(iter(self._memory.values()))
+            if oldest.expires_at > now:
+                break
+            self._memory.popitem(last=False)
+        if self._db is not None and now - self._purged_at >= PURGE_INTERVAL:
+            self._purged_at = now
+            self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            self._db.execute("DELETE FROM tools WHERE digest NOT IN (SELECT tools_digest FROM responses)")
+
+
+response_store = ResponseStore(
+    config.RESPONSE_STORE_TTL, config.RESPONSE_STORE_MEMORY_ITEMS, config.RESPONSE_STORE_PATH
+)
+
+
+def owner_of(headers: Dict[str, str]) -> str:
+    """The owner of the responses a request creates: a digest of its Authorization header."""
+    return hashlib.sha256(headers.get("authorization", "").encode()).hexdigest()
+
+
+def _text(content: Any) -> Optional[str]:
+    """The text of a Responses message's content: a string or a list of text parts."""
+    if content is None or isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+    raise InvalidRequestError("message content must be a string or a list of content parts")
+
+
+def _input_messages(items: Any) -> List[Dict[str, Any]]:
+    """Responses input items as the chat messages a chat client would have sent."""
+    if isinstance(items, str):
+        return [{"role": "user", "content": items}]
+    if not isinstance(items, list):
+        raise InvalidRequestError("input must be a string or a list of items")
+    messages: List[Dict[str, Any]] = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise InvalidRequestError("input items must be objects")
+        kind = item.get("type", "message")
+        if kind == "message":
+            role = "system" if item.get("role") == "developer" else item.get("role")
+            messages.append({"role": role, "content": _text(item.get("content"))})
+        elif kind == "function_call":
+            call = {
+                "id": item.get("call_id"),
+                "type": "function",
+                "function": {"name": item.get("name"), "arguments": item.get("arguments", "")},
+            }
+            # Consecutive calls belong to one assistant message
+            if messages and messages[-1]["role"] == "assistant" and messages[-1].get("tool_calls"):
+                messages[-1]["tool_calls"].append(call)
+            else:
+                messages.append({"role": "assistant", "content": None, "tool_calls": [call]})
+        elif kind == "function_call_output":
+            messages.append({"role": "tool", "tool_call_id": item.get("call_id"), "content": _text(item.get("output"))})
+        else:
+            raise InvalidRequestError(f"Unsupported input item type '{kind}'")
+    return messages
+
+
+def _chat_tools(tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    chat_tools = []
+    for tool in tools:
+        if not isinstance(tool, dict) or tool.get("type") != "function":
+            raise InvalidRequestError("Only function tools are supported")
+        function = {key: value for key, value in tool.items() if key not in ("type", "strict")}
+        chat_tools.append({"type": "function", "function": function})
+    return chat_tools
+
+
+def _chat_tool_choice(tool_choice: Any) -> Any:
+    if isinstance(tool_choice, dict) and tool_choice.get("type") == "function":
+        return {"type": "function", "function": {"name": tool_choice.get("name")}}
+    return tool_choice
+
+
+def _output_items(message: Message) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = [
+        {
+            "type": "function_call",
+            "id": f"fc_{uuid.uuid4().hex}",
+            "call_id": call.id,
+            "name": call.function.name,
+            "arguments": call.function.arguments,
+            "status": "completed",
+        }
+        for call in message.tool_calls or []
+    ]
+    if message.content:
+        items.append({
+            "type": "message",
+            "id": f"msg_{uuid.uuid4().hex}",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": message.content, "annotations": []}],
+        })
+    return items
+
+
+async def handle_responses_request(
+    request: ResponsesRequest, base_url: URL, headers: Dict[str, str]
+) -> ResponseObject:
+    """
+    Serve a Responses API request through the chat completion path, with the
+    conversation so far rebuilt from the store.
+    """
+    if request.stream:
+        raise NotImplementedError("Streaming is not supported on /v1/responses")
+    owner = owner_of(headers)
+    # The store may read from sqlite, so it's used from a thread
+    chain = (
+        await asyncio.to_thread(response_store.chain, request.previous_response_id, owner)
+        if request.previous_response_id else []
+    )
+    new_messages = _input_messages(request.input)
+    if request.tools is not None:
+        tools = _chat_tools(request.tools)
+        tools_json = to_json(tools)
+    elif chain:
+        tools, tools_json = chain[-1].tools, chain[-1].tools_json
+    else:
+        tools, tools_json = [], b"[]"
+
+    # Instructions apply to this turn only, as in the Responses API
+    system = [{"role": "system", "content": request.instructions}] if request.instructions else []
+    history = [message for record in chain for message in record.messages]
+    completion_request = CompletionRequest(
+        model=request.model,
+        messages=system + history + new_messages,
+        tool_choice=_chat_tool_choice(request.tool_choice),
+        parallel_tool_calls=request.parallel_tool_calls,
+        temperature=request.temperature,
+        max_tokens=request.max_output_tokens,
+        prompt_cache_key=request.prompt_cache_key,
+    )
+    completion_request.set_tools(tools, tools_json)
+    baml_messages = _to_baml_messages(system)
+    for record in chain:
+        baml_messages += record.converted()
+    baml_messages += _to_baml_messages(new_messages)
+
+    completion: CompletionResponse = await handle_openai_request(
+        completion_request, base_url, headers, baml_messages=baml_messages
+    )
+    choice = completion.choices[0]
+    usage = completion.usage
+    response = ResponseObject(
+        id=f"resp_{uuid.uuid4().hex}",
+        created_at=int(time.time()),
+        status="incomplete" if choice.finish_reason == "length" else "completed",
+        model=request.model,
+        output=_output_items(choice.message),
+        previous_response_id=request.previous_response_id,
+        instructions=request.instructions,
+        tools=[{"type": "function", **tool["function"]} for tool in tools],
+        parallel_tool_calls=request.parallel_tool_calls is not False,
+        usage=ResponseUsage(
+            input_tokens=usage.prompt_tokens, output_tokens=usage.completion_tokens, total_tokens=usage.total_tokens
+        ) if usage else None,
+    )
+    if request.store is not False:
+        reply = choice.message.model_dump(exclude_none=True)
+        await asyncio.to_thread(response_store.put, StoredResponse(
+            id=response.id,
+            parent=request.previous_response_id,
+            messages=new_messages + [reply],
+            tools=tools,
+            tools_json=tools_json,
+            response=response.model_dump(mode="json"),
+            expires_at=time.time() + response_store.ttl,
+            owner=owner,
+        ))
+    return response
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from . import config
+from .schema_ir import IR_VERSION, build_type_builder, compile_schema_ir
+from .shared_cache import get_shared_store
+
+if TYPE_CHECKING:
+    from ..baml_client.baml_client.type_builder import TypeBuilder
+
+# (tools digest, parallel) -> TypeBuilder with the tools and Response.tool_call added.
+SchemaKey = Tuple[str, bool]
+
+
+def tools_digest(tools_json: bytes) -> str:
+    """Content hash of a tools array in its compact JSON form."""
+    return hashlib.sha256(tools_json).hexdigest()
+
+
+def compile_schema(tools: List[Dict[str, Any]], parallel: bool) -> Tuple["TypeBuilder", List[str]]:
+    """
+    Compile OpenAI tools into a TypeBuilder whose Response.tool_call is the
+    union of the tools: a list of them when `parallel`, a single object otherwise.
+
+    Returns the TypeBuilder and the names of the tools that compiled.
+    """
+    # Compiling through the serializable form is what lets recursive $refs work
+    schema = compile_schema_ir(tools, parallel)
+    return build_type_builder(schema), schema["tools"]
+
+
+def _shared_key(key: SchemaKey) -> bytes:
+    digest, parallel = key
+    return hashlib.sha256(f"{IR_VERSION}:{digest}:{int(parallel)}".encode()).digest()[:16]
+
+
+class SchemaCache:
+    """
+    Bounded LRU of compiled TypeBuilders keyed by tools digest and call mode.
+
+    A TypeBuilder is only read while BAML renders the prompt and parses the
+    response, so one compiled instance is shared by every request (and every
+    concurrent sample) that uses the same tools.
+
+    With `shared`, a miss first looks for the serialized schema in the
+    host-wide store (core/shared_cache.py), and schemas compiled here are
+    published there for the other workers.
+    """
+
+    def __init__(self, max_entries: int, shared: bool = False):
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries: "OrderedDict[SchemaKey, TypeBuilder]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: SchemaKey) -> Optional["TypeBuilder"]:
+        with self._lock:
+            tb = self._entries.get(key)
+            if tb is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return tb
+
+    def put(self, key: SchemaKey, tb: "TypeBuilder") -> None:
+        with self._lock:
+            self._entries[key] = tb
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key: SchemaKey) -> bool:
+        return key in self._entries
+
+    def get_or_compile(
+        self,
+        digest: str,
+        tools: List[Dict[str, Any]],
+        parallel: bool,
+        compile_ir: Optional[Callable[[List[Dict[str, Any]], bool], Dict[str, Any]]] = None,
+    ) -> "TypeBuilder":
+        """
+        Return the cached TypeBuilder for these tools, compiling it on a miss.
+        `compile_ir` replaces schema_ir.compile_schema_ir (e.g. to compile in
+        another process).
+        """
+        key = (digest, parallel)
+        tb = self.get(key)
+        if tb is None:
+            store = get_shared_store() if self.shared else None
+            payload = store.get(_shared_key(key)) if store is not None else None
+            if payload is not None:
+                schema = json.loads(payload)
+            else:
+                schema = (compile_ir or compile_schema_ir)(tools, parallel)
+                if store is not None:
+                    store.put(_shared_key(key), json.dumps(schema, separators=(",", ":")).encode())
+            tb = build_type_builder(schema)
+            self.put(key, tb)
+        return tb
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+schema_cache = SchemaCache(config.SCHEMA_CACHE_SIZE, shared=True)
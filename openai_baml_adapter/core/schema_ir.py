@@ -0,0 +1,395 @@
+"""
+A serializable form of a compiled tool schema.
+
+`parse_openai_tools` drives a TypeBuilder through a small set of calls
+(add_class, add_enum, string, union, ...). `RecordingTypeBuilder` accepts the
+same calls and records them as plain JSON-able data instead of building BAML
+types, so a compilation can be stored, shared between worker processes and
+later replayed into a real TypeBuilder with `build_type_builder`.
+
+Types are encoded as nested lists:
+
+    ["string"] ["int"] ["float"] ["bool"] ["null"] ["literal_string", value]
+    ["list", T] ["map", K, V] ["union", [T, ...]] ["optional", T]
+    ["class", name] ["enum", name]
+
+Recursive types (a `$ref` back to a class that is still being defined) are
+recorded like any other. BAML's programmatic builder can't render them, so
+`build_type_builder` declares each recursive class, and every type it can
+reach, from BAML source with `add_baml` instead.
+"""
+import re
+import warnings
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from .errors import SchemaTooComplexError
+from .parse import SchemaBudget, parse_json_schema, tool_parameters_schema
+
+if TYPE_CHECKING:
+    from ..baml_client.baml_client.type_builder import TypeBuilder
+
+# Bumped whenever the encoding changes, so stale shared entries are ignored.
+IR_VERSION = 2
+
+Schema = Dict[str, Any]
+
+
+class RecordedType:
+    """Stands in for a baml_py FieldType while recording."""
+
+    __slots__ = ("ir",)
+
+    def __init__(self, ir: list):
+        self.ir = ir
+
+    def list(self) -> "RecordedType":
+        return RecordedType(["list", self.ir])
+
+    def optional(self) -> "RecordedType":
+        return RecordedType(["optional", self.ir])
+
+
+class _RecordedProperty:
+    __slots__ = ("entry",)
+
+    def __init__(self, entry: list):
+        # [name, type, alias, description]
+        self.entry = entry
+
+    def alias(self, alias: Optional[str]) -> "_RecordedProperty":
+        self.entry[2] = alias
+        return self
+
+    def description(self, description: Optional[str]) -> "_RecordedProperty":
+        self.entry[3] = description
+        return self
+
+
+class _RecordedClass:
+    def __init__(self, name: str, properties: List[list]):
+        self.name = name
+        self._properties = properties
+
+    def add_property(self, name: str, type: RecordedType) -> _RecordedProperty:
+        entry = [name, type.ir, None, None]
+        self._properties.append(entry)
+        return _RecordedProperty(entry)
+
+    def type(self) -> RecordedType:
+        return RecordedType(["class", self.name])
+
+
+class _RecordedEnum:
+    def __init__(self, name: str, values: List[str]):
+        self.name = name
+        self._values = values
+
+    def add_value(self, value: str) -> None:
+        if value in self._values:
+            raise ValueError(f"Value {value} already exists.")
+        self._values.append(value)
+
+    def type(self) -> RecordedType:
+        return RecordedType(["enum", self.name])
+
+
+class RecordingTypeBuilder:
+    """The subset of TypeBuilder that `core/parse.py` uses, recorded as data."""
+
+    # Classes are only names here, so a class may refer to itself
+    supports_recursive_types = True
+
+    def __init__(self):
+        self.classes: Dict[str, List[list]] = {}
+        self.enums: Dict[str, List[str]] = {}
+        # Names the generated client already defines
+        self._reserved: Set[str] = {"Message", "Response"}
+
+    def _claim(self, name: str) -> None:
+        if name in self._reserved or name in self.classes or name in self.enums:
+            raise ValueError(f"Type with name {name} already exists.")
+
+    def add_class(self, name: str) -> _RecordedClass:
+        self._claim(name)
+        self.classes[name] = []
+        return _RecordedClass(name, self.classes[name])
+
+    def add_enum(self, name: str) -> _RecordedEnum:
+        self._claim(name)
+        self.enums[name] = []
+        return _RecordedEnum(name, self.enums[name])
+
+    def string(self) -> RecordedType:
+        return RecordedType(["string"])
+
+    def int(self) -> RecordedType:
+        return RecordedType(["int"])
+
+    def float(self) -> RecordedType:
+        return RecordedType(["float"])
+
+    def bool(self) -> RecordedType:
+        return RecordedType(["bool"])
+
+    def null(self) -> RecordedType:
+        return RecordedType(["null"])
+
+    def literal_string(self, value: str) -> RecordedType:
+        return RecordedType(["literal_string", value])
+
+    def list(self, inner: RecordedType) -> RecordedType:
+        return inner.list()
+
+    def map(self, key: RecordedType, value: RecordedType) -> RecordedType:
+        return RecordedType(["map", key.ir, value.ir])
+
+    def union(self, types: List[RecordedType]) -> RecordedType:
+        return RecordedType(["union", [t.ir for t in types]])
+
+
+def compile_tool_ir(function: Dict[str, Any], budget: Optional[SchemaBudget] = None) -> Schema:
+    """
+    Compile one OpenAI function on its own, raising if it doesn't compile.
+
+    The fragment holds the classes and enums the tool needs, the type of its
+    call and which of those types must be declared from BAML source because
+    they are recursive; `assemble_schema` combines fragments into a schema.
+    """
+    recorder = RecordingTypeBuilder()
+    field_type = parse_json_schema(tool_parameters_schema(function), recorder, budget)  # type: ignore[arg-type]
+    recursive = _recursive_closure(recorder.classes, recorder.enums)
+    if recursive:
+        # Fail here, per tool, rather than when the whole schema is built
+        baml_source(recorder.classes, recorder.enums, recursive)
+    return {
+        "classes": recorder.classes,
+        "enums": recorder.enums,
+        "type": field_type.ir,
+        "recursive": sorted(recursive),
+    }
+
+
+def compile_schema_ir(tools: List[Dict[str, Any]], parallel: bool) -> Schema:
+    """
+    Compile OpenAI tools into the serializable schema form.
+
+    Like parse_openai_tools, tools that don't compile are skipped with a
+    warning, and the schema budget is shared by all of them.
+    """
+    budget = SchemaBudget()
+    fragments: Dict[str, Schema] = {}
+    classes: Dict[str, Any] = {}
+    enums: Dict[str, Any] = {}
+    for tool in tools:
+        if tool.get("type") != "function":
+            continue
+        function = tool.get("function", {})
+        tool_name = function.get("name")
+        if not tool_name:
+            continue
+        try:
+            fragment = compile_tool_ir(function, budget)
+            clash = fragment_conflict(fragment, classes, enums)
+            if clash is not None:
+                raise ValueError(f"Type with name {clash} already exists.")
+        except SchemaTooComplexError as e:
+            raise SchemaTooComplexError(f"Tool {tool_name}: {e}") from None
+        except Exception as e:
+            warnings.warn(f"Failed to parse tool {tool_name}: {e}")
+            continue
+        classes.update(fragment["classes"])
+        enums.update(fragment["enums"])
+        fragments[tool_name] = fragment
+    return assemble_schema(fragments, parallel)
+
+
+def fragment_conflict(fragment: Schema, classes: Dict[str, Any], enums: Dict[str, Any]) -> Optional[str]:
+    """Name of a type `fragment` defines differently from `classes`/`enums`, if any."""
+    for name, properties in fragment["classes"].items():
+        if name in enums or classes.get(name, properties) != properties:
+            return name
+    for name, values in fragment["enums"].items():
+        if name in classes or enums.get(name, values) != values:
+            return name
+    return None
+
+
+def assemble_schema(fragments: Dict[str, Schema], parallel: bool) -> Schema:
+    """
+    Combine per-tool fragments (tool name -> fragment) into one schema.
+
+    Fragments must not conflict (see `fragment_conflict`); types they share
+    with identical definitions are declared once.
+    """
+    classes: Dict[str, List[list]] = {}
+    enums: Dict[str, List[str]] = {}
+    recursive: Set[str] = set()
+    for fragment in fragments.values():
+        classes.update(fragment["classes"])
+        enums.update(fragment["enums"])
+        recursive.update(fragment["recursive"])
+    tool_call = None
+    if fragments:
+        tool_call = ["union", [fragment["type"] for fragment in fragments.values()]]
+        if parallel:
+            tool_call = ["list", tool_call]
+    return {
+        "version": IR_VERSION,
+        "classes": classes,
+        "enums": enums,
+        "recursive": sorted(recursive),
+        "tool_call": tool_call,
+        "tools": list(fragments),
+    }
+
+
+def _references(ir: list) -> Iterator[Tuple[str, str]]:
+    """The ("class" | "enum", name) pairs a type refers to."""
+    kind = ir[0]
+    if kind in ("class", "enum"):
+        yield kind, ir[1]
+    elif kind in ("list", "optional"):
+        yield from _references(ir[1])
+    elif kind == "map":
+        yield from _references(ir[1])
+        yield from _references(ir[2])
+    elif kind == "union":
+        for member in ir[1]:
+            yield from _references(member)
+
+
+def _recursive_closure(classes: Dict[str, List[list]], enums: Dict[str, List[str]]) -> Set[str]:
+    """Classes on a reference cycle, plus every class and enum they reach."""
+    edges = {
+        name: {ref for prop in properties for ref in _references(prop[1])}
+        for name, properties in classes.items()
+    }
+
+    def reachable(start: Set[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        seen: Set[Tuple[str, str]] = set()
+        stack = list(start)
+        while stack:
+            node = stack.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            if node[0] == "class":
+                stack.extend(edges.get(node[1], ()))
+        return seen
+
+    cyclic = {("class", name) for name in classes if ("class", name) in reachable(edges[name])}
+    if not cyclic:
+        return set()
+    return {name for _, name in reachable(cyclic)}
+
+
+_BAML_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_BAML_TYPE_NAME = re.compile(r"^[A-Z][A-Za-z0-9_]*$")
+
+
+def _baml_string(value: str) -> str:
+    hashes = "#"
+    while f'"{hashes}' in value:
+        hashes += "#"
+    return f'{hashes}"{value}"{hashes}'
+
+
+def _baml_type(ir: list) -> str:
+    kind = ir[0]
+    if kind in ("class", "enum"):
+        return ir[1]
+    if kind == "list":
+        return f"({_baml_type(ir[1])})[]"
+    if kind == "optional":
+        return f"({_baml_type(ir[1])})?"
+    if kind == "union":
+        return " | ".join(f"({_baml_type(member)})" for member in ir[1])
+    if kind == "map":
+        return f"map<{_baml_type(ir[1])}, {_baml_type(ir[2])}>"
+    if kind == "literal_string":
+        if '"' in ir[1] or "\\" in ir[1]:
+            raise ValueError(f"Literal {ir[1]!r} can't be used in a recursive type")
+        return f'"{ir[1]}"'
+    return kind
+
+
+def baml_source(classes: Dict[str, List[list]], enums: Dict[str, List[str]], names: Set[str]) -> str:
+    """
+    BAML source declaring the classes and enums in `names`, for `add_baml`.
+
+    Raises ValueError when a name can't be written in BAML source (type
+    names must start with an uppercase letter, fields and enum values must
+    be identifiers).
+    """
+    lines: List[str] = []
+    for name in sorted(names):
+        if not _BAML_TYPE_NAME.match(name):
+            raise ValueError(f"Recursive type '{name}' needs a name starting with an uppercase letter")
+        if name in enums:
+            lines.append(f"enum {name} {{")
+            for value in enums[name]:
+                if not _BAML_IDENTIFIER.match(value):
+                    raise ValueError(f"Enum value '{value}' of recursive type '{name}' isn't an identifier")
+                lines.append(f"  {value}")
+        else:
+            lines.append(f"class {name} {{")
+            for prop_name, prop_type, alias, description in classes[name]:
+                if not _BAML_IDENTIFIER.match(prop_name):
+                    raise ValueError(f"Field '{prop_name}' of recursive type '{name}' isn't an identifier")
+                line = f"  {prop_name} {_baml_type(prop_type)}"
+                if alias is not None:
+                    line += f" @alias({_baml_string(alias)})"
+                if description is not None:
+                    line += f" @description({_baml_string(description)})"
+                lines.append(line)
+        lines.append("}")
+    return "\n".join(lines)
+
+
+def build_type_builder(schema: Schema) -> "TypeBuilder":
+    """Replay a compiled schema into a fresh TypeBuilder."""
+    from ..baml_client.baml_client.type_builder import TypeBuilder
+
+    tb = TypeBuilder()
+    raw = tb._tb
+    recursive = set(schema["recursive"])
+    if recursive:
+        tb.add_baml(baml_source(schema["classes"], schema["enums"], recursive))
+
+    def field_type(ir: list):
+        kind = ir[0]
+        if kind == "class":
+            return raw.class_(ir[1]).field()
+        if kind == "enum":
+            return raw.enum(ir[1]).field()
+        if kind == "list":
+            return field_type(ir[1]).list()
+        if kind == "optional":
+            return field_type(ir[1]).optional()
+        if kind == "union":
+            return raw.union(*[field_type(t) for t in ir[1]])
+        if kind == "map":
+            return raw.map(field_type(ir[1]), field_type(ir[2]))
+        if kind == "literal_string":
+            return raw.literal_string(ir[1])
+        return getattr(raw, kind)()
+
+    for name, values in schema["enums"].items():
+        if name in recursive:
+            continue
+        enum = raw.enum(name)
+        for value in values:
+            enum.value(value)
+    for name, properties in schema["classes"].items():
+        if name in recursive:
+            continue
+        cls = raw.class_(name)
+        for prop_name, prop_type, alias, description in properties:
+            prop = cls.property(prop_name).type(field_type(prop_type))
+            if alias is not None:
+                prop.alias(alias)
+            if description is not None:
+                prop.description(description)
+    if schema["tool_call"] is not None:
+        tb.Response.add_property("tool_call", field_type(schema["tool_call"]))
+    return tb
@@ -0,0 +1,244 @@
+"""
+Persistent multi-turn sessions over a WebSocket (/v1/baml/sessions).
+
+Over HTTP, every agent turn re-sends the whole conversation and tool set, and
+the server re-reads both. A session instead fixes its tool set when it is
+created, compiling it once, and keeps the conversation on the server: a turn
+sends only the messages new since the last one and gets the reply's tool
+calls streamed back, each as soon as it is complete. The reply then joins
+the conversation.
+
+One connection can hold several sessions. Their turns run concurrently and
+their events are tagged with `session_id` and `turn_id`; a session's own
+turns run one after another, in the order they were sent.
+
+Client messages (JSON text frames):
+
+  {"type": "session.create", "model": ..., "tools": [...] or "toolset_id": ...,
+   "messages": [...], ...}                  other fields as in a chat request
+  {"type": "turn", "session_id": ..., "turn_id": ..., "messages": [...]}
+  {"type": "turn.cancel", "turn_id": ...}
+  {"type": "session.close", "session_id": ...}
+
+Server messages: `session.created`, `turn.chunk` (a chat.completion.chunk,
+as streamed over HTTP), `turn.done` (with the assistant message added to
+the conversation), `turn.cancelled`, `session.closed` and `error`.
+"""
+import asyncio
+import json
+import uuid
+from contextlib import aclosing
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from . import config, metrics
+from .errors import InvalidRequestError
+from .handler import _check_request, _compile_tools, _resolve_toolset, _select_tools, _to_baml_messages, handle_openai_request
+from .lifecycle import drain
+from .parse import TOOL_NAME_LLM_FIELD
+from ..models.baml import SessionCreate, SessionTurn
+from ..models.openai import CompletionRequest
+
+if TYPE_CHECKING:
+    from ..baml_client.baml_client.types import Message as BamlMessage
+
+SESSIONS = metrics.Gauge("baml_sessions", "Open WebSocket sessions")
+TURNS = metrics.Counter("baml_session_turns_total", "Session turns, by outcome")
+
+_open_sessions = 0
+
+
+class Session:
+    def __init__(
+        self, session_id: str, template: CompletionRequest, headers: Dict[str, str], history: List["BamlMessage"]
+    ):
+        self.id = session_id
+        # The fixed part of every turn's request, with its tools already resolved
+        self.template = template
+        self.headers = headers
+        # The conversation so far, already converted for BAML. The opening
+        # messages are always kept; later ones up to SESSION_HISTORY_MESSAGES.
+        self.history = history
+        self.opening = len(history)
+        self.lock = asyncio.Lock()
+
+    def extend(self, messages: List["BamlMessage"]) -> None:
+        self.history += messages
+        excess = len(self.history) - self.opening - config.SESSION_HISTORY_MESSAGES
+        if excess > 0:
+            del self.history[self.opening:self.opening + excess]
+
+
+async def create_session(create: SessionCreate, headers: Dict[str, str]) -> Session:
+    """Resolve and compile the session's tools and convert its opening messages."""
+    template = CompletionRequest(
+        **create.model_dump(exclude={"session_id", "messages"}, exclude_none=True), messages=[], stream=True
+    )
+    _check_request(template)
+    await _resolve_toolset(template, headers)
+    template.toolset_id = None
+    headers = {name: value for name, value in headers.items() if name != "x-baml-toolset"}
+    if not template.tools or template.tool_choice == "none":
+        raise InvalidRequestError("A session needs tools to call")
+    # Compile now so turns find the schema cached (and a bad tool set fails here)
+    await _compile_tools(*_select_tools(template))
+    history = _to_baml_messages(create.messages)
+    return Session(create.session_id or f"sess_{uuid.uuid4().hex}", template, headers, history)
+
+
+def _assistant_message(tool_calls: List[Dict[str, Any]], content: Optional[str]) -> Dict[str, Any]:
+    message: Dict[str, Any] = {"role": "assistant", "content": content}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    return message
+
+
+def _reply_as_sent(tool_calls: List[Dict[str, Any]], content: Optional[str], parallel: bool) -> Dict[str, Any]:
+    """
+    The assistant message as the model wrote it, for the history: its tool
+    calls as Response JSON, so later turns see the calls their tool results
+    answer.
+    """
+    if not tool_calls:
+        return {"role": "assistant", "content": content}
+    calls = [
+        {TOOL_NAME_LLM_FIELD: call["function"]["name"], **json.loads(call["function"]["arguments"] or "{}")}
+        for call in tool_calls
+    ]
+    return {"role": "assistant", "content": json.dumps({"tool_call": calls if parallel else calls[0]})}
+
+
+class SessionConnection:
+    """The sessions and running turns of one WebSocket connection."""
+
+    def __init__(self, send: Callable[[Dict[str, Any]], Awaitable[None]], headers: Dict[str, str]):
+        self._send = send
+        self._send_lock = asyncio.Lock()
+        self.headers = headers
+        self.sessions: Dict[str, Session] = {}
+        self.turns: Dict[str, asyncio.Task] = {}
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        async with self._send_lock:
+            await self._send(message)
+
+    async def handle(self, text: str) -> None:
+        """Act on one client message; turns are started and run in the background."""
+        try:
+            message = json.loads(text)
+            if not isinstance(message, dict):
+                raise InvalidRequestError("messages must be JSON objects")
+            kind = message.pop("type", None)
+            if drain.draining and kind in ("session.create", "turn"):
+                raise InvalidRequestError("Server is shutting down")
+            if kind == "session.create":
+                await self._create(SessionCreate.model_validate(message))
+            elif kind == "turn":
+                self._start_turn(SessionTurn.model_validate(message))
+            elif kind == "turn.cancel":
+                task = self.turns.get(_string_id(message, "turn_id"))
+                if task is not None:
+                    task.cancel()
+            elif kind == "session.close":
+                await self._close_session(_string_id(message, "session_id"))
+            else:
+                raise InvalidRequestError(f"Unknown message type '{kind}'")
+        except (json.JSONDecodeError, ValidationError, InvalidRequestError) as e:
+            await self.send({"type": "error", "message": str(e)})
+
+    async def _create(self, create: SessionCreate) -> None:
+        if len(self.sessions) >= config.SESSIONS_PER_CONNECTION:
+            raise InvalidRequestError(f"At most {config.SESSIONS_PER_CONNECTION} sessions per connection")
+        if create.session_id in self.sessions:
+            raise InvalidRequestError(f"Session '{create.session_id}' already exists")
+        session = await create_session(create, self.headers)
+        self.sessions[session.id] = session
+        _count_sessions(1)
+        await self.send({"type": "session.created", "session_id": session.id, "tools": len(session.template.tools)})
+
+    def _start_turn(self, turn: SessionTurn) -> None:
+        session = self.sessions.get(turn.session_id)
+        if session is None:
+            raise InvalidRequestError(f"Unknown session '{turn.session_id}'")
+        turn_id = turn.turn_id or f"turn_{uuid.uuid4().hex}"
+        if turn_id in self.turns:
+            raise InvalidRequestError(f"Turn '{turn_id}' is already running")
+        if len(self.turns) >= config.SESSION_TURNS_PER_CONNECTION:
+            raise InvalidRequestError(
+                f"At most {config.SESSION_TURNS_PER_CONNECTION} turns per connection may be running or queued"
+            )
+        task = asyncio.ensure_future(self._run_turn(session, turn_id, turn.messages))
+        self.turns[turn_id] = task
+        task.add_done_callback(lambda _: self.turns.pop(turn_id, None))
+
+    async def _run_turn(self, session: Session, turn_id: str, messages: List[Dict[str, Any]]) -> None:
+        ids = {"session_id": session.id, "turn_id": turn_id}
+        try:
+            # Counted in flight for shutdown draining, sending turn.done included
+            with drain.track():
+                async with session.lock:
+                    new = _to_baml_messages(messages)
+                    chunks = await handle_openai_request(
+                        session.template, None, session.headers, baml_messages=session.history + new
+                    )
+                    tool_calls: List[Dict[str, Any]] = []
+                    content = None
+                    finish_reason = None
+                    async with aclosing(chunks):
+                        async for chunk in chunks:
+                            data = chunk.model_dump(mode="json", exclude_none=True)
+                            for choice in data["choices"]:
+                                delta = choice["delta"]
+                                for call in delta.get("tool_calls") or []:
+                                    tool_calls.append(
+                                        {"id": call["id"], "type": "function", "function": call["function"]}
+                                    )
+                                content = delta.get("content", content)
+                                finish_reason = choice.get("finish_reason") or finish_reason
+                            await self.send({"type": "turn.chunk", **ids, "chunk": data})
+                    reply = _assistant_message(tool_calls, content)
+                    # Only a finished turn joins the conversation
+                    parallel = session.template.parallel_tool_calls is not False
+                    session.extend(new + _to_baml_messages([_reply_as_sent(tool_calls, content, parallel)]))
+                TURNS.inc(outcome="done")
+                await self.send({"type": "turn.done", **ids, "message": reply, "finish_reason": finish_reason})
+        except asyncio.CancelledError:
+            TURNS.inc(outcome="cancelled")
+            await self.send({"type": "turn.cancelled", **ids})
+        except Exception as e:
+            TURNS.inc(outcome="error")
+            await self.send({"type": "error", **ids, "message": str(e)})
+
+    async def _close_session(self, session_id: str) -> None:
+        if self.sessions.pop(session_id, None) is None:
+            raise InvalidRequestError(f"Unknown session '{session_id}'")
+        _count_sessions(-1)
+        await self.send({"type": "session.closed", "session_id": session_id})
+
+    async def close(self) -> None:
+        """The connection has gone: cancel its turns and drop its sessions."""
+        tasks = list(self.turns.values())
+        for task in tasks:
+            task.cancel()
+        self._send = _discard
+        await asyncio.gather(*tasks, return_exceptions=True)
+        _count_sessions(-len(self.sessions))
+        self.sessions.clear()
+
+
+def _string_id(message: Dict[str, Any], key: str) -> str:
+    value = message.get(key)
+    if not isinstance(value, str):
+        raise InvalidRequestError(f"'{key}' must be a string")
+    return value
+
+
+async def _discard(message: Dict[str, Any]) -> None:
+    pass
+
+
+def _count_sessions(delta: int) -> None:
+    global _open_sessions
+    _open_sessions += delta
+    SESSIONS.set(_open_sessions)
@@ -0,0 +1,174 @@
+"""
+Compiled tool schemas shared by every worker process on the host.
+
+Each worker keeps its own LRU of ready TypeBuilders (core/schema_cache.py),
+but a TypeBuilder can't cross a process boundary. What can is the serialized
+schema from core/schema_ir.py, so workers publish every schema they compile
+into a memory-mapped file and look there before compiling one themselves.
+
+File layout (little-endian):
+
+    header   magic, bucket count, data capacity, write position
+    buckets  one slot per key hash: seq, key, position, length, crc32
+    data     ring buffer of records (16-byte key + payload)
+
+Reads take no lock. Each bucket is guarded by a sequence number that a writer
+makes odd while it rewrites the slot, so a reader that sees an odd or changed
+number retries. Records are appended at a monotonically increasing write
+position; a reader knows a record has been overwritten once the write
+position has moved more than one ring length past it, and the crc32 catches
+anything else. Writers (rare: only on a compile miss) serialize on an flock.
+
+The cache is bounded by the file size: new records overwrite the oldest data
+in the ring, and a key that hashes to an occupied bucket replaces its entry.
+The layout (bucket count and size) is part of the file name, so workers
+configured differently use different files; a file another worker has mapped
+is never truncated, since that would crash it with SIGBUS.
+"""
+import mmap
+import os
+import struct
+import threading
+import warnings
+import zlib
+from typing import Optional
+
+from . import config
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+MAGIC = b"BAMLSC01"
+_HEADER = struct.Struct("<8sIIQQ")  # magic, buckets, reserved, capacity, write position
+_HEADER_SIZE = 64
+_WRITE_POS_OFFSET = 24
+_BUCKET = struct.Struct("<Q16sQII")  # seq, key, position, length, crc32
+_SEQ = struct.Struct("<Q")
+_KEY_SIZE = 16
+
+
+class SharedSchemaStore:
+    """A size-bounded, cross-process key/value store for serialized schemas."""
+
+    def __init__(self, path: str, size_bytes: int, buckets: int = 4096):
+        if fcntl is None:
+            raise OSError("shared schema cache needs fcntl")
+        self.path = f"{path}-{buckets}x{size_bytes}"
+        self.buckets = buckets
+        self._data_offset = _HEADER_SIZE + buckets * _BUCKET.size
+        self.capacity = size_bytes - self._data_offset
+        if self.capacity <= 0:
+            raise ValueError("shared schema cache is too small for its index")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self._fd).st_size < size_bytes:
+                    # Only ever grown (a new file is empty), so no mapping loses pages
+                    os.ftruncate(self._fd, size_bytes)
+                header = os.pread(self._fd, _HEADER.size, 0)
+                if header == bytes(_HEADER.size):
+                    os.pwrite(self._fd, _HEADER.pack(MAGIC, buckets, 0, self.capacity, 0), 0)
+                elif _HEADER.unpack(header)[:4] != (MAGIC, buckets, 0, self.capacity):
+                    raise ValueError(f"{self.path} is not a shared schema cache with this layout")
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        except BaseException:
+            os.close(self._fd)
+            raise
+        self._mm = mmap.mmap(self._fd, size_bytes)
+
+    def _write_pos(self) -> int:
+        return _SEQ.unpack_from(self._mm, _WRITE_POS_OFFSET)[0]
+
+    def _bucket_offset(self, key: bytes) -> int:
+        return _HEADER_SIZE + (int.from_bytes(key[:8], "little") % self.buckets) * _BUCKET.size
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        """Return the payload stored under the 16-byte `key`, or None."""
+        payload = self._read(key)
+        if payload is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return payload
+
+    def _read(self, key: bytes) -> Optional[bytes]:
+        offset = self._bucket_offset(key)
+        for _ in range(4):
+            seq, stored_key, position, length, crc = _BUCKET.unpack_from(self._mm, offset)
+            if seq % 2 == 0 and _SEQ.unpack_from(self._mm, offset)[0] == seq:
+                break
+        else:
+            return None  # a writer kept the slot busy; compiling is cheaper than waiting
+        if seq == 0 or stored_key != key:
+            return None
+
+        start = self._data_offset + position % self.capacity
+        record = self._mm[start:start + length]
+        # The ring has lapped this record if the writer is more than one ring length ahead
+        if self._write_pos() > position + self.capacity:
+            return None
+        if zlib.crc32(record) != crc or record[:_KEY_SIZE] != key:
+            return None
+        return record[_KEY_SIZE:]
+
+    def put(self, key: bytes, payload: bytes) -> bool:
+        """Store `payload` under the 16-byte `key`; False if it can't fit."""
+        record = key + payload
+        if len(record) > self.capacity // 4:
+            return False
+        crc = zlib.crc32(record)
+        offset = self._bucket_offset(key)
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                position = self._write_pos()
+                room = self.capacity - position % self.capacity
+                if len(record) > room:
+                    # Records never wrap; start the next lap instead
+                    position += room
+                # Publish the new write position before touching the data so
+                # readers of what is being overwritten see it as gone
+                _SEQ.pack_into(self._mm, _WRITE_POS_OFFSET, position + len(record))
+                start = self._data_offset + position % self.capacity
+                self._mm[start:start + len(record)] = record
+
+                seq = _SEQ.unpack_from(self._mm, offset)[0]
+                _SEQ.pack_into(self._mm, offset, seq + 1)
+                _BUCKET.pack_into(self._mm, offset, seq + 1, key, position, len(record), crc)
+                _SEQ.pack_into(self._mm, offset, seq + 2)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return True
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
+
+
+# Opened on first use; False once opening has failed so we don't retry per request.
+_store = None
+
+
+def get_shared_store() -> Optional[SharedSchemaStore]:
+    """Return this process's handle on the shared schema cache, or None if disabled."""
+    global _store
+    if _store is None:
+        if config.SHARED_SCHEMA_CACHE_MB <= 0:
+            _store = False
+        else:
+            try:
+                _store = SharedSchemaStore(
+                    config.SHARED_SCHEMA_CACHE_PATH, int(config.SHARED_SCHEMA_CACHE_MB * 1024 * 1024)
+                )
+            except (OSError, ValueError) as e:
+                warnings.warn(f"Shared schema cache disabled: {e}")
+                _store = False
+    return _store or None
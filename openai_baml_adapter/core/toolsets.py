@@ -0,0 +1,156 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from pydantic_core import to_json
+
+from . import config
+from .errors import InvalidRequestError
+from .schema_cache import compile_schema, schema_cache, tools_digest
+
+TOOLSET_ID_PREFIX = "ts_"
+_TOOLSET_ID_RE = re.compile(r"^ts_[0-9a-f]{64}$")
+
+
+@dataclass
+class Toolset:
+    id: str
+    tools: List[Dict[str, Any]]
+    tools_json: bytes
+    created: int
+
+    @property
+    def digest(self) -> str:
+        return self.id[len(TOOLSET_ID_PREFIX):]
+
+
+class ToolsetStore:
+    """
+    Registered tool sets, addressed by the content hash of their tools.
+
+    Tool sets are kept in memory and written to `directory` as
+    `<id>.json`, so they can be loaded again after a restart. Registering
+    a tool set compiles it once and warms the schema cache, so later
+    requests that reference it skip both JSON parsing and compilation.
+
+    At most `max_count` tool sets are stored: registering one more deletes
+    the oldest files, and the in-memory copies are an LRU of the same size.
+    A tool set over `max_bytes` of JSON is rejected. Registration compiles
+    and writes to disk, so callers on the event loop run it in a thread.
+    """
+
+    def __init__(self, directory: str, max_count: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.directory = directory
+        self.max_count = config.TOOLSET_MAX_COUNT if max_count is None else max_count
+        self.max_bytes = config.TOOLSET_MAX_BYTES if max_bytes is None else max_bytes
+        self._toolsets: "OrderedDict[str, Toolset]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, toolset_id: str) -> str:
+        return os.path.join(self.directory, f"{toolset_id}.json")
+
+    def register(self, tools: List[Dict[str, Any]]) -> Toolset:
+        if not tools or not all(isinstance(tool, dict) for tool in tools):
+            raise InvalidRequestError("tools must be a non-empty list of objects")
+
+        tools_json = to_json(tools)
+        if len(tools_json) > self.max_bytes:
+            raise InvalidRequestError(f"Tool set is larger than {self.max_bytes} bytes")
+        digest = tools_digest(tools_json)
+        toolset_id = TOOLSET_ID_PREFIX + digest
+        existing = self.get(toolset_id)
+        if existing is not None:
+            return existing
+
+        # Compile up front: a tool set that doesn't compile is rejected now,
+        # not on every request that uses it.
+        tb, compiled = compile_schema(tools, parallel=True)
+        declared = [tool.get("function", {}).get("name") for tool in tools if tool.get("type") == "function"]
+        failed = [name for name in declared if name not in compiled]
+        if failed or not compiled:
+            raise InvalidRequestError(f"Tools failed to compile: {', '.join(map(str, failed)) or 'no function tools'}")
+        schema_cache.put((digest, True), tb)
+
+        toolset = Toolset(id=toolset_id, tools=tools, tools_json=tools_json, created=int(time.time()))
+        self._write(toolset)
+        self._remember(toolset)
+        self._evict_files(keep=toolset_id)
+        return toolset
+
+    def get(self, toolset_id: str) -> Optional[Toolset]:
+        with self._lock:
+            toolset = self._toolsets.get(toolset_id)
+            if toolset is not None:
+                self._toolsets.move_to_end(toolset_id)
+                return toolset
+        toolset = self._read(toolset_id)
+        if toolset is not None:
+            self._remember(toolset)
+        return toolset
+
+    def _remember(self, toolset: Toolset) -> None:
+        with self._lock:
+            self._toolsets[toolset.id] = toolset
+            self._toolsets.move_to_end(toolset.id)
+            while len(self._toolsets) > self.max_count:
+                self._toolsets.popitem(last=False)
+
+    def _evict_files(self, keep: str) -> None:
+        """Delete the oldest stored tool sets (by modification time) beyond max_count."""
+        paths = []
+        for filename in os.listdir(self.directory):
+            if filename.startswith(TOOLSET_ID_PREFIX) and filename.endswith(".json") and filename != f"{keep}.json":
+                path = os.path.join(self.directory, filename)
+                try:
+                    paths.append((os.stat(path).st_mtime, filename[:-len(".json")], path))
+                except FileNotFoundError:
+                    pass  # evicted by another worker
+        paths.sort()
+        for _, toolset_id, path in paths[:max(0, len(paths) + 1 - self.max_count)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            with self._lock:
+                self._toolsets.pop(toolset_id, None)
+
+    def load_all(self) -> List[Toolset]:
+        """Load every persisted tool set into memory."""
+        if not os.path.isdir(self.directory):
+            return []
+        loaded = []
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.startswith(TOOLSET_ID_PREFIX) and filename.endswith(".json"):
+                toolset = self.get(filename[:-len(".json")])
+                if toolset is not None:
+                    loaded.append(toolset)
+        return loaded
+
+    def _write(self, toolset: Toolset) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temporary file and rename, so readers (including other
+        # workers) never see a partial file.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(to_json({"id": toolset.id, "created": toolset.created, "tools": toolset.tools}))
+        os.replace(tmp_path, self._path(toolset.id))
+
+    def _read(self, toolset_id: str) -> Optional[Toolset]:
+        if not _TOOLSET_ID_RE.match(toolset_id):
+            return None
+        try:
+            with open(self._path(toolset_id), "rb") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        tools = data["tools"]
+        return Toolset(id=toolset_id, tools=tools, tools_json=to_json(tools), created=data.get("created", 0))
+
+
+toolsets = ToolsetStore(config.TOOLSET_DIR)
@@ -0,0 +1,146 @@
+"""
+Event-loop stall detection.
+
+A heartbeat task on the event loop wakes every BAML_STALL_INTERVAL_MS and
+records how late it woke (the loop's lag) in a histogram. A monitor thread
+checks the heartbeat on the same interval; once the loop has gone
+BAML_STALL_THRESHOLD_MS without one, the thread samples the loop thread's
+Python stack, and keeps sampling until the loop comes back. Each stall is
+kept with its duration, its distinct stacks and the IDs of the requests in
+flight at the time, for GET /debug/stalls.
+
+The cost is one loop wakeup and one thread wakeup per interval; stacks are
+only captured while the loop is stalled. Code that holds the GIL without
+running Python (a long native call) delays the monitor too, so such a stall
+is sampled once the call returns control to Python, at the frame that made
+the call.
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from . import config, metrics
+
+MAX_STACKS_PER_STALL = 8
+
+LOOP_LAG = metrics.Histogram(
+    "baml_event_loop_lag_seconds",
+    "How late the event loop ran the watchdog heartbeat",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+LOOP_STALLS = metrics.Counter("baml_event_loop_stalls_total", "Event-loop stalls over BAML_STALL_THRESHOLD_MS")
+INFLIGHT = metrics.Gauge("baml_inflight_requests", "Requests being handled")
+
+
+class InFlightRequests:
+    """IDs of the requests this worker is handling, with their route and start time."""
+
+    def __init__(self):
+        self._requests: Dict[str, Tuple[str, float]] = {}
+
+    def add(self, request_id: str, route: str) -> None:
+        self._requests[request_id] = (route, time.monotonic())
+        INFLIGHT.set(len(self._requests))
+
+    def remove(self, request_id: str) -> None:
+        self._requests.pop(request_id, None)
+        INFLIGHT.set(len(self._requests))
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        # Copy first: the monitor thread reads while the loop may be writing
+        return [
+            {"id": request_id, "route": route, "age_ms": round((now - started) * 1000, 1)}
+            for request_id, (route, started) in list(self._requests.items())
+        ]
+
+    def __len__(self) -> int:
+        return len(self._requests)
+
+
+inflight = InFlightRequests()
+
+
+@dataclass
+class Stall:
+    started_at: float
+    duration_ms: float
+    requests: List[Dict[str, Any]]
+    stacks: List[List[str]] = field(default_factory=list)
+    ended: bool = False
+
+
+class LoopWatchdog:
+    def __init__(self, interval: float, threshold: float, max_stalls: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls: Deque[Stall] = deque(maxlen=max_stalls)
+        self._beat = time.monotonic()
+        self._current: Optional[Stall] = None
+        self._loop_thread: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    async def run(self) -> None:
+        """The heartbeat; runs on the loop being watched until cancelled."""
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._monitor, name="baml-loop-watchdog", daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                start = time.monotonic()
+                self._beat = start
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                LOOP_LAG.observe(max(0.0, now - start - self.interval))
+                self._beat = now
+                stall = self._current
+                if stall is not None:
+                    self._current = None
+                    stall.duration_ms = round((now - start - self.interval) * 1000, 1)
+                    stall.ended = True
+        finally:
+            self._stop.set()
+
+    def _monitor(self) -> None:
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            stalled = time.monotonic() - beat
+            if stalled < self.threshold:
+                continue
+            stack = self._loop_stack()
+            if beat != self._beat:
+                continue  # the loop came back while we were sampling
+            stall = self._current
+            if stall is None:
+                stall = Stall(started_at=time.time() - stalled, duration_ms=0.0, requests=inflight.snapshot())
+                self._current = stall
+                self.stalls.append(stall)
+                LOOP_STALLS.inc()
+            stall.duration_ms = round(stalled * 1000, 1)
+            if stack and stack not in stall.stacks and len(stall.stacks) < MAX_STACKS_PER_STALL:
+                stall.stacks.append(stack)
+
+    def _loop_stack(self) -> List[str]:
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return []
+        return [line.rstrip() for line in traceback.format_stack(frame)]
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "stalls_total": LOOP_STALLS.value(),
+            "stalls": [asdict(stall) for stall in reversed(self.stalls)],
+        }
+
+
+watchdog = LoopWatchdog(config.STALL_INTERVAL_MS / 1000, config.STALL_THRESHOLD_MS / 1000)
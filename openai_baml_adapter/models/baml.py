@@ -0,0 +1,50 @@
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel
+
+
+class ToolsetCreateRequest(BaseModel):
+    tools: List[Dict[str, Any]]
+
+
+class ToolsetObject(BaseModel):
+    id: str
+    object: str = "baml.toolset"
+    created: int
+    tools: List[Dict[str, Any]]
+
+
+class McpServerStatus(BaseModel):
+    tools: List[str]
+    errors: Dict[str, str]
+
+
+class McpCatalogObject(BaseModel):
+    object: str = "baml.mcp_catalog"
+    path: str
+    version: int
+    loaded_at: Optional[int]
+    errors: List[str]
+    servers: Dict[str, McpServerStatus]
+
+
+class SessionCreate(BaseModel):
+    """`session.create`: the request fields that stay fixed for a session's turns."""
+    model: str
+    tools: Optional[List[Dict[str, Any]]] = None
+    toolset_id: Optional[str] = None
+    tool_choice: Optional[Union[str, Dict[str, Any]]] = None
+    parallel_tool_calls: Optional[bool] = None
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    prompt_cache_key: Optional[str] = None
+    # Opening messages, such as the system prompt
+    messages: List[Dict[str, Any]] = []
+    session_id: Optional[str] = None
+
+
+class SessionTurn(BaseModel):
+    """`turn`: the messages new since the session's last turn."""
+    session_id: str
+    turn_id: Optional[str] = None
+    messages: List[Dict[str, Any]]
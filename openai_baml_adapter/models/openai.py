@@ -1,5 +1,7 @@
 from typing import Any, Dict, List, Optional, Union
-from pydantic import BaseModel
+
+from pydantic import BaseModel, PrivateAttr, SkipValidation
+from pydantic_core import to_json
 
 
 class FunctionCall(BaseModel):
@@ -26,12 +28,41 @@ class Tool(BaseModel):
 
 class CompletionRequest(BaseModel):
     model: str
-    messages: List[Message]
-    tools: Optional[List[Tool]] = None
+    # Messages and tools stay as the JSON the client sent (see `Message` and
+    # `Tool` for their shape). They aren't validated up front: the handler
+    # checks that both are lists (defaulting a tool's `type` to "function"),
+    # and each path checks only the fields it actually reads.
+    messages: SkipValidation[List[Dict[str, Any]]]
+    tools: SkipValidation[Optional[List[Dict[str, Any]]]] = None
     tool_choice: Optional[Union[str, Dict[str, Any]]] = None
+    parallel_tool_calls: Optional[bool] = None
+    n: Optional[int] = None
     temperature: Optional[float] = None
     max_tokens: Optional[int] = None
     stream: Optional[bool] = False
+    stream_options: Optional[Dict[str, Any]] = None
+    prompt_cache_key: Optional[str] = None
+    # Extension: use a tool set registered at /v1/baml/toolsets instead of `tools`
+    toolset_id: Optional[str] = None
+
+    _tools_json: Optional[bytes] = PrivateAttr(default=None)
+
+    @property
+    def tools_json(self) -> bytes:
+        """
+        `tools` as compact JSON bytes, encoded once per request.
+
+        This is the key for hashing and schema-cache lookups. It doesn't depend
+        on the client's whitespace, so identical tool sets always match.
+        """
+        if self._tools_json is None:
+            self._tools_json = to_json(self.tools or [])
+        return self._tools_json
+
+    def set_tools(self, tools: List[Dict[str, Any]], tools_json: bytes) -> None:
+        """Replace `tools`, e.g. from a registered tool set, with its known JSON encoding."""
+        self.tools = tools
+        self._tools_json = tools_json
 
 
 class Choice(BaseModel):
@@ -40,10 +71,15 @@ class Choice(BaseModel):
     finish_reason: Optional[str] = None
 
 
+class PromptTokensDetails(BaseModel):
+    cached_tokens: int = 0
+
+
 class Usage(BaseModel):
     prompt_tokens: int
     completion_tokens: int
     total_tokens: int
+    prompt_tokens_details: Optional[PromptTokensDetails] = None
 
 
 class CompletionResponse(BaseModel):
@@ -52,4 +88,43 @@ class CompletionResponse(BaseModel):
     created: int
     model: str
     choices: List[Choice]
-    usage: Optional[Usage] = None
\ No newline at end of file
+    usage: Optional[Usage] = None
+
+
+class FunctionCallDelta(BaseModel):
+    name: Optional[str] = None
+    arguments: Optional[str] = None
+
+
+class ToolCallDelta(BaseModel):
+    index: int
+    id: Optional[str] = None
+    type: Optional[str] = None
+    function: Optional[FunctionCallDelta] = None
+    # Extension: this call is complete and won't change in later chunks
+    baml_final: Optional[bool] = None
+
+
+class Delta(BaseModel):
+    role: Optional[str] = None
+    content: Optional[str] = None
+    tool_calls: Optional[List[ToolCallDelta]] = None
+    # Extension: a snapshot of the tool call still being written, with the
+    # arguments parsed so far. Kept out of tool_calls, whose arguments
+    # clients concatenate across chunks.
+    baml_partial: Optional[ToolCallDelta] = None
+
+
+class ChunkChoice(BaseModel):
+    index: int
+    delta: Delta
+    finish_reason: Optional[str] = None
+
+
+class CompletionChunk(BaseModel):
+    id: str
+    object: str = "chat.completion.chunk"
+    created: int
+    model: str
+    choices: List[ChunkChoice]
+    usage: Optional[Usage] = None
@@ -0,0 +1,41 @@
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel, SkipValidation
+
+
+class ResponsesRequest(BaseModel):
+    """The subset of the OpenAI Responses API that /v1/responses serves."""
+    model: str
+    # A string (one user message) or a list of input items, kept as sent
+    input: SkipValidation[Union[str, List[Dict[str, Any]]]]
+    instructions: Optional[str] = None
+    # Responses-style function tools: {"type": "function", "name", "description", "parameters"}
+    tools: SkipValidation[Optional[List[Dict[str, Any]]]] = None
+    tool_choice: Optional[Union[str, Dict[str, Any]]] = None
+    parallel_tool_calls: Optional[bool] = None
+    previous_response_id: Optional[str] = None
+    store: Optional[bool] = True
+    temperature: Optional[float] = None
+    max_output_tokens: Optional[int] = None
+    stream: Optional[bool] = False
+    prompt_cache_key: Optional[str] = None
+
+
+class ResponseUsage(BaseModel):
+    input_tokens: int
+    output_tokens: int
+    total_tokens: int
+
+
+class ResponseObject(BaseModel):
+    id: str
+    object: str = "response"
+    created_at: int
+    status: str = "completed"
+    model: str
+    output: List[Dict[str, Any]]
+    previous_response_id: Optional[str] = None
+    instructions: Optional[str] = None
+    tools: List[Dict[str, Any]] = []
+    parallel_tool_calls: bool = True
+    usage: Optional[ResponseUsage] = None
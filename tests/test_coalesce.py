@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from openai_baml_adapter.core.coalesce import PARTIALS, CoalesceWindow, StreamBuffer
+
+
+def test_window_is_due_after_enough_tokens_or_time():
+    window = CoalesceWindow(interval=60, tokens=3)
+    assert [window.add() for _ in range(3)] == [False, False, True]
+    window.reset()
+    assert not window.add()
+    assert CoalesceWindow(interval=0, tokens=0).add()
+
+
+def test_buffer_keeps_the_latest_partial_and_every_event():
+    async def scenario():
+        buffer = StreamBuffer(maxsize=8)
+        superseded = PARTIALS.value(outcome="superseded")
+        buffer.put_partial(0, "partial 1")
+        buffer.put_partial(0, "partial 2")
+        buffer.put_partial(1, "other choice")
+        await buffer.put("call", key=1)
+        received = [await buffer.get() for _ in range(2)]
+        return received, PARTIALS.value(outcome="superseded") - superseded
+
+    received, superseded = asyncio.run(scenario())
+    # Events first; choice 1's partial was superseded by its call
+    assert received == ["call", "partial 2"]
+    assert superseded == 2
+
+
+def test_buffer_is_bounded():
+    async def scenario():
+        buffer = StreamBuffer(maxsize=2)
+        await buffer.put("a")
+        await buffer.put("b")
+        with pytest.raises(TimeoutError):
+            async with asyncio.timeout(0.05):
+                await buffer.put("c")
+        return await buffer.get()
+
+    assert asyncio.run(scenario()) == "a"
@@ -0,0 +1,148 @@
+import asyncio
+import gzip
+import json
+import threading
+import zlib
+
+import zstandard
+from fastapi.testclient import TestClient
+
+from openai_baml_adapter.api import main
+from openai_baml_adapter.api.middleware import CompressionMiddleware
+from openai_baml_adapter.core import compression, config
+from openai_baml_adapter.core.errors import InvalidRequestError
+
+
+def _run(app, path="/v1/chat/completions", headers=(), body=b""):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "path": path, "headers": list(headers)}
+    asyncio.run(CompressionMiddleware(app)(scope, receive, send))
+    return sent
+
+
+def _headers(message):
+    return {key.decode(): value.decode() for key, value in message["headers"]}
+
+
+def test_gzip_request_bodies_are_decoded(monkeypatch):
+    seen = {}
+
+    async def fake_handle(request, base_url, headers):
+        seen["messages"] = request.messages
+        raise InvalidRequestError("stop here")
+
+    monkeypatch.setattr(main, "handle_openai_request", fake_handle)
+    body = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}]}
+    response = TestClient(main.app).post(
+        "/v1/chat/completions",
+        content=gzip.compress(json.dumps(body).encode()),
+        headers={"authorization": "Bearer test", "content-encoding": "gzip", "content-type": "application/json"},
+    )
+    assert response.status_code == 400
+    assert seen["messages"] == body["messages"]
+
+
+def test_zstd_request_bodies_are_decoded():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": (await receive())["body"]})
+
+    body = json.dumps({"messages": [{"role": "user", "content": "hi " * 1000}]}).encode()
+    sent = _run(app, headers=[(b"content-encoding", b"zstd")], body=zstandard.ZstdCompressor().compress(body))
+    assert sent[1]["body"] == body
+
+
+def test_bad_request_encodings_are_refused(monkeypatch):
+    client = TestClient(main.app)
+    assert client.post("/v1/chat/completions", content=b"x", headers={"content-encoding": "br"}).status_code == 415
+    assert client.post("/v1/chat/completions", content=b"x", headers={"content-encoding": "gzip"}).status_code == 400
+    monkeypatch.setattr(config, "MAX_DECOMPRESSED_BYTES", 1000)
+    bomb = gzip.compress(b"0" * 100_000)
+    assert client.post("/v1/chat/completions", content=bomb, headers={"content-encoding": "gzip"}).status_code == 413
+
+
+def test_large_request_bodies_are_decoded_off_the_event_loop(monkeypatch):
+    threads = []
+    decompress = compression.decompress
+
+    def recording_decompress(*args):
+        threads.append(threading.current_thread().name)
+        return decompress(*args)
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": (await receive())["body"]})
+
+    monkeypatch.setattr(compression, "decompress", recording_decompress)
+    monkeypatch.setattr(config, "OFFLOAD_DECOMPRESS_MIN_BYTES", 64)
+    small, large = gzip.compress(b"hi"), gzip.compress(bytes(range(256)) * 64)
+    for body in (small, large):
+        sent = _run(app, headers=[(b"content-encoding", b"gzip")], body=body)
+        assert sent[1]["body"] == gzip.decompress(body)
+    assert threads[0] == threading.current_thread().name
+    assert threads[1].startswith("baml-cpu")
+
+
+def test_responses_are_compressed_above_the_threshold():
+    def app_sending(body):
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": body})
+        return app
+
+    accept = [(b"accept-encoding", b"br;q=1, gzip;q=0.8")]
+    big = json.dumps({"content": "x" * 5000}).encode()
+    start, message = _run(app_sending(big), headers=accept)
+    assert _headers(start)["content-encoding"] == "gzip"
+    assert _headers(start)["content-length"] == str(len(message["body"]))
+    assert gzip.decompress(message["body"]) == big
+
+    start, message = _run(app_sending(big), headers=[(b"accept-encoding", b"gzip, zstd")])
+    assert _headers(start)["content-encoding"] == "zstd"
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(message["body"]) == big
+
+    start, message = _run(app_sending(b"{}"), headers=accept)
+    assert "content-encoding" not in _headers(start) and message["body"] == b"{}"
+    start, message = _run(app_sending(big), headers=[(b"accept-encoding", b"gzip;q=0")])
+    assert "content-encoding" not in _headers(start)
+
+
+EVENTS = [f"data: {json.dumps({'n': i})}\n\n".encode() for i in range(3)]
+
+
+async def _event_stream(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+    for event in EVENTS:
+        await send({"type": "http.response.body", "body": event, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def test_event_streams_are_flushed_after_every_event():
+    start, *bodies = _run(_event_stream, headers=[(b"accept-encoding", b"gzip")])
+    assert _headers(start)["content-encoding"] == "gzip" and "content-length" not in _headers(start)
+    decoder = zlib.decompressobj(wbits=31)
+    # Each chunk decodes to its whole event on arrival
+    assert [decoder.decompress(body["body"]) for body in bodies[:3]] == EVENTS
+    decoder.decompress(bodies[3]["body"])
+    assert decoder.eof
+
+
+def test_zstd_event_streams_are_flushed_after_every_event():
+    start, *bodies = _run(_event_stream, headers=[(b"accept-encoding", b"zstd")])
+    assert _headers(start)["content-encoding"] == "zstd"
+    decoder = zstandard.ZstdDecompressor().decompressobj()
+    assert [decoder.decompress(body["body"]) for body in bodies[:3]] == EVENTS
+    assert decoder.decompress(bodies[3]["body"]) == b""
+
+
+def test_negotiation_prefers_available_encodings():
+    assert compression.negotiate("gzip, deflate") == "gzip"
+    assert compression.negotiate("identity") is None
+    assert compression.negotiate("*") == compression.ENCODINGS[0]
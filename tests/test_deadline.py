@@ -0,0 +1,167 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from openai_baml_adapter.api import main
+from openai_baml_adapter.core import clients, config, deadline, handler
+from openai_baml_adapter.models.openai import CompletionRequest
+
+from .test_handler import TOOLS
+
+BODY = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Greet John"}], "tools": TOOLS}
+
+
+def _sse_upstream(pieces, stall_after=None, cancelled=None, seen=None):
+    """A streaming upstream sending `pieces` as content deltas, optionally stalling after some."""
+
+    async def body():
+        for i, piece in enumerate(pieces):
+            if i == stall_after:
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.append(True)
+                    raise
+            chunk = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+            yield f"data: {json.dumps(chunk)}\n\n".encode()
+        yield b'data: {"choices": [], "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}}\n\n'
+        yield b"data: [DONE]\n\n"
+
+    def upstream(request):
+        if seen is not None:
+            seen.append(request)
+        return httpx.Response(200, content=body(), headers={"content-type": "text/event-stream"})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+
+
+def test_deadline_streams_and_passes_the_remaining_budget_upstream(monkeypatch):
+    seen = []
+    pieces = ['{"tool_call": [{"function_name": "Gr', 'eet", "name": "John"}]}']
+    monkeypatch.setattr(clients, "_http_client", _sse_upstream(pieces, seen=seen))
+    response = TestClient(main.app).post(
+        "/v1/chat/completions", json=BODY, headers={"authorization": "Bearer test", "x-baml-timeout-ms": "2000"}
+    )
+
+    assert response.status_code == 200
+    choice = response.json()["choices"][0]
+    assert choice["finish_reason"] == "tool_calls"
+    assert response.json()["usage"]["total_tokens"] == 15
+    assert json.loads(seen[0].content)["stream"] is True
+    timeout = seen[0].extensions["timeout"]
+    assert 0 < timeout["read"] <= 2 and timeout["connect"] <= 2
+
+
+def test_expired_deadline_returns_the_finished_tool_calls(monkeypatch):
+    cancelled = []
+    pieces = [
+        '{"tool_call": [{"function_name": "Greet", "name": "John"}, ',
+        '{"function_name": "GetWeather", "latitude": 1',
+        ', "longitude": 2}]}',
+    ]
+    monkeypatch.setattr(clients, "_http_client", _sse_upstream(pieces, stall_after=2, cancelled=cancelled))
+    before = deadline.CANCELLED.value(reason="deadline")
+    response = TestClient(main.app).post(
+        "/v1/chat/completions", json=BODY, headers={"authorization": "Bearer test", "x-baml-timeout-ms": "400"}
+    )
+
+    assert response.status_code == 200
+    choice = response.json()["choices"][0]
+    assert choice["finish_reason"] == "length"
+    # GetWeather had started but not closed, so only Greet is returned
+    assert [call["function"]["name"] for call in choice["message"]["tool_calls"]] == ["Greet"]
+    assert json.loads(choice["message"]["tool_calls"][0]["function"]["arguments"]) == {"name": "John"}
+    assert cancelled == [True]
+    assert deadline.CANCELLED.value(reason="deadline") == before + 1
+
+
+def test_deadline_shorter_than_the_reserve_still_runs_the_call(monkeypatch):
+    pieces = ['{"tool_call": [{"function_name": "Greet", "name": "John"}]}']
+    monkeypatch.setattr(clients, "_http_client", _sse_upstream(pieces))
+    monkeypatch.setattr(config, "DEADLINE_RESERVE_MS", 1000)
+    response = TestClient(main.app).post(
+        "/v1/chat/completions", json=BODY, headers={"authorization": "Bearer test", "x-baml-timeout-ms": "400"}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["choices"][0]["finish_reason"] == "tool_calls"
+
+
+def test_expired_deadline_without_partial_results_is_a_timeout(monkeypatch):
+    cancelled = []
+
+    class _SlowCompletions:
+        async def create(self, **params):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+    fake = type("OpenAI", (), {"chat": type("Chat", (), {"completions": _SlowCompletions()})()})()
+    monkeypatch.setattr(handler, "get_openai_client", lambda api_key: fake)
+    before = deadline.CANCELLED.value(reason="deadline")
+    saved = deadline.TOKENS_SAVED.value(reason="deadline")
+    response = TestClient(main.app).post(
+        "/v1/chat/completions",
+        json={"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}], "max_tokens": 100},
+        headers={"authorization": "Bearer test", "x-baml-timeout-ms": "100"},
+    )
+
+    assert response.status_code == 504
+    assert cancelled == [True]
+    assert deadline.CANCELLED.value(reason="deadline") == before + 1
+    assert deadline.TOKENS_SAVED.value(reason="deadline") == saved + 100
+
+
+def test_malformed_deadline_is_a_bad_request():
+    response = TestClient(main.app).post(
+        "/v1/chat/completions", json=BODY, headers={"authorization": "Bearer test", "x-baml-timeout-ms": "soon"}
+    )
+    assert response.status_code == 400
+
+
+def test_disconnect_cancels_the_work():
+    cancelled = []
+
+    class _Request:
+        async def receive(self):
+            await asyncio.sleep(0.05)
+            return {"type": "http.disconnect"}
+
+    async def work():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(main.ClientDisconnected):
+        asyncio.run(main._unless_disconnected(_Request(), work()))
+    assert cancelled == [True]
+
+
+def test_stream_past_its_deadline_closes_upstream():
+    closed = []
+
+    async def chunks():
+        try:
+            yield "first"
+            await asyncio.sleep(5)
+            yield "never"
+        finally:
+            closed.append(True)
+
+    async def consume():
+        request = CompletionRequest(model="m", messages=[], max_tokens=10)
+        received = []
+        with pytest.raises(TimeoutError):
+            async for chunk in deadline.guard_stream(chunks(), request, deadline.Deadline(0.1)):
+                received.append(chunk)
+        return received
+
+    assert asyncio.run(consume()) == ["first"]
+    assert closed == [True]
@@ -0,0 +1,320 @@
+import asyncio
+import json
+import threading
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from openai.types.chat import ChatCompletionChunk
+
+from openai_baml_adapter.api.main import app
+from openai_baml_adapter.core import clients, config, handler, schema_cache
+from openai_baml_adapter.core.errors import InvalidRequestError
+from openai_baml_adapter.models.openai import CompletionRequest, CompletionResponse, Choice, Message
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "Greet",
+            "description": "Greet a person by name",
+            "parameters": {
+                "type": "object",
+                "properties": {"name": {"type": "string"}},
+                "required": ["name"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "GetWeather",
+            "description": "Get weather information for a location",
+            "parameters": {
+                "type": "object",
+                "properties": {"latitude": {"type": "number"}, "longitude": {"type": "number"}},
+                "required": ["latitude", "longitude"]
+            }
+        }
+    }
+]
+
+HEADERS = {"authorization": "Bearer test"}
+
+
+def _request(**kwargs) -> CompletionRequest:
+    kwargs.setdefault("tools", TOOLS)
+    return CompletionRequest(model="gpt-4o-mini", messages=[{"role": "user", "content": "Greet John"}], **kwargs)
+
+
+def test_select_tools_defaults_to_all_tools_in_parallel():
+    request = _request()
+    tools, parallel, tools_json = handler._select_tools(request)
+    assert [t["function"]["name"] for t in tools] == ["Greet", "GetWeather"]
+    assert parallel is True
+    assert tools_json == request.tools_json
+
+
+def test_select_tools_named_function_compiles_only_that_tool():
+    request = _request(tool_choice={"type": "function", "function": {"name": "GetWeather"}})
+    tools, parallel, tools_json = handler._select_tools(request)
+    assert [t["function"]["name"] for t in tools] == ["GetWeather"]
+    assert parallel is False
+    assert tools_json != request.tools_json
+
+
+def test_select_tools_honors_parallel_tool_calls():
+    tools, parallel, _ = handler._select_tools(_request(parallel_tool_calls=False))
+    assert len(tools) == 2
+    assert parallel is False
+
+
+def test_select_tools_rejects_unknown_function():
+    with pytest.raises(InvalidRequestError):
+        handler._select_tools(_request(tool_choice={"type": "function", "function": {"name": "Nope"}}))
+
+
+def test_malformed_tool_choice_is_a_bad_request():
+    for tool_choice in ({"type": "function", "function": "Greet"}, {"type": "function"}):
+        with pytest.raises(InvalidRequestError):
+            handler._select_tools(_request(tool_choice=tool_choice))
+    # A tool whose `function` isn't an object just doesn't match
+    tools = [{"type": "function", "function": "Greet"}, *TOOLS]
+    selected, _, _ = handler._select_tools(_request(tools=tools, tool_choice={"function": {"name": "Greet"}}))
+    assert selected == [TOOLS[0]]
+    response = TestClient(app).post(
+        "/v1/chat/completions",
+        json={"model": "gpt-4o-mini", "messages": [], "tools": TOOLS, "tool_choice": {"type": "function", "function": "A"}},
+        headers=HEADERS,
+    )
+    assert response.status_code == 400
+
+
+def test_tool_choice_none_skips_schema_compilation(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("schema should not be compiled")
+
+    async def plain_chat(request, api_key):
+        return CompletionResponse(
+            id="chatcmpl-test",
+            created=0,
+            model=request.model,
+            choices=[Choice(index=0, message=Message(role="assistant", content="Hi John"), finish_reason="stop")],
+        )
+
+    monkeypatch.setattr(schema_cache, "compile_schema_ir", fail)
+    monkeypatch.setattr(handler, "_plain_chat", plain_chat)
+    response = asyncio.run(handler.handle_openai_request(_request(tool_choice="none"), None, HEADERS))
+    assert response.choices[0].message.content == "Hi John"
+
+
+class _FakeCompletions:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.params = None
+
+    async def create(self, **params):
+        self.params = params
+
+        async def stream():
+            for chunk in self.chunks:
+                yield chunk
+
+        return stream()
+
+
+class _FakeOpenAI:
+    def __init__(self, chunks):
+        self.chat = type("Chat", (), {"completions": _FakeCompletions(chunks)})()
+
+
+def test_toolless_request_streams_model_text(monkeypatch):
+    chunks = [
+        ChatCompletionChunk.model_validate({
+            "id": "chatcmpl-test",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [{"index": 0, "delta": {"role": "assistant", "content": text}, "finish_reason": None}],
+        })
+        for text in ["Hello", " there"]
+    ]
+    fake = _FakeOpenAI(chunks)
+    monkeypatch.setattr(handler, "get_openai_client", lambda api_key: fake)
+
+    response = TestClient(app).post(
+        "/v1/chat/completions",
+        json={"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}], "stream": True},
+        headers={"Authorization": "Bearer test"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    assert '"Hello"' in events[0] and '" there"' in events[1]
+    assert fake.chat.completions.params["messages"] == [{"role": "user", "content": "hi"}]
+
+
+def _upstream(handler_fn):
+    """A pooled HTTP client whose upstream is `handler_fn(request) -> httpx.Response`."""
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler_fn))
+
+
+def _completion(content, usage=None):
+    return {
+        "id": "chatcmpl-upstream",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": usage or {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    }
+
+
+def test_n_fans_out_and_tolerates_partial_failures(monkeypatch):
+    bodies = []
+
+    def upstream(request):
+        bodies.append(json.loads(request.content))
+        if len(bodies) == 2:
+            return httpx.Response(500, json={"error": {"message": "upstream hiccup"}})
+        return httpx.Response(200, json=_completion('{"tool_call": [{"function_name": "Greet", "name": "John"}]}'))
+
+    monkeypatch.setattr(clients, "_http_client", _upstream(upstream))
+    with pytest.warns(UserWarning, match="sample 1 failed"):
+        response = asyncio.run(handler.handle_openai_request(_request(n=3), None, HEADERS))
+
+    # The surviving choices are renumbered without a gap
+    assert [choice.index for choice in response.choices] == [0, 1]
+    assert all(choice.message.tool_calls[0].function.name == "Greet" for choice in response.choices)
+    assert json.loads(response.choices[0].message.tool_calls[0].function.arguments) == {"name": "John"}
+    # Usage is summed over the samples that succeeded
+    assert response.usage.total_tokens == 30
+    # Every sample renders the same prompt from the one compiled schema
+    assert len(bodies) == 3 and bodies[0] == bodies[1] == bodies[2]
+
+
+def test_n_above_the_maximum_is_a_bad_request(monkeypatch):
+    monkeypatch.setattr(config, "MAX_N", 4)
+    with pytest.raises(InvalidRequestError, match="at most 4"):
+        asyncio.run(handler.handle_openai_request(_request(n=5), None, HEADERS))
+
+
+def test_large_work_runs_off_the_event_loop(monkeypatch):
+    threads = {}
+    parser = handler.baml_sync_client().parse
+    parse, build = parser.BamlFunction, schema_cache.build_type_builder
+
+    def recording(name, fn):
+        def record(*args, **kwargs):
+            threads[name] = threading.current_thread().name
+            return fn(*args, **kwargs)
+        return record
+
+    monkeypatch.setattr(config, "OFFLOAD_COMPILE_MIN_BYTES", 0)
+    monkeypatch.setattr(config, "OFFLOAD_PARSE_MIN_BYTES", 0)
+    monkeypatch.setattr(parser, "BamlFunction", recording("parse", parse))
+    monkeypatch.setattr(schema_cache, "build_type_builder", recording("compile", build))
+    monkeypatch.setattr(clients, "_http_client", _upstream(
+        lambda request: httpx.Response(200, json=_completion('{"tool_call": [{"function_name": "GetWeather", "latitude": 1, "longitude": 2}]}'))
+    ))
+    request = _request(tools=[dict(TOOLS[1], function=dict(TOOLS[1]["function"], description="offloaded"))])
+    response = asyncio.run(handler.handle_openai_request(request, None, HEADERS))
+
+    assert response.choices[0].message.tool_calls[0].function.name == "GetWeather"
+    assert threads["compile"].startswith("baml-cpu")
+    assert threads["parse"].startswith("baml-cpu")
+
+
+def test_process_parse_returns_plain_data_the_choice_accepts():
+    from openai_baml_adapter.core import offload
+
+    tools = [TOOLS[0]]
+    digest = schema_cache.tools_digest(json.dumps(tools).encode())
+    # What a pool process runs, called directly
+    parsed = offload._parse("BamlFunction", '{"tool_call": [{"function_name": "Greet", "name": "Ann"}]}', digest, tools, False)
+
+    assert isinstance(parsed, dict)
+    choice = handler._choice_from_baml(0, parsed)
+    assert choice.message.tool_calls[0].function.name == "Greet"
+    assert json.loads(choice.message.tool_calls[0].function.arguments) == {"name": "Ann"}
+
+
+def test_to_baml_messages_reads_only_role_and_text():
+    messages = handler._to_baml_messages([
+        {"role": "user", "content": [{"type": "text", "text": "Hi"}, {"type": "image_url", "image_url": {"url": "x"}}]},
+        {"role": "assistant", "content": None, "tool_calls": [{"id": "call_1"}]},
+        {"role": "tool", "content": "sunny", "tool_call_id": "call_1"},
+    ])
+    assert [(m.role, m.content) for m in messages] == [("user", "Hi"), ("assistant", ""), ("tool", "sunny")]
+    with pytest.raises(InvalidRequestError):
+        handler._to_baml_messages([{"content": "no role"}])
+
+
+def test_tools_json_ignores_client_formatting():
+    compact = CompletionRequest.model_validate_json(
+        '{"model":"m","messages":[],"tools":[{"type":"function","function":{"name":"Greet"}}]}'
+    )
+    spaced = CompletionRequest.model_validate_json(
+        '{"model": "m", "messages": [], "tools": [ {"type": "function", "function": {"name": "Greet"}} ]}'
+    )
+    assert compact.tools_json == spaced.tools_json
+
+
+def test_malformed_messages_are_a_bad_request():
+    response = TestClient(app).post(
+        "/v1/chat/completions",
+        json={"model": "gpt-4o-mini", "messages": [{"content": "no role"}], "tools": TOOLS},
+        headers={"Authorization": "Bearer test"},
+    )
+    assert response.status_code == 400
+
+
+def test_a_finished_choice_sends_no_stale_partial():
+    async def sample_calls(usage):
+        if sample_calls.started:
+            # Choice 1 keeps the stream open after choice 0 has finished
+            await asyncio.sleep(0.05)
+            yield {"function_name": "Greet", "name": "Jane"}, True
+            return
+        sample_calls.started = True
+        yield {"function_name": "Greet", "name": "Jo"}, False
+
+    sample_calls.started = False
+
+    async def collect():
+        return [chunk async for chunk in handler._baml_chunks(_request(stream=True), 2, sample_calls)]
+
+    chunks = asyncio.run(collect())
+    events = [
+        ("finish" if choice.finish_reason else "partial" if choice.delta.baml_partial else "delta", choice.index)
+        for chunk in chunks for choice in chunk.choices
+    ]
+    assert ("partial", 0) not in events[events.index(("finish", 0)):]
+
+
+def test_tools_without_a_type_are_functions(monkeypatch):
+    bodies = []
+
+    def upstream(request):
+        bodies.append(json.loads(request.content))
+        return httpx.Response(200, json=_completion('{"tool_call": [{"function_name": "Greet", "name": "John"}]}'))
+
+    monkeypatch.setattr(clients, "_http_client", _upstream(upstream))
+    untyped = [{key: value for key, value in tool.items() if key != "type"} for tool in TOOLS]
+    response = asyncio.run(handler.handle_openai_request(_request(tools=untyped), None, HEADERS))
+
+    assert response.choices[0].message.tool_calls[0].function.name == "Greet"
+    assert "GetWeather" in json.dumps(bodies[0])
+
+
+def test_non_list_messages_and_tools_are_bad_requests():
+    client = TestClient(app)
+    for body in (
+        {"model": "gpt-4o-mini", "messages": 5},
+        {"model": "gpt-4o-mini", "messages": [], "tools": 5},
+        {"model": "gpt-4o-mini", "messages": [], "tools": ["Greet"]},
+    ):
+        response = client.post("/v1/chat/completions", json=body, headers=HEADERS)
+        assert response.status_code == 400, body
@@ -0,0 +1,57 @@
+import asyncio
+import tracemalloc
+
+from fastapi.testclient import TestClient
+
+from openai_baml_adapter.api import main
+from openai_baml_adapter.core import config
+from openai_baml_adapter.core.heap import HeapInspector
+
+_retained = []
+
+
+def test_heap_endpoints_report_growth_since_the_baseline(monkeypatch):
+    monkeypatch.setattr(config, "DEBUG_KEYS", frozenset({"ops"}))
+    monkeypatch.setattr(main, "heap", HeapInspector(frames=1))
+    client = TestClient(main.app)
+    auth = {"Authorization": "Bearer ops"}
+
+    assert client.get("/debug/heap", headers={"Authorization": "Bearer nope"}).status_code == 403
+    assert client.get("/debug/heap?key_type=bogus", headers=auth).status_code == 400
+    try:
+        summary = client.post("/debug/heap/baseline", headers=auth).json()
+        assert summary["tracing"] is True and summary["allocated_blocks"] > 0
+
+        _retained.extend(bytearray(1024) for _ in range(2000))
+        report = client.get("/debug/heap?limit=5", headers=auth).json()
+        assert len(report["top"]) == 5
+        grown = report["diff"][0]
+        assert grown["where"].startswith(__file__) and grown["size_diff_kb"] > 1000
+    finally:
+        _retained.clear()
+        assert client.delete("/debug/heap", headers=auth).json()["tracing"] is False
+    assert not tracemalloc.is_tracing()
+    assert client.get("/debug/heap", headers=auth).json()["top"] is None
+
+
+def test_stopping_heap_tracing_runs_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(config, "DEBUG_KEYS", frozenset({"ops"}))
+    inspector = HeapInspector(frames=1)
+    monkeypatch.setattr(main, "heap", inspector)
+    on_loop = []
+
+    def recording(method):
+        def call():
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(method.__name__)
+            except RuntimeError:
+                pass
+            return method()
+        return call
+
+    monkeypatch.setattr(inspector, "stop", recording(inspector.stop))
+    monkeypatch.setattr(inspector, "summary", recording(inspector.summary))
+    response = TestClient(main.app).delete("/debug/heap", headers={"Authorization": "Bearer ops"})
+    assert response.status_code == 200 and response.json()["tracing"] is False
+    assert on_loop == []
@@ -0,0 +1,95 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from openai_baml_adapter.api import main
+from openai_baml_adapter.core import config, lifecycle
+
+
+def test_ready_reports_warming_until_warm_up_finishes(monkeypatch, tmp_path):
+    state = lifecycle.Readiness()
+    monkeypatch.setattr(main, "readiness", state)
+    client = TestClient(main.app)
+
+    assert client.get("/ready").status_code == 503
+    assert client.get("/health").status_code == 200
+
+    monkeypatch.setattr(lifecycle, "readiness", state)
+    monkeypatch.setattr(config, "WARMUP", False)
+    asyncio.run(lifecycle.warm_up())
+
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+
+def test_failed_warm_up_still_marks_the_worker_ready(monkeypatch):
+    state = lifecycle.Readiness()
+    monkeypatch.setattr(main, "readiness", state)
+    monkeypatch.setattr(lifecycle, "readiness", state)
+    monkeypatch.setattr(config, "WARMUP", True)
+
+    def broken():
+        raise ImportError("no module named baml_py")
+
+    monkeypatch.setattr(lifecycle, "_load_path_dependencies", broken)
+    asyncio.run(lifecycle.warm_up())
+
+    response = TestClient(main.app).get("/ready")
+    assert response.status_code == 200
+    assert response.json()["warmup_error"] == "ImportError: no module named baml_py"
+
+
+def test_warm_up_compiles_registered_toolsets(monkeypatch):
+    class _Toolset:
+        id = "ts_test"
+        digest = "d" * 64
+        tools = [{"type": "function", "function": {"name": "Greet", "parameters": {"type": "object", "properties": {}}}}]
+
+    compiled = []
+    monkeypatch.setattr(lifecycle.toolsets, "load_all", lambda: [_Toolset()])
+    monkeypatch.setattr(
+        lifecycle.schema_cache, "get_or_compile", lambda digest, tools, parallel: compiled.append((digest, parallel))
+    )
+    assert lifecycle._compile_registered_toolsets() == 1
+    assert compiled == [("d" * 64, True)]
+
+
+def test_drain_waits_for_in_flight_work_then_aborts_the_rest(monkeypatch):
+    monkeypatch.setattr(lifecycle, "readiness", lifecycle.Readiness())
+    drain = lifecycle.Drain()
+
+    async def work(seconds):
+        with drain.track():
+            await asyncio.sleep(seconds)
+
+    async def run():
+        tasks = [asyncio.create_task(work(0.05)), asyncio.create_task(work(30))]
+        await asyncio.sleep(0)
+        assert len(drain) == 2
+        report = await drain.shutdown(0.3)
+        assert tasks[0].done() and tasks[1].cancelled()
+        # Asking again returns the same drain's report
+        assert await drain.shutdown(0.3) is report
+        return report
+
+    report = asyncio.run(run())
+    assert (report["drained"], report["aborted"]) == (1, 1)
+    assert report["seconds"] < 2
+    assert lifecycle.readiness.ready is False
+
+
+def test_draining_worker_refuses_new_work(monkeypatch):
+    from openai_baml_adapter.api import middleware
+
+    drain = lifecycle.Drain()
+    drain.draining = True
+    monkeypatch.setattr(main, "drain", drain)
+    monkeypatch.setattr(middleware, "drain", drain)
+    client = TestClient(main.app)
+
+    response = client.post("/v1/chat/completions", json={"model": "gpt-4o-mini", "messages": []})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert client.get("/ready").json() == {"status": "draining", "in_flight": 0}
+    assert client.get("/health").status_code == 200
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from openai_baml_adapter.api import main
+from openai_baml_adapter.baml_client.baml_client.type_builder import TypeBuilder
+from openai_baml_adapter.core import handler
+from openai_baml_adapter.core.errors import InvalidRequestError
+from openai_baml_adapter.core.mcp_catalog import McpCatalog
+from openai_baml_adapter.core.parse import parse_tools
+from openai_baml_adapter.core.schema_cache import schema_cache, tools_digest
+from openai_baml_adapter.models.openai import CompletionRequest
+
+GITHUB = [
+    {
+        "name": "create_issue",
+        "description": "Open an issue",
+        "inputSchema": {
+            "type": "object",
+            "properties": {"repo": {"type": "string"}, "title": {"type": "string"}},
+            "required": ["repo", "title"],
+        },
+    },
+    {"name": "broken", "inputSchema": {"type": "object", "properties": {"x": {"type": "tuple"}}}},
+]
+SLACK = [
+    {
+        "name": "post",
+        "inputSchema": {"type": "object", "properties": {"channel": {"type": "string"}}, "required": ["channel"]},
+    },
+]
+
+
+def _write(path, servers):
+    path.write_text(json.dumps({"servers": servers}))
+    # Make sure the change is visible even on coarse mtime clocks
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    path = tmp_path / "servers.json"
+    _write(path, {"github": GITHUB, "slack": SLACK})
+    catalog = McpCatalog(str(path))
+    monkeypatch.setattr(handler, "mcp_catalog", catalog)
+    monkeypatch.setattr(main, "mcp_catalog", catalog)
+    return catalog
+
+
+def test_catalog_compiles_each_tool_and_reports_failures(catalog):
+    assert catalog.reload_if_changed()
+    diagnostics = catalog.diagnostics()
+    assert diagnostics["servers"]["github"]["tools"] == ["github/create_issue"]
+    assert "Unsupported type: tuple" in diagnostics["servers"]["github"]["errors"]["github/broken"]
+    assert diagnostics["servers"]["slack"]["tools"] == ["slack/post"]
+    # Unchanged files aren't reloaded
+    assert not catalog.reload_if_changed()
+
+
+def test_selection_is_served_from_the_schema_cache(catalog):
+    catalog.reload_if_changed()
+    request = CompletionRequest(model="m", messages=[], toolset_id="mcp:slack,github")
+    asyncio.run(handler._resolve_toolset(request, {}))
+    assert [t["function"]["name"] for t in request.tools] == ["github/create_issue", "slack/post"]
+
+    tb = schema_cache.get((tools_digest(request.tools_json), True))
+    assert tb is not None
+    assert "github/create_issue" in str(tb) and "slack/post" in str(tb)
+
+    with pytest.raises(InvalidRequestError):
+        asyncio.run(handler._resolve_toolset(CompletionRequest(model="m", messages=[], toolset_id="mcp:jira"), {}))
+
+
+def test_selections_are_built_at_load_and_requests_never_load(catalog, monkeypatch):
+    with pytest.raises(InvalidRequestError, match="hasn't been loaded"):
+        asyncio.run(catalog.select("mcp"))
+    assert catalog.state.loaded_at is None
+
+    catalog.reload_if_changed()
+    assert set(catalog.state.selections) == {("github", "slack"), ("github",), ("slack",)}
+    monkeypatch.setattr(catalog, "reload_if_changed", lambda: pytest.fail("reloaded on a request"))
+    assert asyncio.run(catalog.select("mcp:slack")) is catalog.state.selections[("slack",)]
+
+
+def test_reload_recompiles_only_changed_servers(catalog, tmp_path):
+    catalog.reload_if_changed()
+    github, slack = catalog.state.servers["github"], catalog.state.servers["slack"]
+    first = asyncio.run(catalog.select("mcp"))
+
+    react = {"name": "react", "inputSchema": {"type": "object", "properties": {}}}
+    _write(tmp_path / "servers.json", {"github": GITHUB, "slack": SLACK + [react]})
+    assert catalog.reload_if_changed()
+    assert catalog.state.servers["github"] is github
+    assert catalog.state.servers["slack"] is not slack
+    assert [t["function"]["name"] for t in asyncio.run(catalog.select("mcp")).tools][-1] == "slack/react"
+    assert asyncio.run(catalog.select("mcp")) is not first
+
+
+def test_bad_file_keeps_the_last_good_catalog(catalog, tmp_path):
+    catalog.reload_if_changed()
+    (tmp_path / "servers.json").write_text("{not json")
+    with pytest.warns(UserWarning, match="not reloaded"):
+        catalog.reload_if_changed()
+    response = TestClient(main.app).get("/v1/baml/mcp")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["errors"] and body["servers"]["slack"]["tools"] == ["slack/post"]
+
+
+def test_conflicting_nested_types_are_reported(catalog, tmp_path):
+    def tool(name, kind):
+        return {
+            "name": name,
+            "inputSchema": {
+                "type": "object",
+                "properties": {"where": {"type": "object", "title": "Place", "properties": {"v": {"type": kind}}}},
+            },
+        }
+
+    _write(tmp_path / "servers.json", {"maps": [tool("a", "string"), tool("b", "integer")]})
+    catalog.reload_if_changed()
+    diagnostics = catalog.diagnostics()["servers"]["maps"]
+    assert diagnostics["tools"] == ["maps/a"]
+    assert "Place" in diagnostics["errors"]["maps/b"]
+
+
+def test_parse_tools_maps_names_to_mcp_tools(tmp_path):
+    path = tmp_path / "servers.json"
+    no_properties = {"name": "ping", "inputSchema": {"type": "object"}}
+    _write(path, {"slack": SLACK + [no_properties]})
+    parsed = parse_tools(str(path), TypeBuilder())
+    # Tools without properties are skipped, and each name maps to its MCP definition
+    assert list(parsed) == ["slack/post"]
+    assert parsed["slack/post"][1] == SLACK[0]
@@ -0,0 +1,44 @@
+from openai_baml_adapter.core.partial import ToolCallScanner, complete_tool_calls, required_fields
+
+from .test_handler import TOOLS
+
+
+def _scan(*pieces):
+    scanner = ToolCallScanner()
+    for piece in pieces:
+        scanner.feed(piece)
+    return scanner
+
+
+def test_scanner_counts_closed_calls_across_chunks():
+    scanner = _scan('```json\n{"tool_call": [{"function_name": "Greet", "name": "J', 'o}{hn"}, {"function_name"')
+    assert scanner.closed_calls == 1 and not scanner.response_closed
+    scanner.feed(': "GetWeather", "nested": {"a": [1, {"b": 2}]}}]')
+    assert scanner.closed_calls == 2 and not scanner.response_closed
+    scanner.feed("}\n```")
+    assert scanner.response_closed
+
+
+def test_scanner_handles_a_single_call_and_escaped_quotes():
+    scanner = _scan('{"note": "a \\"tool_call\\": {", "tool_call": {"function_name": "Greet", "name": "}"')
+    assert scanner.closed_calls == 0
+    scanner.feed("}")
+    assert scanner.closed_calls == 1
+
+
+def test_only_closed_calls_with_required_fields_are_complete():
+    partial = {"tool_call": [
+        {"function_name": "Greet", "name": None},
+        {"function_name": "GetWeather", "latitude": 1.0, "longitude": 2.0},
+        {"function_name": "Greet", "name": "Jo"},
+    ]}
+    assert complete_tool_calls(partial, 2, required_fields(TOOLS)) == [partial["tool_call"][1]]
+
+
+def test_scanner_records_each_call_span():
+    text = '{"tool_call": [{"function_name": "Greet", "name": "John"}, {"function_name": "Greet", "name": "Ann"}]}'
+    scanner = _scan(text[:30], text[30:70], text[70:])
+    assert [text[start:end] for start, end in scanner.call_spans] == [
+        '{"function_name": "Greet", "name": "John"}',
+        '{"function_name": "Greet", "name": "Ann"}',
+    ]
@@ -0,0 +1,77 @@
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from openai_baml_adapter.api.main import app
+from openai_baml_adapter.core import clients
+
+client = TestClient(app)
+
+UPSTREAM_BODY = (
+    b'{"id":"chatcmpl-up","object":"chat.completion","created":1,"model":"gpt-4o-mini",'
+    b'"system_fingerprint":"fp_1","choices":[{"index":0,"message":{"role":"assistant",'
+    b'"content":"Hello","refusal":null},"logprobs":{"content":[]},"finish_reason":"stop"}]}'
+)
+
+
+class _ChunkedBody(httpx.AsyncByteStream):
+    """Serve the upstream body in small pieces, like a live socket would."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+    async def __aiter__(self):
+        for start in range(0, len(self.body), 16):
+            yield self.body[start:start + 16]
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    seen = {}
+
+    def respond(request: httpx.Request) -> httpx.Response:
+        seen["url"] = str(request.url)
+        seen["body"] = request.content
+        seen["authorization"] = request.headers["authorization"]
+        status = 429 if b"rate-limit-me" in request.content else 200
+        return httpx.Response(status, stream=_ChunkedBody(UPSTREAM_BODY), headers={"content-type": "application/json", "x-request-id": "req_1"})
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-server")
+    monkeypatch.setattr(clients, "_http_client", httpx.AsyncClient(
+        base_url="https://upstream.test/v1", transport=httpx.MockTransport(respond)
+    ))
+    return seen
+
+
+def test_passthrough_forwards_raw_bytes_both_ways(upstream):
+    # Unmodelled fields and the original key order/spacing must reach upstream untouched
+    body = b'{"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}], "logprobs": true, "seed": 7}'
+
+    response = client.post(
+        "/v1/chat/completions", content=body,
+        headers={"PASSTHROUGH": "true", "content-type": "application/json"},
+    )
+
+    assert response.status_code == 200
+    assert response.content == UPSTREAM_BODY
+    assert response.headers["x-request-id"] == "req_1"
+    assert upstream["body"] == body
+    assert upstream["url"] == "https://upstream.test/v1/chat/completions"
+    assert upstream["authorization"] == "Bearer sk-server"
+    assert json.loads(response.content)["system_fingerprint"] == "fp_1"
+
+
+def test_passthrough_relays_upstream_status(upstream):
+    response = client.post(
+        "/v1/chat/completions",
+        json={"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "rate-limit-me"}]},
+        headers={"PASSTHROUGH": "1"},
+    )
+    assert response.status_code == 429
+
+
+def test_invalid_body_is_rejected_without_passthrough():
+    response = client.post("/v1/chat/completions", json={"messages": []})
+    assert response.status_code == 422
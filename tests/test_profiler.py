@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from openai_baml_adapter.api import main
+from openai_baml_adapter.core import config, offload, profiler
+from openai_baml_adapter.models.openai import Choice, CompletionResponse, Message
+
+DEBUG = {"authorization": "Bearer ops", "x-baml-profile": "1"}
+BODY = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}]}
+
+
+@pytest.fixture
+def profiling(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "DEBUG_KEYS", frozenset({"ops"}))
+    monkeypatch.setattr(config, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "PROFILE_INTERVAL_MS", 1)
+    monkeypatch.setattr(profiler, "limiter", profiler.ProfileLimiter(per_minute=1))
+    return tmp_path
+
+
+def _busy_compile():
+    end = time.monotonic() + 0.05
+    while time.monotonic() < end:
+        pass
+
+
+def _busy_loop():
+    end = time.monotonic() + 0.05
+    while time.monotonic() < end:
+        pass
+
+
+async def _handle(request, base_url, headers):
+    _busy_loop()
+    await offload.run_cpu(1, 0, _busy_compile)
+    return CompletionResponse(
+        id="chatcmpl-test",
+        created=0,
+        model=request.model,
+        choices=[Choice(index=0, message=Message(role="assistant", content="hi"), finish_reason="stop")],
+    )
+
+
+def test_profile_samples_the_request_and_its_offloaded_work(profiling, monkeypatch):
+    monkeypatch.setattr(main, "handle_openai_request", _handle)
+    client = TestClient(main.app)
+
+    response = client.post("/v1/chat/completions", json=BODY, headers=DEBUG)
+
+    assert response.status_code == 200
+    assert response.json()["choices"][0]["message"]["content"] == "hi"
+    name = response.headers["x-baml-profile"]
+    folded = (profiling / name).read_text()
+    assert "_busy_loop" in folded and "_busy_compile" in folded
+    # collapsed-stack lines: "frame;frame;... count", root first
+    stack, count = folded.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+
+    downloaded = client.get(f"/debug/profiles/{name}", headers={"authorization": "Bearer ops"})
+    assert downloaded.text == folded
+
+    # One per minute: the next request runs unprofiled
+    response = client.post("/v1/chat/completions", json=BODY, headers=DEBUG)
+    assert response.status_code == 200
+    assert response.headers["x-baml-profile"] == "rate-limited"
+
+
+def test_loop_is_sampled_without_asyncio_task_table(profiling, monkeypatch, caplog):
+    monkeypatch.delattr(asyncio.tasks, "_current_tasks", raising=False)
+    monkeypatch.setattr(profiler, "_warned_unfiltered", False)
+    monkeypatch.setattr(main, "handle_openai_request", _handle)
+    monkeypatch.setattr(profiler, "limiter", profiler.ProfileLimiter(per_minute=2))
+    client = TestClient(main.app)
+
+    with caplog.at_level(logging.WARNING, logger="uvicorn.error"):
+        names = [client.post("/v1/chat/completions", json=BODY, headers=DEBUG).headers["x-baml-profile"] for _ in range(2)]
+    for name in names:
+        assert "_busy_loop" in (profiling / name).read_text()
+    # Logged once, not per profile
+    assert sum("no task table" in record.message for record in caplog.records) == 1
+
+
+def test_profiling_needs_a_debug_key(profiling, monkeypatch):
+    monkeypatch.setattr(main, "handle_openai_request", _handle)
+    response = TestClient(main.app).post(
+        "/v1/chat/completions", json=BODY, headers={**DEBUG, "authorization": "Bearer someone"}
+    )
+    assert response.status_code == 403
+    assert profiler.limiter.try_acquire()
+
+
+def test_bad_deadline_header_leaves_no_profile_running(profiling, monkeypatch):
+    monkeypatch.setattr(main, "handle_openai_request", _handle)
+    response = TestClient(main.app).post(
+        "/v1/chat/completions", json=BODY, headers={**DEBUG, "x-baml-timeout-ms": "soon"}
+    )
+    assert response.status_code == 400
+    assert profiler.limiter.try_acquire()
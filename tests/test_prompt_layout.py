@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from baml_py import ClientRegistry
+from fastapi.testclient import TestClient
+
+from openai_baml_adapter.api.main import app
+from openai_baml_adapter.baml_client.baml_client.async_client import b
+from openai_baml_adapter.baml_client.baml_client.type_builder import TypeBuilder
+from openai_baml_adapter.baml_client.baml_client.types import Message as BamlMessage
+from openai_baml_adapter.core.errors import InvalidRequestError
+from openai_baml_adapter.core.handler import _select_prompt_layout, _usage_from_upstream
+from openai_baml_adapter.core.parse import parse_openai_tools
+
+client = TestClient(app)
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "Greet",
+            "description": "Greet a person by name",
+            "parameters": {
+                "type": "object",
+                "properties": {"name": {"type": "string"}},
+                "required": ["name"]
+            }
+        }
+    }
+]
+
+
+def _render(baml_function):
+    """Render the upstream request body without sending it."""
+    tb = TypeBuilder()
+    parsed = parse_openai_tools(TOOLS, tb)
+    tb.Response.add_property("tool_call", tb.list(tb.union([t for t, _ in parsed.values()])))
+    cr = ClientRegistry()
+    cr.add_llm_client(name="RequestClient", provider="openai", options={
+        "model": "gpt-4o-mini",
+        "api_key": "test",
+        "prompt_cache_key": "agent-42",
+    })
+    cr.set_primary("RequestClient")
+    messages = [BamlMessage(role="user", content="Greet John")]
+    request = asyncio.run(
+        getattr(b.request, baml_function)(messages, True, baml_options={"tb": tb, "client_registry": cr})
+    )
+    return request.body.json()
+
+
+def test_schema_first_layout_leads_with_schema():
+    body = _render("BamlFunctionSchemaFirst")
+    assert body["prompt_cache_key"] == "agent-42"
+    first, last = body["messages"][0], body["messages"][-1]
+    assert first["role"] == "system"
+    assert "Greet" in first["content"][0]["text"]
+    assert last["role"] == "user"
+
+
+def test_conversation_first_layout_ends_with_schema():
+    body = _render("BamlFunction")
+    assert body["messages"][0]["role"] == "user"
+    assert body["messages"][-1]["role"] == "system"
+
+
+def test_prompt_layout_selection():
+    assert _select_prompt_layout({}) == "BamlFunction"
+    assert _select_prompt_layout({"x-baml-prompt-layout": "schema-first"}) == "BamlFunctionSchemaFirst"
+    with pytest.raises(InvalidRequestError):
+        _select_prompt_layout({"x-baml-prompt-layout": "sideways"})
+
+
+def test_unknown_prompt_layout_is_a_bad_request():
+    response = client.post(
+        "/v1/chat/completions",
+        json={"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}], "tools": TOOLS},
+        headers={"Authorization": "Bearer test", "X-BAML-Prompt-Layout": "sideways"},
+    )
+    assert response.status_code == 400
+
+
+def test_usage_sums_upstream_usage():
+    usage = _usage_from_upstream([
+        {"prompt_tokens": 10, "completion_tokens": 2, "prompt_tokens_details": {"cached_tokens": 8}},
+        {"prompt_tokens": 10, "completion_tokens": 3},
+    ])
+    assert (usage.prompt_tokens, usage.completion_tokens, usage.total_tokens) == (20, 5, 25)
+    assert usage.prompt_tokens_details.cached_tokens == 8
+    assert _usage_from_upstream([]).total_tokens == 0
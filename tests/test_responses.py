@@ -0,0 +1,122 @@
+import json
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from openai_baml_adapter.api import main
+from openai_baml_adapter.core import clients, responses
+from openai_baml_adapter.core.errors import InvalidRequestError
+from openai_baml_adapter.core.responses import ResponseStore, StoredResponse, owner_of
+
+from .test_handler import TOOLS
+
+AUTH = {"authorization": "Bearer test"}
+OWNER = owner_of(AUTH)
+RESPONSES_TOOLS = [{"type": "function", **tool["function"]} for tool in TOOLS]
+
+
+def _upstream(replies, seen):
+    def upstream(request):
+        seen.append(json.loads(request.content))
+        return httpx.Response(200, json={
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": replies[len(seen) - 1]}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        })
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = ResponseStore(ttl=60, memory_items=100)
+    monkeypatch.setattr(responses, "response_store", store)
+    monkeypatch.setattr(main, "response_store", store)
+    return store
+
+
+def _record(response_id, parent=None, expires_in=60):
+    return StoredResponse(
+        id=response_id, parent=parent, messages=[{"role": "user", "content": response_id}],
+        tools=[], tools_json=b"[]", response={"id": response_id}, expires_at=time.time() + expires_in,
+        owner=OWNER,
+    )
+
+
+def test_follow_up_sends_only_its_delta(store, monkeypatch):
+    seen = []
+    replies = [
+        '{"tool_call": [{"function_name": "Greet", "name": "John"}]}',
+        '{"tool_call": [{"function_name": "GetWeather", "latitude": 1, "longitude": 2}]}',
+    ]
+    monkeypatch.setattr(clients, "_http_client", _upstream(replies, seen))
+    client = TestClient(main.app)
+
+    first = client.post("/v1/responses", headers=AUTH, json={
+        "model": "gpt-4o-mini", "input": "Greet John", "tools": RESPONSES_TOOLS, "instructions": "Be terse.",
+    })
+    assert first.status_code == 200, first.text
+    call = first.json()["output"][0]
+    assert (call["type"], call["name"], json.loads(call["arguments"])) == ("function_call", "Greet", {"name": "John"})
+
+    # No tools: the first response's tool set carries over
+    second = client.post("/v1/responses", headers=AUTH, json={
+        "model": "gpt-4o-mini",
+        "previous_response_id": first.json()["id"],
+        "input": [
+            {"type": "function_call_output", "call_id": call["call_id"], "output": "Hello John"},
+            {"role": "user", "content": [{"type": "input_text", "text": "Weather there?"}]},
+        ],
+    })
+    assert second.status_code == 200, second.text
+    assert second.json()["output"][0]["name"] == "GetWeather"
+    assert second.json()["previous_response_id"] == first.json()["id"]
+    assert second.json()["usage"] == {"input_tokens": 10, "output_tokens": 5, "total_tokens": 15}
+
+    prompt = json.dumps(seen[1]["messages"])
+    for text in ("Greet John", "Hello John", "Weather there?"):
+        assert text in prompt
+    # Instructions are only for the turn that sent them
+    assert "Be terse." in json.dumps(seen[0]["messages"]) and "Be terse." not in prompt
+
+    assert client.get(f"/v1/responses/{first.json()['id']}", headers=AUTH).json()["output"] == first.json()["output"]
+    assert client.delete(f"/v1/responses/{first.json()['id']}", headers=AUTH).json()["deleted"] is True
+    assert client.post("/v1/responses", headers=AUTH, json={
+        "model": "gpt-4o-mini", "previous_response_id": second.json()["id"], "input": "And now?",
+    }).status_code == 400
+
+
+def test_store_spills_to_sqlite_and_expires(tmp_path):
+    store = ResponseStore(ttl=60, memory_items=2, path=str(tmp_path / "responses.db"))
+    store.put(_record("resp_1"))
+    store.put(_record("resp_2", parent="resp_1"))
+    store.put(_record("resp_3", parent="resp_2"))
+    assert len(store) == 2
+    # resp_1 was spilled, with its owner
+    assert store.get("resp_1", owner_of({"authorization": "Bearer other"})) is None
+    assert [record.id for record in store.chain("resp_3", OWNER)] == ["resp_1", "resp_2", "resp_3"]
+
+    store.put(_record("resp_old", expires_in=-1))
+    assert store.get("resp_old", OWNER) is None
+    assert store.delete("resp_1", OWNER)
+    with pytest.raises(InvalidRequestError):
+        store.chain("resp_3", OWNER)
+
+
+def test_responses_are_only_found_with_the_key_that_created_them(store, monkeypatch):
+    replies = ['{"tool_call": [{"function_name": "Greet", "name": "John"}]}']
+    monkeypatch.setattr(clients, "_http_client", _upstream(replies, []))
+    client = TestClient(main.app)
+    other = {"authorization": "Bearer other"}
+
+    created = client.post("/v1/responses", headers=AUTH, json={
+        "model": "gpt-4o-mini", "input": "Greet John", "tools": RESPONSES_TOOLS,
+    })
+    response_id = created.json()["id"]
+    assert client.get(f"/v1/responses/{response_id}", headers=other).status_code == 404
+    assert client.delete(f"/v1/responses/{response_id}", headers=other).status_code == 404
+    assert client.post("/v1/responses", headers=other, json={
+        "model": "gpt-4o-mini", "previous_response_id": response_id, "input": "And now?",
+    }).status_code == 400
+    assert client.get(f"/v1/responses/{response_id}", headers=AUTH).status_code == 200
@@ -0,0 +1,90 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from openai_baml_adapter.api.main import app
+from openai_baml_adapter.baml_client.baml_client.sync_client import b
+from openai_baml_adapter.baml_client.baml_client.type_builder import TypeBuilder
+from openai_baml_adapter.core import config
+from openai_baml_adapter.core.errors import SchemaTooComplexError
+from openai_baml_adapter.core.parse import parse_openai_tools
+from openai_baml_adapter.core.schema_cache import compile_schema
+
+DEFS = {
+    "TreeNode": {
+        "type": "object",
+        "title": "TreeNode",
+        "properties": {
+            "value": {"type": "integer"},
+            "children": {"type": "array", "items": {"$ref": "#/$defs/TreeNode"}},
+            "meta": {"$ref": "#/$defs/Meta"},
+        },
+        "required": ["value"],
+    },
+    "Cell": {
+        "type": "object",
+        "properties": {"next": {"anyOf": [{"$ref": "#/$defs/Cell"}, {"type": "null"}]}},
+    },
+    "Meta": {
+        "type": "object",
+        "properties": {"color": {"type": "string", "enum": ["RED", "BLUE"], "title": "Color"}},
+    },
+}
+
+
+def _tool(name, properties, defs=DEFS):
+    return {
+        "type": "function",
+        "function": {"name": name, "parameters": {"type": "object", "properties": properties, "$defs": defs}},
+    }
+
+
+WALK = _tool("Walk", {
+    "root": {"$ref": "#/$defs/TreeNode"},
+    "other": {"$ref": "#/$defs/TreeNode"},
+    "chain": {"$ref": "#/$defs/Cell"},
+    "meta": {"$ref": "#/$defs/Meta"},
+})
+
+
+def test_recursive_refs_compile_and_parse():
+    tb, names = compile_schema([WALK], True)
+    assert names == ["Walk"]
+    parsed = b.parse.BamlFunction(
+        '{"tool_call": [{"function_name": "Walk", '
+        '"root": {"value": 1, "children": [{"value": 2, "children": []}], "meta": {"color": "RED"}}, '
+        '"chain": {"next": {"next": null}}}]}',
+        baml_options={"tb": tb},
+    )
+    call = parsed.tool_call[0]
+    assert call["root"]["children"][0]["value"] == 2
+    assert call["chain"]["next"]["next"] is None
+
+
+def test_plain_type_builder_skips_recursive_tools():
+    with pytest.warns(UserWarning, match="Recursive reference"):
+        assert parse_openai_tools([WALK], TypeBuilder()) == {}
+
+
+def test_recursion_without_an_object_is_rejected():
+    tool = _tool("Loop", {"x": {"$ref": "#/$defs/List"}}, {"List": {"type": "array", "items": {"$ref": "#/$defs/List"}}})
+    with pytest.warns(UserWarning, match="must go through an object"):
+        assert compile_schema([tool], True)[1] == []
+
+
+def test_schema_budget_rejects_wide_and_deep_schemas(monkeypatch):
+    monkeypatch.setattr(config, "SCHEMA_MAX_NODES", 50)
+    wide = _tool("Wide", {f"f{i}": {"type": "string"} for i in range(60)}, {})
+    with pytest.raises(SchemaTooComplexError, match="Tool Wide: .*more than 50 nodes"):
+        compile_schema([wide], True)
+
+    deep = {"type": "string"}
+    for level in range(config.SCHEMA_MAX_DEPTH + 1):
+        deep = {"type": "object", "title": f"Level{level}", "properties": {"inner": deep}}
+    monkeypatch.setattr(config, "SCHEMA_MAX_NODES", 25000)
+    response = TestClient(app).post(
+        "/v1/chat/completions",
+        json={"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}], "tools": [_tool("Deep", {"d": deep}, {})]},
+        headers={"Authorization": "Bearer test"},
+    )
+    assert response.status_code == 400
+    assert "nested more than" in response.json()["detail"]
@@ -0,0 +1,144 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from openai_baml_adapter.api import main
+from openai_baml_adapter.core import clients
+
+from .test_handler import TOOLS
+
+AUTH = {"authorization": "Bearer test"}
+
+
+def _upstream(replies, seen):
+    """A streaming upstream answering each call with the next reply, in one content delta."""
+
+    def upstream(request):
+        seen.append(json.loads(request.content))
+        chunk = {"choices": [{"index": 0, "delta": {"content": replies[len(seen) - 1]}}]}
+        body = f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n"
+        return httpx.Response(200, content=body.encode(), headers={"content-type": "text/event-stream"})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+
+
+def _until(ws, kind):
+    events = []
+    while True:
+        event = ws.receive_json()
+        events.append(event)
+        if event["type"] in (kind, "error"):
+            return events
+
+
+def test_session_keeps_the_conversation_between_turns(monkeypatch):
+    seen = []
+    replies = [
+        '{"tool_call": [{"function_name": "Greet", "name": "John"}]}',
+        '{"tool_call": [{"function_name": "GetWeather", "latitude": 1, "longitude": 2}]}',
+    ]
+    monkeypatch.setattr(clients, "_http_client", _upstream(replies, seen))
+
+    with TestClient(main.app).websocket_connect("/v1/baml/sessions", headers=AUTH) as ws:
+        ws.send_json({
+            "type": "session.create",
+            "session_id": "s1",
+            "model": "gpt-4o-mini",
+            "tools": TOOLS,
+            "messages": [{"role": "system", "content": "You are terse."}],
+        })
+        assert ws.receive_json() == {"type": "session.created", "session_id": "s1", "tools": len(TOOLS)}
+
+        ws.send_json({"type": "turn", "session_id": "s1", "turn_id": "t1", "messages": [
+            {"role": "user", "content": "Greet John"},
+        ]})
+        events = _until(ws, "turn.done")
+        assert all(event["turn_id"] == "t1" for event in events)
+        calls = [
+            call
+            for event in events if event["type"] == "turn.chunk"
+            for choice in event["chunk"]["choices"]
+            for call in choice["delta"].get("tool_calls") or []
+        ]
+        assert [call["function"]["name"] for call in calls] == ["Greet"] and calls[0]["baml_final"]
+        done = events[-1]
+        assert done["finish_reason"] == "tool_calls"
+        assert done["message"]["tool_calls"][0]["id"] == calls[0]["id"]
+
+        ws.send_json({"type": "turn", "session_id": "s1", "turn_id": "t2", "messages": [
+            {"role": "user", "content": "What's the weather there?"},
+        ]})
+        assert _until(ws, "turn.done")[-1]["type"] == "turn.done"
+
+    # The second call carries the whole conversation, sent only in parts
+    prompt = json.dumps(seen[1]["messages"])
+    for text in ("You are terse.", "Greet John", "What's the weather there?"):
+        assert text in prompt
+    # including the call the first turn made
+    reply = seen[1]["messages"][2]
+    assert reply["role"] == "assistant"
+    assert json.loads(reply["content"][0]["text"]) == {"tool_call": [{"function_name": "Greet", "name": "John"}]}
+
+
+def test_session_history_keeps_opening_messages_and_drops_old_turns(monkeypatch):
+    from openai_baml_adapter.core import config
+    from openai_baml_adapter.core.handler import _to_baml_messages
+    from openai_baml_adapter.core.sessions import Session
+
+    monkeypatch.setattr(config, "SESSION_HISTORY_MESSAGES", 4)
+    session = Session("s", None, {}, _to_baml_messages([{"role": "system", "content": "rules"}]))
+    for i in range(5):
+        session.extend(_to_baml_messages([{"role": "user", "content": f"q{i}"}, {"role": "assistant", "content": f"a{i}"}]))
+    assert [m.content for m in session.history] == ["rules", "q3", "a3", "q4", "a4"]
+
+
+def test_session_errors_are_reported_on_the_connection():
+    with TestClient(main.app).websocket_connect("/v1/baml/sessions", headers=AUTH) as ws:
+        ws.send_text("not json")
+        assert ws.receive_json()["type"] == "error"
+        ws.send_json({"type": "turn", "session_id": "nope", "messages": []})
+        assert "Unknown session" in ws.receive_json()["message"]
+        ws.send_json({"type": "session.create", "model": "gpt-4o-mini"})
+        assert "needs tools" in ws.receive_json()["message"]
+        # Unhashable ids are refused without closing the connection
+        ws.send_json({"type": "turn.cancel", "turn_id": ["t1"]})
+        assert "'turn_id' must be a string" in ws.receive_json()["message"]
+        ws.send_json({"type": "session.close", "session_id": {"id": "s1"}})
+        assert "'session_id' must be a string" in ws.receive_json()["message"]
+        ws.send_json({"type": "session.close", "session_id": "s1"})
+        assert "Unknown session" in ws.receive_json()["message"]
+
+
+def test_running_and_queued_turns_per_connection_are_capped(monkeypatch):
+    from openai_baml_adapter.core import config
+    from openai_baml_adapter.core.sessions import Session, SessionConnection
+
+    monkeypatch.setattr(config, "SESSION_TURNS_PER_CONNECTION", 2)
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        connection = SessionConnection(send, {})
+        session = connection.sessions["s1"] = Session("s1", None, {}, [])
+        # Holding the session's lock keeps its turns queued
+        async with session.lock:
+            for turn_id in ("t1", "t2", "t3"):
+                await connection.handle(json.dumps({"type": "turn", "session_id": "s1", "turn_id": turn_id, "messages": []}))
+            assert set(connection.turns) == {"t1", "t2"}
+            connection.sessions.clear()
+            await connection.close()
+
+    asyncio.run(run())
+    assert sent == [{"type": "error", "message": "At most 2 turns per connection may be running or queued"}]
+
+
+def test_sessions_need_an_api_key():
+    with pytest.raises(WebSocketDisconnect):
+        with TestClient(main.app).websocket_connect("/v1/baml/sessions") as ws:
+            ws.receive_json()
@@ -0,0 +1,116 @@
+import pytest
+
+from openai_baml_adapter.baml_client.baml_client.type_builder import TypeBuilder
+from openai_baml_adapter.core import schema_cache
+from openai_baml_adapter.core.parse import parse_openai_tools
+from openai_baml_adapter.core.schema_cache import SchemaCache
+from openai_baml_adapter.core.schema_ir import build_type_builder, compile_schema_ir
+from openai_baml_adapter.core.shared_cache import SharedSchemaStore
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "Greet",
+            "description": "Greet a person by name",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string", "description": "Who to greet"},
+                    "tone": {"type": "string", "enum": ["warm", "formal"], "title": "Tone"},
+                    "tags": {"type": "array", "items": {"type": "string"}},
+                    "extra": {"type": "object"},
+                    "nickname": {"anyOf": [{"type": "string"}, {"type": "null"}]},
+                },
+                "required": ["name"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "GetWeather",
+            "parameters": {
+                "type": "object",
+                "properties": {"latitude": {"type": "number"}, "days": {"type": "integer", "default": 1}},
+                "required": ["latitude"],
+            },
+        },
+    },
+]
+
+KEY = b"k" * 16
+
+
+@pytest.mark.parametrize("parallel", [True, False])
+def test_replayed_schema_matches_direct_compilation(parallel):
+    direct = TypeBuilder()
+    parsed = parse_openai_tools(TOOLS, direct)
+    tool_call = direct.union([field_type for field_type, _ in parsed.values()])
+    direct.Response.add_property("tool_call", direct.list(tool_call) if parallel else tool_call)
+
+    schema = compile_schema_ir(TOOLS, parallel)
+    assert str(build_type_builder(schema)) == str(direct)
+    assert schema["tools"] == list(parsed)
+
+
+def test_store_is_shared_between_handles(tmp_path):
+    path = str(tmp_path / "schemas")
+    writer = SharedSchemaStore(path, 1024 * 1024, buckets=64)
+    reader = SharedSchemaStore(path, 1024 * 1024, buckets=64)
+    assert reader.get(KEY) is None
+    assert writer.put(KEY, b"payload")
+    assert reader.get(KEY) == b"payload"
+    assert (reader.hits, reader.misses) == (1, 1)
+
+
+def test_a_different_layout_gets_its_own_file(tmp_path):
+    path = str(tmp_path / "schemas")
+    small = SharedSchemaStore(path, 64 * 1024, buckets=64)
+    assert small.put(KEY, b"payload")
+    large = SharedSchemaStore(path, 1024 * 1024, buckets=64)
+
+    assert large.path != small.path
+    assert large.get(KEY) is None
+    # The first store's file wasn't truncated under its mapping
+    assert small.get(KEY) == b"payload"
+
+
+def test_store_refuses_a_foreign_file(tmp_path):
+    path = str(tmp_path / "schemas")
+    with open(f"{path}-64x65536", "wb") as f:
+        f.write(b"not a schema cache".ljust(64 * 1024, b"\0"))
+    with pytest.raises(ValueError):
+        SharedSchemaStore(path, 64 * 1024, buckets=64)
+
+
+def test_store_evicts_oldest_records_when_full(tmp_path):
+    store = SharedSchemaStore(str(tmp_path / "schemas"), 64 * 1024, buckets=64)
+    keys = [i.to_bytes(16, "little") for i in range(64)]
+    for key in keys:
+        assert store.put(key, key * 64)
+    assert store.get(keys[0]) is None
+    assert store.get(keys[-1]) == keys[-1] * 64
+    # A record larger than a quarter of the ring is not cached at all
+    assert not store.put(KEY, b"x" * store.capacity)
+
+
+def test_store_rejects_corrupt_records(tmp_path):
+    store = SharedSchemaStore(str(tmp_path / "schemas"), 64 * 1024, buckets=64)
+    store.put(KEY, b"payload")
+    store._mm[store._data_offset + 16] ^= 0xFF
+    assert store.get(KEY) is None
+
+
+def test_workers_reuse_each_others_compilations(monkeypatch, tmp_path):
+    store = SharedSchemaStore(str(tmp_path / "schemas"), 1024 * 1024, buckets=64)
+    monkeypatch.setattr(schema_cache, "get_shared_store", lambda: store)
+    first_worker, second_worker = SchemaCache(8, shared=True), SchemaCache(8, shared=True)
+
+    compiled = first_worker.get_or_compile("digest", TOOLS, True)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("schema should come from the shared store")
+
+    monkeypatch.setattr(schema_cache, "compile_schema_ir", fail)
+    assert str(second_worker.get_or_compile("digest", TOOLS, True)) == str(compiled)
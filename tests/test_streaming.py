@@ -0,0 +1,152 @@
+import asyncio
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+from openai_baml_adapter.api import main
+from openai_baml_adapter.core import clients, deadline, handler
+from openai_baml_adapter.models.openai import CompletionRequest
+
+from .test_handler import TOOLS
+
+BODY = {
+    "model": "gpt-4o-mini",
+    "messages": [{"role": "user", "content": "Greet John and check the weather"}],
+    "tools": TOOLS,
+    "stream": True,
+    "stream_options": {"include_usage": True},
+}
+PIECES = [
+    '{"tool_call": [{"function_name": "Greet", ',
+    '"name": "John"}, ',
+    '{"function_name": "GetWeather", "latitude": 1',
+    ', "longitude": 2}]}',
+]
+
+
+def _upstream(pieces, sent, pause=0.3):
+    """A streaming upstream that pauses before each piece after the first, recording what it has sent."""
+
+    async def body():
+        for i, piece in enumerate(pieces):
+            if i >= 1:
+                await asyncio.sleep(pause)
+            sent.append(piece)
+            chunk = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+            yield f"data: {json.dumps(chunk)}\n\n".encode()
+        yield b'data: {"choices": [], "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}}\n\n'
+        yield b"data: [DONE]\n\n"
+
+    return httpx.AsyncClient(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, content=body(), headers={"content-type": "text/event-stream"})
+        )
+    )
+
+
+def _events(response):
+    return [
+        json.loads(line[len("data: "):])
+        for line in response.iter_lines()
+        if line.startswith("data: ") and line != "data: [DONE]"
+    ]
+
+
+def test_each_tool_call_is_sent_final_as_soon_as_it_closes(monkeypatch):
+    sent = []
+    monkeypatch.setattr(clients, "_http_client", _upstream(PIECES, sent))
+    request = CompletionRequest.model_validate(BODY)
+
+    async def consume():
+        chunks = await handler.handle_openai_request(request, None, {"authorization": "Bearer test"})
+        received = []
+        async for chunk in chunks:
+            received.append((chunk.model_dump(exclude_none=True), len(sent)))
+        return received
+
+    received = asyncio.run(consume())
+
+    calls = [
+        (call, sent_by_then)
+        for chunk, sent_by_then in received
+        for choice in chunk["choices"]
+        for call in choice["delta"].get("tool_calls") or []
+    ]
+    assert [call["function"]["name"] for call, _ in calls] == ["Greet", "GetWeather"]
+    assert [call["index"] for call, _ in calls] == [0, 1]
+    assert all(call["baml_final"] for call, _ in calls)
+    assert json.loads(calls[0][0]["function"]["arguments"]) == {"name": "John"}
+    # Greet went out while the model was still writing GetWeather
+    assert calls[0][1] < len(PIECES)
+    chunks = [chunk for chunk, _ in received]
+    assert chunks[0]["choices"][0]["delta"]["role"] == "assistant"
+    assert chunks[-2]["choices"][0]["finish_reason"] == "tool_calls"
+    assert chunks[-1]["usage"]["total_tokens"] == 15
+
+
+def test_stream_without_a_tool_call(monkeypatch):
+    sent = []
+    monkeypatch.setattr(clients, "_http_client", _upstream(['{"tool_call": []}'], sent))
+    with TestClient(main.app).stream(
+        "POST", "/v1/chat/completions", json=BODY, headers={"authorization": "Bearer test"}
+    ) as response:
+        assert response.status_code == 200
+        events = _events(response)
+
+    finish = events[-2]["choices"][0]
+    assert finish["finish_reason"] == "stop"
+    assert finish["delta"]["content"] == "No tool was called"
+
+
+def test_partials_are_opt_in_snapshots_sharing_the_final_call_id(monkeypatch):
+    pieces = ['{"tool_call": [{"function_name": "Greet", "name": "Jo', 'hn"}, ', '{"function_name": "Greet", "name": "A', 'nn"}]}']
+    monkeypatch.setattr(clients, "_http_client", _upstream(pieces, [], pause=0.05))
+    monkeypatch.setattr(handler.config, "STREAM_COALESCE_TOKENS", 1)
+    request = CompletionRequest.model_validate(BODY)
+    headers = {"authorization": "Bearer test", "x-baml-stream-partials": "1"}
+
+    async def consume():
+        chunks = await handler.handle_openai_request(request, None, headers)
+        return [chunk.model_dump(exclude_none=True) async for chunk in chunks]
+
+    deltas = [choice["delta"] for chunk in asyncio.run(consume()) for choice in chunk["choices"]]
+    partials = [delta["baml_partial"] for delta in deltas if "baml_partial" in delta]
+    finals = [call for delta in deltas for call in delta.get("tool_calls") or []]
+
+    assert [(partial["index"], json.loads(partial["function"]["arguments"])) for partial in partials] == [
+        (0, {"name": "Jo"}),
+        (1, {"name": "A"}),
+    ]
+    assert not any(partial["baml_final"] for partial in partials)
+    # Each snapshot and its finished call are the same call
+    assert [partial["id"] for partial in partials] == [call["id"] for call in finals]
+    assert [json.loads(call["function"]["arguments"]) for call in finals] == [{"name": "John"}, {"name": "Ann"}]
+
+
+def test_upstream_is_closed_once_the_response_closes(monkeypatch):
+    pieces = ['{"tool_call": [{"function_name": "Greet", "name": "John"}]}', "\n\nI greeted John", " for you."]
+    request = CompletionRequest.model_validate({**BODY, "max_tokens": 100, "stream_options": None})
+
+    def run(headers, request=request):
+        sent = []
+        monkeypatch.setattr(clients, "_http_client", _upstream(pieces, sent, pause=0.05))
+
+        async def consume():
+            chunks = await handler.handle_openai_request(request, None, {"authorization": "Bearer test", **headers})
+            return [chunk async for chunk in chunks]
+
+        run.chunks = asyncio.run(consume())
+        return len(sent)
+
+    stops = deadline.EARLY_STOPS.value()
+    saved = deadline.EARLY_STOP_TOKENS_SAVED.value()
+    assert run({}) == 1
+    assert deadline.EARLY_STOPS.value() == stops + 1
+    assert deadline.EARLY_STOP_TOKENS_SAVED.value() == saved + 99
+    assert run({"x-baml-early-stop": "0"}) == 3
+    assert deadline.EARLY_STOPS.value() == stops + 1
+    # A stream that reports usage reads to the end, so its usage is real
+    assert run({}, CompletionRequest.model_validate({**BODY, "max_tokens": 100})) == 3
+    assert run.chunks[-1].usage.total_tokens == 15
+    assert deadline.EARLY_STOPS.value() == stops + 1
@@ -0,0 +1,112 @@
+import asyncio
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from openai_baml_adapter.api import main
+from openai_baml_adapter.api.main import app
+from openai_baml_adapter.core import handler, toolsets as toolsets_module
+from openai_baml_adapter.core.errors import InvalidRequestError
+from openai_baml_adapter.core.schema_cache import schema_cache
+from openai_baml_adapter.core.toolsets import ToolsetStore
+from openai_baml_adapter.models.openai import CompletionRequest
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "Greet",
+            "description": "Greet a person by name",
+            "parameters": {
+                "type": "object",
+                "properties": {"name": {"type": "string"}},
+                "required": ["name"]
+            }
+        }
+    }
+]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ToolsetStore(str(tmp_path / "toolsets"))
+    monkeypatch.setattr(toolsets_module, "toolsets", store)
+    monkeypatch.setattr(handler, "toolsets", store)
+    monkeypatch.setattr(main, "toolsets", store)
+    return store
+
+
+def test_register_is_content_addressed_and_warms_the_schema_cache(store):
+    schema_cache.clear()
+    toolset = store.register(TOOLS)
+
+    assert toolset.id.startswith("ts_")
+    assert store.register(list(TOOLS)).id == toolset.id
+    assert schema_cache.get((toolset.digest, True)) is not None
+
+
+def test_registered_toolsets_survive_a_restart(store):
+    toolset = store.register(TOOLS)
+
+    reloaded = ToolsetStore(store.directory)
+    assert [t.id for t in reloaded.load_all()] == [toolset.id]
+    assert reloaded.get(toolset.id).tools == TOOLS
+
+
+def test_register_rejects_tools_that_do_not_compile(store):
+    broken = [{"type": "function", "function": {"name": "Broken", "parameters": {"type": "tuple"}}}]
+    with pytest.raises(InvalidRequestError), pytest.warns(UserWarning, match="Broken"):
+        store.register(broken)
+
+
+def test_store_keeps_at_most_max_count_toolsets(tmp_path):
+    store = ToolsetStore(str(tmp_path / "toolsets"), max_count=2, max_bytes=4096)
+    renamed = [
+        [dict(TOOLS[0], function=dict(TOOLS[0]["function"], name=f"Greet{i}"))] for i in range(3)
+    ]
+    first, second = store.register(renamed[0]), store.register(renamed[1])
+    os.utime(store._path(first.id), (0, 0))
+    third = store.register(renamed[2])
+
+    assert store.get(first.id) is None
+    assert {t.id for t in ToolsetStore(store.directory).load_all()} == {second.id, third.id}
+    with pytest.raises(InvalidRequestError, match="larger than"):
+        store.register([dict(TOOLS[0], function=dict(TOOLS[0]["function"], description="x" * 4096))])
+
+
+def test_unknown_ids_are_not_read_from_disk(store):
+    assert store.get("ts_../../etc/passwd") is None
+
+
+def test_chat_completion_can_reference_a_toolset(store, monkeypatch):
+    client = TestClient(app)
+    assert client.post("/v1/baml/toolsets", json={"tools": TOOLS}).status_code == 401
+    created = client.post("/v1/baml/toolsets", json={"tools": TOOLS}, headers={"Authorization": "Bearer test"})
+    assert created.status_code == 200
+    toolset_id = created.json()["id"]
+    assert client.get(f"/v1/baml/toolsets/{toolset_id}").json()["tools"] == TOOLS
+
+    seen = {}
+
+    async def call_baml(function_name, messages, parallel, baml_options, digest, tools):
+        seen["tb"] = baml_options["tb"]
+        return {"tool_call": [{"function_name": "Greet", "name": "John"}]}, {}
+
+    monkeypatch.setattr(handler, "_call_baml", call_baml)
+    response = client.post(
+        "/v1/chat/completions",
+        json={"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Greet John"}]},
+        headers={"Authorization": "Bearer test", "X-BAML-Toolset": toolset_id},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["choices"][0]["message"]["tool_calls"][0]["function"]["name"] == "Greet"
+    # The request reused the TypeBuilder compiled at registration
+    assert seen["tb"] is schema_cache.get((store.get(toolset_id).digest, True))
+
+
+def test_unknown_toolset_is_a_bad_request(store):
+    request = CompletionRequest(model="m", messages=[], toolset_id="ts_" + "0" * 64)
+    with pytest.raises(InvalidRequestError):
+        asyncio.run(handler.handle_openai_request(request, None, {"authorization": "Bearer test"}))
@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from openai_baml_adapter.api import main
+from openai_baml_adapter.core import config, metrics
+from openai_baml_adapter.core.watchdog import LoopWatchdog, inflight
+
+
+def _blocking_handler():
+    time.sleep(0.3)
+
+
+def test_stall_is_recorded_with_stack_and_requests_in_flight():
+    watchdog = LoopWatchdog(interval=0.01, threshold=0.05)
+
+    async def scenario():
+        task = asyncio.create_task(watchdog.run())
+        await asyncio.sleep(0.05)
+        inflight.add("req_stuck", "POST /v1/chat/completions")
+        try:
+            _blocking_handler()
+            await asyncio.sleep(0.05)
+        finally:
+            inflight.remove("req_stuck")
+            task.cancel()
+
+    asyncio.run(scenario())
+
+    [stall] = watchdog.stalls
+    assert stall.ended and stall.duration_ms >= 250
+    assert [r["id"] for r in stall.requests] == ["req_stuck"]
+    assert any("_blocking_handler" in line for line in stall.stacks[0])
+
+
+def test_metrics_and_debug_endpoints(monkeypatch):
+    client = TestClient(main.app)
+
+    response = client.get("/metrics", headers={"x-request-id": "req_mine"})
+    assert response.headers["x-request-id"] == "req_mine"
+    assert "# TYPE baml_event_loop_lag_seconds histogram" in response.text
+    assert "baml_event_loop_stalls_total" in response.text
+
+    monkeypatch.setattr(config, "DEBUG_KEYS", frozenset())
+    assert client.get("/debug/stalls", headers={"authorization": "Bearer ops"}).status_code == 404
+    monkeypatch.setattr(config, "DEBUG_KEYS", frozenset({"ops"}))
+    assert client.get("/debug/stalls", headers={"authorization": "Bearer nope"}).status_code == 403
+    response = client.get("/debug/stalls", headers={"authorization": "Bearer ops"})
+    assert response.status_code == 200
+    assert "stalls" in response.json()
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_histogram_seconds", "test", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+    lines = histogram.samples()
+    assert 'test_histogram_seconds_bucket{le="0.1"} 1' in lines
+    assert 'test_histogram_seconds_bucket{le="1.0"} 2' in lines
+    assert 'test_histogram_seconds_bucket{le="+Inf"} 3' in lines
+    assert "test_histogram_seconds_count 3" in lines